@@ -6,7 +6,7 @@ from urllib.parse import urlencode
 werkzeug.urls.url_encode = staticmethod(urlencode)
 
 # ─── Now safe to import Flask-WTF and your modules ─────────────────────
-from flask import Flask, render_template, session, flash, send_file, redirect, url_for, request
+from flask import Flask, Response, render_template, session, flash, send_file, redirect, url_for, request, jsonify, abort, g
 from forms import (
     EligibilityForm,
     ChildInfoForm,
@@ -18,17 +18,190 @@ from forms import (
 )  # Import all required forms
 
 from flask_wtf import FlaskForm
+from flask_wtf.csrf import generate_csrf, validate_csrf
 from wtforms import StringField, DateField, SelectField, BooleanField, RadioField
-from wtforms.validators import DataRequired, Email, Length, Optional
-from pdf_filler import fill_page1_only, fill_page2_only # your PDF helper
+from wtforms.validators import DataRequired, Email, Length, Optional, ValidationError
+from engines import DEFAULT_ENGINE, get_engine # PDF fill engines
+from pdf_cache import DEFAULT_MAX_AGE as DEFAULT_CACHE_TTL, PdfCache, document_key
+from pdf_jobs import DONE, FAILED, QUEUED, PdfJobQueue
+from template_registry import DEFAULT_STATE, digest, get_spec, load as load_template, set_memory_budget
+from session_store import ServerSideSessionInterface, backend_from_config, load_secret_key
+from preload import start_warm_up, status as warm_up_status, warm_up
+import metrics
+import profiling
+import session_codec
 import os
+import time
 
 app = Flask(__name__)
-app.secret_key = os.urandom(24)
+os.makedirs(app.instance_path, exist_ok=True)
+# Same key in every worker: SECRET_KEY from the environment, else one generated once under instance/
+app.secret_key = os.environ.get('SECRET_KEY') or load_secret_key(os.path.join(app.instance_path, 'secret_key'))
+# Wizard data stays on the server, the cookie only carries an opaque session id.
+# SESSION_BACKEND=sqlite (shared by all workers on the host) or memory (single process only)
+app.config['SESSION_BACKEND'] = os.environ.get('SESSION_BACKEND', 'sqlite')
+app.config['SESSION_SQLITE_PATH'] = os.environ.get('SESSION_SQLITE_PATH', os.path.join(app.instance_path, 'sessions.sqlite3'))
+app.config['SESSION_TTL'] = int(os.environ.get('SESSION_TTL', 24 * 3600))
+app.session_interface = ServerSideSessionInterface(backend_from_config(app.config), ttl=app.config['SESSION_TTL'])
+# Background PDF jobs: spool directory shared by all workers, finished PDFs kept PDF_JOB_TTL seconds
+app.config['PDF_JOB_SPOOL'] = os.environ.get('PDF_JOB_SPOOL', os.path.join(app.instance_path, 'pdf_jobs'))
+# PDF_JOB_WORKERS pool processes per web worker: the server runs WEB_CONCURRENCY × PDF_JOB_WORKERS of them
+app.config['PDF_JOB_WORKERS'] = int(os.environ.get('PDF_JOB_WORKERS', 0)) or None   # default: pdf_jobs.DEFAULT_WORKERS (1)
+app.config['PDF_JOB_TTL'] = int(os.environ.get('PDF_JOB_TTL', 15 * 60))
+# Draw field appearances on the server (PDF_APPEARANCES=0 leaves it to the viewer)
+app.config['PDF_APPEARANCES'] = os.environ.get('PDF_APPEARANCES', '1') != '0'
+# Append filled fields as an incremental update to the unchanged template (PDF_INCREMENTAL=0 rewrites the whole file)
+app.config['PDF_INCREMENTAL'] = os.environ.get('PDF_INCREMENTAL', '1') != '0'
+# Fill engine for /generate-pdf: pypdf, formfields, pdfrw or overlay
+app.config['PDF_ENGINE'] = os.environ.get('PDF_ENGINE', DEFAULT_ENGINE)
+# Engines whose libraries the warm-up imports (comma-separated, "all"); others load on their first ?engine= request
+app.config['PDF_PRELOAD_ENGINES'] = os.environ.get('PDF_PRELOAD_ENGINES', app.config['PDF_ENGINE'])
+
+# Generated PDFs cached by content (pdf_cache.py); PDF_CACHE_*_MB=0 disables a tier
+app.config['PDF_CACHE_DIR'] = os.environ.get('PDF_CACHE_DIR', os.path.join(app.instance_path, 'pdf_cache'))
+app.config['PDF_CACHE_MEMORY_MB'] = int(os.environ.get('PDF_CACHE_MEMORY_MB', 64))
+app.config['PDF_CACHE_DISK_MB'] = int(os.environ.get('PDF_CACHE_DISK_MB', 512))
+# Filled applications hold personal data: both tiers drop them this many seconds after generation (0: no limit)
+app.config['PDF_CACHE_TTL'] = int(os.environ.get('PDF_CACHE_TTL', DEFAULT_CACHE_TTL))
+
+# Form per Bundesland and revision (template_registry.py); ?state=&version= pick another one
+app.config['PDF_STATE'] = os.environ.get('PDF_STATE', DEFAULT_STATE)
+# Templates are loaded on first use; beyond this budget the least recently used ones are dropped
+app.config['PDF_TEMPLATE_BUDGET_MB'] = int(os.environ.get('PDF_TEMPLATE_BUDGET_MB', 256))
+set_memory_budget(app.config['PDF_TEMPLATE_BUDGET_MB'] << 20)
+
+# Prometheus metrics (metrics.py): per-process snapshots in METRICS_DIR, merged on GET /metrics.
+# Only answered for requests from the host itself unless METRICS_PUBLIC=1
+app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR', os.path.join(app.instance_path, 'metrics'))
+app.config['METRICS_PUBLIC'] = os.environ.get('METRICS_PUBLIC', '0') == '1'
+# Seconds between two snapshot writes of a process (requests only record in memory)
+app.config['METRICS_FLUSH_INTERVAL'] = float(os.environ.get('METRICS_FLUSH_INTERVAL', metrics.DEFAULT_FLUSH_INTERVAL))
+metrics.configure(app.config['METRICS_DIR'], interval=app.config['METRICS_FLUSH_INTERVAL'])
+
+# Opt-in profiling (profiling.py): PROFILING=1 plus PROFILE_TOKEN, and the token in the
+# X-Profile-Token header or ?profile= of a request to one of PROFILE_ENDPOINTS ("all": any route)
+app.config['PROFILING'] = os.environ.get('PROFILING', '0') == '1'
+app.config['PROFILE_TOKEN'] = os.environ.get('PROFILE_TOKEN', '')
+app.config['PROFILE_ENDPOINTS'] = os.environ.get('PROFILE_ENDPOINTS', profiling.DEFAULT_ENDPOINTS)
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+app.config['PROFILE_MAX_FILES'] = int(os.environ.get('PROFILE_MAX_FILES', profiling.DEFAULT_MAX_FILES))
+
+pdf_cache = PdfCache(app.config['PDF_CACHE_DIR'], memory_bytes=app.config['PDF_CACHE_MEMORY_MB'] << 20,
+                     disk_bytes=app.config['PDF_CACHE_DISK_MB'] << 20, max_age=app.config['PDF_CACHE_TTL'])
+pdf_jobs = PdfJobQueue(app.config['PDF_JOB_SPOOL'], workers=app.config['PDF_JOB_WORKERS'],
+                       ttl=app.config['PDF_JOB_TTL'], template=get_spec(app.config['PDF_STATE']).key)
 
 # Ensure upload folder exists
 os.makedirs('uploads', exist_ok=True)
 
+
+def create_app(preload=True):
+    """
+    App factory for gunicorn (gunicorn.conf.py: wsgi_app = "app:create_app()").
+    With preload_app the warm-up runs in the master, before the workers are forked,
+    so they share the PDF stack and the parsed template copy-on-write.
+    preload=False warms up in a background thread instead (development server).
+    """
+    # New server: snapshots of a previous run's processes no longer count
+    metrics.configure(app.config['METRICS_DIR'], reset=True)
+    if preload:
+        warm_up(app)
+        # decrypt/parse timings of the master; the forked workers start from zero
+        metrics.flush(force=True)
+    else:
+        start_warm_up(app)
+    return app
+
+
+# ─── Metrics ────────────────────────────────────────────────────────────
+
+_UNTIMED_ENDPOINTS = ('static', 'metrics_endpoint', None)
+
+
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _count_errors(response):
+    if response.status_code >= 500 and request.endpoint not in _UNTIMED_ENDPOINTS:
+        metrics.inc('http_errors_total', endpoint=request.endpoint)
+    return response
+
+
+@app.teardown_request
+def _record_request(exc):
+    # After the session is saved, so its payload size is in this request's snapshot
+    started = g.pop('request_started', None)
+    if started is not None and request.endpoint not in _UNTIMED_ENDPOINTS:
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - started,
+                        endpoint=request.endpoint)
+    # Throttled: writes the snapshot only if the last write is METRICS_FLUSH_INTERVAL ago
+    metrics.flush()
+
+
+# ─── Profiling ──────────────────────────────────────────────────────────
+
+@app.before_request
+def _start_profile():
+    supplied = request.headers.get(profiling.HEADER) or request.args.get(profiling.QUERY_FLAG)
+    if profiling.requested(app.config, request.endpoint, supplied):
+        g.profiler = profiling.start()
+        g.profile_started = time.perf_counter()
+
+
+@app.after_request
+def _profile_response(response):
+    if g.get('profiler') is not None:
+        g.profile_response = response.status_code, response.content_length
+    return response
+
+
+@app.teardown_request
+def _save_profile(exc):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return
+    status, size = g.pop('profile_response', (500, None))
+    metadata = {
+        'endpoint': request.endpoint,
+        'method': request.method,
+        'path': request.path,
+        'args': {k: v for k, v in request.args.items() if k != profiling.QUERY_FLAG},
+        'status': status,
+        'bytes': size,
+        'duration_ms': round((time.perf_counter() - g.pop('profile_started')) * 1000, 1),
+        'error': repr(exc) if exc else None,
+        'engine': request.args.get('engine') or app.config['PDF_ENGINE'],
+        'pid': os.getpid(),
+        'time': time.time(),
+    }
+    try:
+        path = profiling.save(profiler, app.config['PROFILE_DIR'], metadata, app.config['PROFILE_MAX_FILES'])
+        app.logger.info("Profile of %s written to %s", request.endpoint, path)
+    except OSError as e:
+        app.logger.error(f"Could not write profile: {e}")
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    if not app.config['METRICS_PUBLIC'] and request.remote_addr not in ('127.0.0.1', '::1'):
+        abort(404)
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/ready')
+def ready():
+    # Readiness probe: 503 until the warm-up (preload.py) is complete
+    state = warm_up_status()
+    if state['started'] is None:
+        # Served without create_app() (gunicorn app:app, flask run): nobody started it, so the first probe does
+        start_warm_up(app)
+        state = warm_up_status()
+    return jsonify(state), 200 if state['ready'] else 503
+
+
 @app.route('/', methods=['GET', 'POST'])
 def eligibility():
     form = EligibilityForm()
@@ -45,14 +218,10 @@ def eligibility():
             flash('Sie dürfen nicht mehr als 32 Stunden pro Woche arbeiten.', 'danger')
             return render_template('eligibility.html', form=form)
 
-        session['eligibility'] = {
-            'citizenship': form.citizenship.data,
-            'residence_permit': form.residence_permit.data,
-            'lives_with_child': form.lives_with_child.data,
-            'cares_for_child': form.cares_for_child.data,
-            'max_work_hours': form.plans_to_work_more_than_32h.data
-        }
+        session_codec.save(session, 'eligibility', form)
         return redirect(url_for('child_info'))
+    elif request.method == 'GET':
+        session_codec.prefill(form, session, 'eligibility')
     return render_template('eligibility.html', form=form)
 
 
@@ -60,25 +229,13 @@ def eligibility():
 def child_info():
     form = ChildInfoForm()
     if form.validate_on_submit():
-        child = {
-            'is_born': form.is_born.data,
-            'vorname': form.vorname.data or "",
-            'nachname': form.nachname.data or "",
-            'geburtsdatum': form.geburtsdatum.data.strftime('%d.%m.%Y') if form.geburtsdatum.data else "",
-            'fruehgeboren': form.fruehgeboren.data or False,
-            'due_date': form.due_date.data.strftime('%d.%m.%Y') if form.due_date.data else "",
-            'behinderung': form.behinderung.data or False,
-            'multiple_births': form.multiple_births.data or "1",
-            'multi_name_1': form.multi_name_1.data or "",
-            'multi_name_2': form.multi_name_2.data or "",
-            'multi_name_3': form.multi_name_3.data or "",
-            'multi_name_4': form.multi_name_4.data or "",
-        }
-        session['child_info'] = child
+        session_codec.save(session, 'child_info', form)
 
         flash("Kinderangaben wurden gespeichert!", "success")
         
         return redirect(url_for('applicant_info'))
+    elif request.method == 'GET':
+        session_codec.prefill(form, session, 'child_info')
 
     return render_template('child_info.html', form=form)
 
@@ -87,24 +244,7 @@ def child_info():
 def applicant_info():
     form = ApplicantInfoForm()
     if form.validate_on_submit():
-        session['applicant_info'] = {
-            'vorname': form.vorname.data,
-            'nachname': form.nachname.data,
-            'geburtsdatum': form.geburtsdatum.data.strftime('%Y-%m-%d'),
-            'geschlecht': form.geschlecht.data,
-            'steuer_id': form.steuer_id.data,
-            'address_street': form.strasse.data,
-            'address_housenumber': form.hausnummer.data,
-            'address_addon': form.adresszusatz.data,
-            'address_plz': form.plz.data,
-            'address_city': form.wohnort.data,
-            'email': form.email.data,
-            'telefon': form.telefon.data,
-            'other_parent_status': form.other_parent_status.data,
-            'lives_in_germany': form.lives_in_germany.data,
-            'residency_start_date_type': form.residency_start_date_type.data,
-            'residency_start_date': form.residency_start_date.data.strftime('%d.%m.%Y') if form.residency_start_date.data else "",
-        }
+        session_codec.save(session, 'applicant_info', form)
 
         # Conditional redirection based on residency status
         if form.lives_in_germany.data == 'no':
@@ -113,6 +253,8 @@ def applicant_info():
             return redirect(url_for('other_parent_info'))
         else:
             return redirect(url_for('income_before_birth'))
+    elif request.method == 'GET':
+        session_codec.prefill(form, session, 'applicant_info')
     return render_template('applicant_info.html', form=form)
     
     
@@ -120,54 +262,15 @@ def applicant_info():
 def residency_abroad():
     form = ResidencyAbroadForm()
     if form.validate_on_submit():
-        # Combine selected social security types into a string or list
-        german_ss_types = []
-        if form.german_ss_kranken.data: german_ss_types.append('Krankenversicherung')
-        if form.german_ss_pflege.data: german_ss_types.append('Pflegeversicherung')
-        if form.german_ss_renten.data: german_ss_types.append('Rentenversicherung')
-        if form.german_ss_arbeitslosen.data: german_ss_types.append('Arbeitslosenversicherung')
-
-        session['residency_abroad_info'] = {
-            'reason_abroad': form.reason_abroad.data,
-            'date_of_departure': form.date_of_departure.data.strftime('%d.%m.%Y'),
-            'expected_date_of_return': form.expected_date_of_return.data.strftime('%d.%m.%Y') if form.expected_date_of_return.data else '',
-            'foreign_country': form.foreign_country.data,
-            'foreign_street': form.foreign_street.data,
-            'foreign_housenumber': form.foreign_housenumber.data,
-            'foreign_plz': form.foreign_plz.data,
-            'foreign_city': form.foreign_city.data,
-            'employer_abroad': form.employer_abroad.data,
-            'german_social_security_abroad': form.german_social_security_abroad.data,
-            'german_social_security_types': german_ss_types, # Storing as list
-            'foreign_social_security': form.foreign_social_security.data,
-            'foreign_social_security_details': form.foreign_social_security_details.data,
-        }
+        # The german_ss_* checkboxes are stored as one bitset, read back as german_social_security_types
+        session_codec.save(session, 'residency_abroad_info', form)
 
-        applicant_info = session.get('applicant_info', {})
-        if applicant_info.get('other_parent_status') == 'both':
+        if session_codec.section(session, 'applicant_info').get('other_parent_status') == 'both':
             return redirect(url_for('other_parent_info'))
         else:
             return redirect(url_for('income_info'))
-    elif request.method == 'GET' and 'residency_abroad_info' in session:
-        data = session['residency_abroad_info']
-        form.reason_abroad.data = data.get('reason_abroad')
-        form.date_of_departure.data = datetime.strptime(data['date_of_departure'], '%d.%m.%Y').date() if data.get('date_of_departure') else None
-        form.expected_date_of_return.data = datetime.strptime(data['expected_date_of_return'], '%d.%m.%Y').date() if data.get('expected_date_of_return') else None
-        form.foreign_country.data = data.get('foreign_country')
-        form.foreign_street.data = data.get('foreign_street')
-        form.foreign_housenumber.data = data.get('foreign_housenumber')
-        form.foreign_plz.data = data.get('foreign_plz')
-        form.foreign_city.data = data.get('foreign_city')
-        form.employer_abroad.data = data.get('employer_abroad')
-        form.german_social_security_abroad.data = data.get('german_social_security_abroad')
-        # Re-set checkboxes based on stored list
-        if data.get('german_social_security_types'):
-            if 'Krankenversicherung' in data['german_social_security_types']: form.german_ss_kranken.data = True
-            if 'Pflegeversicherung' in data['german_social_security_types']: form.german_ss_pflege.data = True
-            if 'Rentenversicherung' in data['german_social_security_types']: form.german_ss_renten.data = True
-            if 'Arbeitslosenversicherung' in data['german_social_security_types']: form.german_ss_arbeitslosen.data = True
-        form.foreign_social_security.data = data.get('foreign_social_security')
-        form.foreign_social_security_details.data = data.get('foreign_social_security_details')
+    elif request.method == 'GET':
+        session_codec.prefill(form, session, 'residency_abroad_info')
 
     return render_template('residency_abroad.html', form=form)
 
@@ -176,31 +279,16 @@ def residency_abroad():
 
 @app.route('/other-parent', methods=['GET', 'POST'])
 def other_parent_info():
-    applicant_data = session.get('applicant_info', {})
+    applicant_data = session_codec.section(session, 'applicant_info')
     if not applicant_data or applicant_data.get('other_parent_status') != 'both':
         return redirect(url_for('income_info'))
 
     form = OtherParentInfoForm()
     if form.validate_on_submit():
-        session['other_parent_info'] = {
-            'vorname': form.vorname.data,
-            'nachname': form.nachname.data,
-            'geburtsdatum': form.geburtsdatum.data.strftime('%Y-%m-%d'),
-            'geschlecht': form.geschlecht.data,
-            'steuer_id': form.steuer_id.data,
-            'email': form.email.data,
-            'telefon': form.telefon.data,
-            'same_address_as_applicant': form.same_address_as_applicant.data # Add this field to your form
-        }
-        if not form.same_address_as_applicant.data:
-            session['other_parent_info'].update({
-                'address_street': form.strasse.data,
-                'address_plz': form.plz.data,
-                'address_city': form.wohnort.data,
-                'address_housenumber': form.housenumber.data, # Assuming a housenumber field
-                'address_addon': form.address_addon.data # Assuming an address_addon field
-            })
+        session_codec.save(session, 'other_parent_info', form)
         return redirect(url_for('income_info'))
+    elif request.method == 'GET':
+        session_codec.prefill(form, session, 'other_parent_info')
 
     return render_template('other_parent_info.html', form=form)
 
@@ -216,13 +304,12 @@ def bank_info():
     form = BankInfoForm()
     if form.validate_on_submit():
         # Save bank data to session
-        session['bank_info'] = { # Changed from bank_data to bank_info for consistency
-            'iban': form.iban.data,
-            'bic': form.bic.data
-        }
+        session_codec.save(session, 'bank_info', form)
         flash('Bankdaten erfolgreich gespeichert!', 'success')
         # Instead of generating PDF here, redirect to the summary page
         return redirect(url_for('summary_page'))
+    elif request.method == 'GET':
+        session_codec.prefill(form, session, 'bank_info')
     return render_template('bank_info.html', form=form)
 
 
@@ -230,166 +317,270 @@ def bank_info():
 @app.route('/summary')
 def summary_page():
     # You can pass session data to the summary template if you want to display a review
-    return render_template('summary.html')
-
-
-@app.route('/generate-pdf')
-def generate_pdf():
-    child_info = session.get('child_info', {})
-    applicant_info = session.get('applicant_info', {})
-    other_parent_info = session.get('other_parent_info', {})
-    bank_info = session.get('bank_info', {}) # Retrieve bank info from session
-    residency_abroad_info = session.get('residency_abroad_info', {}) # Retrieve new session data
+    elterngeld = None
+    if session.get('income_before_birth_info'):
+        # Imported here: NumPy is only needed once the income data is there
+        from elterngeld_calc import estimate
+        elterngeld = estimate(session_codec.records(session))
+    return render_template('summary.html', csrf_token=generate_csrf(), elterngeld=elterngeld)
 
 
+def _application_data():
+    """The wizard sections for the PDF, or None (after flashing) if essential data is missing."""
     # Check if essential data is present before attempting to generate PDF
-    if not child_info or not applicant_info or not bank_info:
+    if not session.get('child_info') or not session.get('applicant_info') or not session.get('bank_info'):
         flash("Einige erforderliche Angaben fehlen. Bitte füllen Sie alle Formulare aus.", "danger")
-        return redirect(url_for('summary_page')) # Redirect to summary or an appropriate page
+        return None
+    return session_codec.records(session)
+
+
+def _fill_request(args):
+    """Template, engine and fill options for a request: PDF_* settings, ?state=, ?version=, ?engine=, ?flatten=."""
+    spec = get_spec(args.get('state') or app.config['PDF_STATE'], args.get('version'))
+    # ?engine=<name> wählt eine andere Fill-Engine als PDF_ENGINE (siehe engines.py)
+    engine = get_engine(args.get('engine') or app.config['PDF_ENGINE'])
+
+    options = {}
+    if 'appearances' in engine.options:
+        options['appearances'] = app.config['PDF_APPEARANCES']
+    # ?flatten=1 → nicht mehr editierbares PDF (Felder in den Seiteninhalt eingebrannt)
+    if args.get('flatten', '').lower() in ('1', 'true', 'yes'):
+        options['flatten'] = True
+    if 'incremental' in engine.options:
+        # Unveränderte Vorlage (geteilter Puffer) + angehängtes Update mit den geänderten Objekten
+        options['incremental'] = app.config['PDF_INCREMENTAL']
+    engine.check_options(options)
+    return spec, engine, options
+
+
+def _pdf_response(parts, etag):
+    started = time.perf_counter()
+    response = Response(
+        parts,
+        mimetype="application/pdf",
+        headers={
+            "Content-Disposition": "attachment; filename=Elterngeld_Antrag_Filled.pdf",
+            "Content-Length": str(sum(len(part) for part in parts)),
+        }
+    )
+    response.call_on_close(lambda: _record_send(started))
+    return _cacheable(response, etag)
+
 
-    template_pdf = "Berlin-antrag-auf-elterngeld.pdf" #
-    temp_page1_output = "temp_page1_filled.pdf"
-    final_output_pdf = "Elterngeld_Antrag_Filled.pdf"
+def _record_send(started):
+    # Called once the server has written the last byte, after the request's teardown
+    metrics.observe('pdf_stage_seconds', time.perf_counter() - started, stage='send')
+    metrics.flush()
 
+
+def _cacheable(response, etag):
+    # Personal data: only the browser may keep it, and must revalidate (cheap 304 via ETag)
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def _not_modified(etag):
+    if etag and etag in request.if_none_match:
+        return _cacheable(Response(status=304), etag)
+    return None
+
+
+@app.route('/generate-pdf')
+def generate_pdf():
+    data = _application_data()
+    if data is None:
+        return redirect(url_for('summary_page')) # Redirect to summary or an appropriate page
+
+    engine = None
     try:
-        # Fill Page 1
-        pdf_page1_data = {
-            "Vornamen": child_info.get('vorname', ''),
-            "Nachname": child_info.get('nachname', ''),
-            "Vornamen bei Zwillingen, Drillingen, Mehrlingen": "", # Assuming this is filled by multi_name fields
-            "Vorname01": child_info.get('multi_name_1', ''),
-            "Vorname02": child_info.get('multi_name_2', ''),
-            "Vorname03": child_info.get('multi_name_3', ''),
-            "Vorname04": child_info.get('multi_name_4', ''),
-            "Vorname05": "", # Assuming no more than 4 multi_names in your form
-            "Geburtsdatum": child_info.get('geburtsdatum', ''),
-            "Ja01": ("Ja" if child_info.get('fruehgeboren') else ""),
-            "Ursprünglich errechneter Geburtstermin": child_info.get('due_date', ''),
-            "Nein": "", "keine": "", "insgesamt": "", "Anzahl": "", # These seem like fixed fields in the PDF template
-            "Adresse der Behörde": "" # This might be filled with a fixed value or from config
-        }
-        fill_page1_only(
-            template_path=template_pdf,
-            output_path=temp_page1_output,
-            child_info=pdf_page1_data
-        )
-
-        # Fill Page 2 using the PDF that now has page 1 filled
-        fill_page2_only(
-            template_path=temp_page1_output,
-            output_path=final_output_pdf,
-            applicant_info=applicant_info,
-            other_parent_info=other_parent_info
-        )
-        
-        # Clean up temporary file
-        if os.path.exists(temp_page1_output):
-            os.remove(temp_page1_output)
-
-        return send_file(
-            final_output_pdf,
-            as_attachment=True,
-            download_name="Elterngeld_Antrag_Filled.pdf",
-            mimetype="application/pdf"
-        )
+        spec, engine, options = _fill_request(request.args)
+        # Same data, template and options → same document: answer from the cache
+        key = document_key(digest(spec), engine.name, options, data, spec.plan)
+        not_modified = _not_modified(key)
+        if not_modified is not None:
+            return not_modified
+        parts = pdf_cache.get(key)
+        if parts is None:
+            # Fill every mapped field in one pass, entirely in memory
+            template = load_template(spec)
+            parts = pdf_cache.put(key, engine.fill_parts(spec.path, data, spec.plan, **options),
+                                  shared=(template.data,))
+            metrics.observe('pdf_output_bytes', sum(len(part) for part in parts), engine=engine.name)
+        return _pdf_response(parts, key)
     except Exception as e:
+        metrics.inc('pdf_errors_total', engine=engine.name if engine else 'invalid')
         flash(f"Fehler beim Generieren des PDFs: {e}", "danger")
         app.logger.error(f"PDF Generation Error: {e}")
         return redirect(url_for('summary_page')) # Redirect to summary page on error
-        
-        
+
+
+# ─── PDF jobs: generation in the background pool (pdf_jobs.py) ─────────
+
+def _own_job(job_id):
+    # Jobs enthalten personenbezogene Daten: nur die Session, die den Job gestartet hat, darf ihn sehen
+    return job_id in session.get('pdf_jobs', [])
+
+
+def _job_json(status):
+    job_id = status['id']
+    body = {'id': job_id, 'status': status['status'],
+            'status_url': url_for('pdf_job_status', job_id=job_id)}
+    if status['status'] == DONE:
+        body['download_url'] = url_for('pdf_job_download', job_id=job_id)
+    if status['status'] == FAILED:
+        body['error'] = status.get('error')
+    return body
+
+
+@app.route('/pdf-jobs', methods=['POST'])
+def pdf_job_submit():
+    try:
+        validate_csrf(request.headers.get('X-CSRFToken') or request.form.get('csrf_token'))
+    except ValidationError as e:
+        return jsonify(error=str(e)), 400
+
+    data = _application_data()
+    if data is None:
+        session.pop('_flashes', None)
+        return jsonify(error="Einige erforderliche Angaben fehlen. Bitte füllen Sie alle Formulare aus."), 400
+    try:
+        spec, engine, options = _fill_request(request.args)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    # Only the file's hash: the template itself is loaded in the pool process
+    key = document_key(digest(spec), engine.name, options, data, spec.plan)
+    parts = pdf_cache.get(key)
+    if parts is not None:
+        job_id = pdf_jobs.finished(parts, key=key)
+    else:
+        job_id = pdf_jobs.submit(engine.name, spec.key, data, options, key=key)
+    session['pdf_jobs'] = (session.get('pdf_jobs', []) + [job_id])[-10:]
+    return jsonify(_job_json({'id': job_id, 'status': QUEUED})), 202
+
+
+@app.route('/pdf-jobs/<job_id>')
+def pdf_job_status(job_id):
+    status = pdf_jobs.status(job_id) if _own_job(job_id) else None
+    if status is None:
+        return jsonify(error="Unbekannter oder abgelaufener Auftrag."), 404
+    return jsonify(_job_json(status))
+
+
+@app.route('/pdf-jobs/<job_id>/download')
+def pdf_job_download(job_id):
+    status = pdf_jobs.status(job_id) if _own_job(job_id) else None
+    if status is None:
+        abort(404)
+    key = status.get('key')
+    not_modified = _not_modified(key)
+    if not_modified is not None:
+        return not_modified
+    path = pdf_jobs.result_path(job_id)
+    if path is None:
+        return jsonify(_job_json(status)), 409
+    if key and key not in pdf_cache:
+        # Filled in a pool process: keep the result for the next identical request
+        with open(path, 'rb') as f:
+            pdf_cache.put(key, [f.read()])
+    response = send_file(path, mimetype="application/pdf", as_attachment=True,
+                         download_name="Elterngeld_Antrag_Filled.pdf", etag=False)
+    return _cacheable(response, key) if key else response
+
+
 # --- NEW ROUTE: Income Before Birth ---
 @app.route('/income-before-birth', methods=['GET', 'POST'])
 def income_before_birth():
     form = IncomeBeforeBirthForm()
     if form.validate_on_submit():
-        income_data = {
-            'assessment_period_type': form.assessment_period_type.data,
-            'other_assessment_reason': form.other_assessment_reason.data,
-            'other_assessment_start_month': form.other_assessment_start_month.data,
-            'other_assessment_start_year': form.other_assessment_start_year.data,
-            'other_assessment_end_month': form.other_assessment_end_month.data,
-            'other_assessment_end_year': form.other_assessment_end_year.data,
-            'has_employed_income': form.has_employed_income.data,
-            'employer_name': form.employer_name.data,
-            'gross_income_months': [
-                str(form.gross_income_month_1.data) if form.gross_income_month_1.data is not None else None,
-                str(form.gross_income_month_2.data) if form.gross_income_month_2.data is not None else None,
-                str(form.gross_income_month_3.data) if form.gross_income_month_3.data is not None else None,
-                str(form.gross_income_month_4.data) if form.gross_income_month_4.data is not None else None,
-                str(form.gross_income_month_5.data) if form.gross_income_month_5.data is not None else None,
-                str(form.gross_income_month_6.data) if form.gross_income_month_6.data is not None else None,
-                str(form.gross_income_month_7.data) if form.gross_income_month_7.data is not None else None,
-                str(form.gross_income_month_8.data) if form.gross_income_month_8.data is not None else None,
-                str(form.gross_income_month_9.data) if form.gross_income_month_9.data is not None else None,
-                str(form.gross_income_month_10.data) if form.gross_income_month_10.data is not None else None,
-                str(form.gross_income_month_11.data) if form.gross_income_month_11.data is not None else None,
-                str(form.gross_income_month_12.data) if form.gross_income_month_12.data is not None else None,
-            ],
-            'has_mutterschaftsgeld': form.has_mutterschaftsgeld.data,
-            'mutterschaftsgeld_amount': str(form.mutterschaftsgeld_amount.data) if form.mutterschaftsgeld_amount.data is not None else None,
-            'has_krankentagegeld': form.has_krankentagegeld.data,
-            'krankentagegeld_amount': str(form.krankentagegeld_amount.data) if form.krankentagegeld_amount.data is not None else None,
-            'has_kurzarbeitergeld': form.has_kurzarbeitergeld.data,
-            'kurzarbeitergeld_amount': str(form.kurzarbeitergeld_amount.data) if form.kurzarbeitergeld_amount.data is not None else None,
-            'has_elterngeld_older_child': form.has_elterngeld_older_child.data,
-            'elterngeld_older_child_amount': str(form.elterngeld_older_child_amount.data) if form.elterngeld_older_child_amount.data is not None else None,
-            'has_other_income': form.has_other_income.data,
-            'other_income_amount': str(form.other_income_amount.data) if form.other_income_amount.data is not None else None,
-            'has_self_employed_income': form.has_self_employed_income.data,
-            'self_employment_activity_type': form.self_employment_activity_type.data,
-            'profit_assessment_start_month': form.profit_assessment_start_month.data,
-            'profit_assessment_start_year': form.profit_assessment_start_year.data,
-            'profit_assessment_end_month': form.profit_assessment_end_month.data,
-            'profit_assessment_end_year': form.profit_assessment_end_year.data,
-            'profit_amount': str(form.profit_amount.data) if form.profit_amount.data is not None else None,
-        }
-        session['income_before_birth_info'] = income_data
+        session_codec.save(session, 'income_before_birth_info', form)
         return redirect(url_for('income_info')) # Redirect to the next income page (which is currently a dummy)
-    elif request.method == 'GET' and 'income_before_birth_info' in session:
-        data = session['income_before_birth_info']
-        form.assessment_period_type.data = data.get('assessment_period_type')
-        form.other_assessment_reason.data = data.get('other_assessment_reason')
-        form.other_assessment_start_month.data = data.get('other_assessment_start_month')
-        form.other_assessment_start_year.data = data.get('other_assessment_start_year')
-        form.other_assessment_end_month.data = data.get('other_assessment_end_month')
-        form.other_assessment_end_year.data = data.get('other_assessment_end_year')
-        form.has_employed_income.data = data.get('has_employed_income')
-        form.employer_name.data = data.get('employer_name')
-        if data.get('gross_income_months'):
-            if data['gross_income_months'][0] is not None: form.gross_income_month_1.data = Decimal(data['gross_income_months'][0])
-            if data['gross_income_months'][1] is not None: form.gross_income_month_2.data = Decimal(data['gross_income_months'][1])
-            if data['gross_income_months'][2] is not None: form.gross_income_month_3.data = Decimal(data['gross_income_months'][2])
-            if data['gross_income_months'][3] is not None: form.gross_income_month_4.data = Decimal(data['gross_income_months'][3])
-            if data['gross_income_months'][4] is not None: form.gross_income_month_5.data = Decimal(data['gross_income_months'][4])
-            if data['gross_income_months'][5] is not None: form.gross_income_month_6.data = Decimal(data['gross_income_months'][5])
-            if data['gross_income_months'][6] is not None: form.gross_income_month_7.data = Decimal(data['gross_income_months'][6])
-            if data['gross_income_months'][7] is not None: form.gross_income_month_8.data = Decimal(data['gross_income_months'][7])
-            if data['gross_income_months'][8] is not None: form.gross_income_month_9.data = Decimal(data['gross_income_months'][8])
-            if data['gross_income_months'][9] is not None: form.gross_income_month_10.data = Decimal(data['gross_income_months'][9])
-            if data['gross_income_months'][10] is not None: form.gross_income_month_11.data = Decimal(data['gross_income_months'][10])
-            if data['gross_income_months'][11] is not None: form.gross_income_month_12.data = Decimal(data['gross_income_months'][11])
-        form.has_mutterschaftsgeld.data = data.get('has_mutterschaftsgeld')
-        form.mutterschaftsgeld_amount.data = Decimal(data['mutterschaftsgeld_amount']) if data.get('mutterschaftsgeld_amount') else None
-        form.has_krankentagegeld.data = data.get('has_krankentagegeld')
-        form.krankentagegeld_amount.data = Decimal(data['krankentagegeld_amount']) if data.get('krankentagegeld_amount') else None
-        form.has_kurzarbeitergeld.data = data.get('has_kurzarbeitergeld')
-        form.kurzarbeitergeld_amount.data = Decimal(data['kurzarbeitergeld_amount']) if data.get('kurzarbeitergeld_amount') else None
-        form.has_elterngeld_older_child.data = data.get('has_elterngeld_older_child')
-        form.elterngeld_older_child_amount.data = Decimal(data['elterngeld_older_child_amount']) if data.get('elterngeld_older_child_amount') else None
-        form.has_other_income.data = data.get('has_other_income')
-        form.other_income_amount.data = Decimal(data['other_income_amount']) if data.get('other_income_amount') else None
-        form.has_self_employed_income.data = data.get('has_self_employed_income')
-        form.self_employment_activity_type.data = data.get('self_employment_activity_type')
-        form.profit_assessment_start_month.data = data.get('profit_assessment_start_month')
-        form.profit_assessment_start_year.data = data.get('profit_assessment_start_year')
-        form.profit_assessment_end_month.data = data.get('profit_assessment_end_month')
-        form.profit_assessment_end_year.data = data.get('profit_assessment_end_year')
-        form.profit_amount.data = Decimal(data['profit_amount']) if data.get('profit_amount') else None
-
+    elif request.method == 'GET':
+        session_codec.prefill(form, session, 'income_before_birth_info')
 
     return render_template('income_before_birth.html', form=form)
-    
+
+
+# ─── Elterngeld: split of the months between both parents ──────────────
+
+def _query_amount(name, default=None):
+    value = request.args.get(name, '').replace(',', '.').strip()
+    if not value:
+        return default
+    amount = float(value)
+    if not 0 <= amount < 1e6:
+        raise ValueError(f"{name} außerhalb des gültigen Bereichs")
+    return amount
+
+
+@app.route('/elterngeld/plan')
+def elterngeld_plan():
+    """
+    Best allocations of Basis, Plus and Partnerschaftsbonus months (elterngeld_optimizer.py).
+    The applicant's income comes from the session; the other parent's from
+    ?other_gross= (average monthly gross wage). ?applicant_after= and ?other_after=
+    are the net incomes while working part-time in Plus and bonus months.
+    """
+    # Imported here: NumPy is only needed once someone asks
+    from elterngeld_calc import calculate, estimate
+    from elterngeld_optimizer import DEFAULT_TOP, ParentAmounts, best_plans
+
+    data = session_codec.records(session)
+    if data['applicant_info'].get('other_parent_status') != 'both':
+        return jsonify(error="Nur wenn beide Elternteile Elterngeld beantragen."), 400
+    if not data['income_before_birth_info']:
+        return jsonify(error="Bitte geben Sie zuerst Ihr Einkommen vor der Geburt an."), 400
+    try:
+        other_gross = _query_amount('other_gross')
+        applicant_after = _query_amount('applicant_after', 0.0)
+        other_after = _query_amount('other_after', 0.0)
+        top = min(max(int(request.args.get('top', DEFAULT_TOP)), 1), 20)
+    except ValueError:
+        return jsonify(error="Ungültige Zahl in der Anfrage."), 400
+    if other_gross is None:
+        return jsonify(error="Bitte geben Sie das Einkommen des anderen Elternteils an (other_gross)."), 400
+
+    siblings = request.args.get('siblings', '').lower() in ('1', 'true', 'yes')
+    applicant = estimate(data, siblings=siblings)
+    other = calculate([[other_gross] * 12], siblings=siblings)
+    children = max(int(data['child_info'].get('multiple_births') or 1), 1)
+
+    parent_a = ParentAmounts.of(applicant.net_income, applicant_after, children, siblings)
+    parent_b = ParentAmounts.of(float(other.net_income[0]), other_after, children, siblings)
+    return jsonify(
+        applicant={'net_income': applicant.net_income, **parent_a._asdict()},
+        other_parent={'net_income': float(other.net_income[0]), **parent_b._asdict()},
+        plans=[plan.as_dict() for plan in best_plans(parent_a, parent_b, top)],
+    )
+
+
+# ─── Live validation of single fields ──────────────────────────────────
+
+@app.route('/validate/<step>', methods=['POST'])
+def validate_fields(step):
+    """
+    Check one field or a small group of a wizard step (field_validation.py):
+    {"fields": {name: value}, "check": [names]} → {"valid": ..., "errors": {name: [...]}, "undecided": [names]}.
+    Nothing is stored, so no CSRF token is needed.
+    """
+    # Imported here: only the pages with live validation call it
+    import field_validation
+
+    if step not in session_codec.CODECS:
+        abort(404)
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get('fields'), dict):
+        return jsonify(error="Erwartet: JSON mit 'fields'."), 400
+    check = body.get('check')
+    if check is not None and not (isinstance(check, list) and all(isinstance(name, str) for name in check)):
+        return jsonify(error="'check' muss eine Liste von Feldnamen sein."), 400
+    try:
+        return jsonify(field_validation.validate(step, body['fields'], check))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app(preload=False).run(debug=True)
@@ -0,0 +1,246 @@
+# batch_generate.py
+"""
+Batch generation: one filled Elterngeld PDF per input record.
+
+Records are shaped like the wizard's session (child_info, applicant_info,
+other_parent_info, bank_info, income_before_birth_info, ...):
+
+  JSONL  one object per line, e.g. {"id": "4711", "child_info": {"vorname": "Anna"}, ...}
+  CSV    one row per record, columns "<section>.<key>" (child_info.vorname, ...)
+         plus an optional "id" column
+
+    python batch_generate.py hr_export.jsonl --out pdfs/ --workers 8
+    python batch_generate.py hr_export.csv --out pdfs/ --resume
+
+Each record gets a file of its own, <id>.pdf; if an earlier record of the
+input already has that name (duplicate ids, "a/b" and "a_b"), the line number
+is added. Each worker process loads the template once. Progress is appended to
+<out>/progress.jsonl, so a run can be resumed with --resume; records that
+failed are listed in <out>/errors.jsonl.
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from field_mapping import SESSION_SECTIONS
+from pdf_appearance import get_resources
+from pdf_filler import fill_application, fill_application_parts
+from pdf_flatten import get_flatten_base
+from pdf_template import get_template
+
+DEFAULT_TEMPLATE = "Berlin-antrag-auf-elterngeld.pdf"
+PROGRESS_FILE = "progress.jsonl"
+ERRORS_FILE = "errors.jsonl"
+
+
+# ─── Input ──────────────────────────────────────────────────────────────
+
+def _csv_value(value: str):
+    # CSV kennt keine Booleans: true/false wie im Session-JSON behandeln
+    lowered = value.strip().lower()
+    if lowered in ('true', 'false'):
+        return lowered == 'true'
+    return value
+
+
+def read_records(path: str):
+    """Yield (line number, record id, record) from a .jsonl or .csv file."""
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                record = {}
+                for column, value in row.items():
+                    if column and '.' in column and value not in (None, ''):
+                        section, key = column.split('.', 1)
+                        record.setdefault(section, {})[key] = _csv_value(value)
+                yield line_no, row.get('id') or str(line_no - 1), record
+        return
+
+    with open(path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, str(line_no), e
+                continue
+            yield line_no, str(record.get('id') or line_no), record
+
+
+def output_name(record_id: str) -> str:
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', record_id).strip('._') + '.pdf'
+
+
+def unique_name(record_id: str, line_no: int, claimed: set) -> str:
+    """
+    output_name(), or with the line number added if another record of this input
+    already has that name ("a/b" and "a_b", duplicate ids, names differing in case).
+    Deterministic for the same input, so --resume finds the same files again.
+    """
+    name = output_name(record_id)
+    stem = name[:-len('.pdf')] or 'record'
+    candidates = [name] if name != '.pdf' else []
+    candidates += [f"{stem}-line{line_no}.pdf"] + [f"{stem}-line{line_no}-{n}.pdf" for n in range(2, 100)]
+    for candidate in candidates:
+        if candidate.casefold() not in claimed:
+            claimed.add(candidate.casefold())
+            return candidate
+    raise ValueError(f"no free output name for record {record_id!r} (line {line_no})")
+
+
+def read_progress(out_dir: str) -> set:
+    """(record id, file) of the records already written successfully by earlier runs."""
+    done = set()
+    path = os.path.join(out_dir, PROGRESS_FILE)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # half-written last line of an interrupted run
+                if entry.get('status') == 'ok' and os.path.exists(os.path.join(out_dir, entry['file'])):
+                    done.add((entry['id'], entry['file']))
+    return done
+
+
+# ─── Worker ─────────────────────────────────────────────────────────────
+
+_options = {}
+
+
+def _init_worker(options: dict):
+    """Runs once per worker process: load (decrypt, parse, index) the template."""
+    _options.update(options)
+    template = get_template(options['template'])
+    if options['appearances'] or options['flatten']:
+        get_resources(template)
+    if options['flatten']:
+        get_flatten_base(template)
+
+
+def _ready(_):
+    return os.getpid()
+
+
+def generate_one(task):
+    """Fill and write one record; returns a progress entry instead of raising."""
+    line_no, record_id, name, record = task
+    path = os.path.join(_options['out'], name)
+    part = f"{path}.{line_no}.part"        # own name per task, even if two runs share --out
+    entry = {'id': record_id, 'line': line_no, 'file': os.path.basename(path)}
+    started = time.perf_counter()
+    try:
+        if isinstance(record, Exception):
+            raise ValueError(f"invalid JSON: {record}")
+        for section in SESSION_SECTIONS:
+            if not isinstance(record.get(section) or {}, dict):
+                raise ValueError(f"'{section}' must be an object")
+
+        data = {section: record.get(section) or {} for section in SESSION_SECTIONS}
+        # Write to a temporary name first, so an interrupted run never leaves half a PDF behind
+        with open(part, 'wb') as f:
+            if _options['flatten']:
+                f.write(fill_application(_options['template'], data, appearances=True, flatten=True).getbuffer())
+            else:
+                for chunk in fill_application_parts(_options['template'], data, appearances=_options['appearances']):
+                    f.write(chunk)
+        os.replace(part, path)
+        entry['status'] = 'ok'
+        entry['bytes'] = os.path.getsize(path)
+    except Exception as e:
+        entry['status'] = 'error'
+        entry['error'] = f"{type(e).__name__}: {e}"
+        entry['traceback'] = traceback.format_exc(limit=5)
+        if os.path.exists(part):
+            os.unlink(part)
+    entry['ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return entry
+
+
+# ─── Driver ─────────────────────────────────────────────────────────────
+
+def run(input_path, out_dir, template, workers, resume=False, flatten=False, appearances=True, window=None):
+    """Generate all records; returns a summary dict."""
+    os.makedirs(out_dir, exist_ok=True)
+    done = read_progress(out_dir) if resume else set()
+    options = {'template': os.path.abspath(template), 'out': out_dir,
+               'flatten': flatten, 'appearances': appearances}
+    window = window or workers * 4     # tasks in flight: keeps memory flat for huge inputs
+
+    summary = {'ok': 0, 'error': 0, 'skipped': 0}
+    errors = []
+    mode = 'a' if resume else 'w'
+    with open(os.path.join(out_dir, PROGRESS_FILE), mode, encoding='utf-8') as progress, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(options,)) as pool:
+
+        def collect(futures):
+            for future in futures:
+                entry = future.result()
+                summary[entry['status']] += 1
+                if entry['status'] == 'error':
+                    errors.append(entry)
+                    print(f"  ✗ {entry['id']} (line {entry['line']}): {entry['error']}", file=sys.stderr)
+                progress.write(json.dumps({k: v for k, v in entry.items() if k != 'traceback'}) + '\n')
+                progress.flush()
+
+        # Start (and so initialise) the workers before the clock starts, so the rate shows steady-state throughput
+        list(pool.map(_ready, range(workers)))
+        started = time.perf_counter()
+        pending = set()
+        claimed = set()        # output names of this input, casefolded
+        for line_no, record_id, record in read_records(input_path):
+            name = unique_name(record_id, line_no, claimed)
+            if name != output_name(record_id):
+                print(f"  ! {record_id} (line {line_no}): id gives no free file name, writing {name}",
+                      file=sys.stderr)
+            if (record_id, name) in done:
+                summary['skipped'] += 1
+                continue
+            pending.add(pool.submit(generate_one, (line_no, record_id, name, record)))
+            if len(pending) >= window:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+        collect(wait(pending).done)
+        elapsed = time.perf_counter() - started
+
+    with open(os.path.join(out_dir, ERRORS_FILE), 'w', encoding='utf-8') as f:
+        for entry in errors:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    summary['seconds'] = round(elapsed, 2)
+    summary['docs_per_second'] = round(summary['ok'] / elapsed, 1) if elapsed else 0.0
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='records as .jsonl or .csv')
+    parser.add_argument('--out', default='batch_output', help='output directory (default: batch_output)')
+    parser.add_argument('--template', default=DEFAULT_TEMPLATE, help='PDF template')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--resume', action='store_true', help='skip records already written by an earlier run')
+    parser.add_argument('--flatten', action='store_true', help='write flattened, read-only PDFs')
+    parser.add_argument('--no-appearances', action='store_true',
+                        help='leave field rendering to the viewer (/NeedAppearances)')
+    args = parser.parse_args(argv)
+
+    summary = run(args.input, args.out, args.template, args.workers, resume=args.resume,
+                  flatten=args.flatten, appearances=not args.no_appearances)
+    print(f"{summary['ok']} written, {summary['error']} failed, {summary['skipped']} skipped "
+          f"in {summary['seconds']:.2f}s ({summary['docs_per_second']:.1f} docs/s)")
+    if summary['error']:
+        print(f"error report: {os.path.join(args.out, ERRORS_FILE)}")
+    return 1 if summary['error'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
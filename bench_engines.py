@@ -0,0 +1,257 @@
+# bench_engines.py
+"""
+Benchmark the registered fill engines (engines.py) against the bundled Berlin template.
+
+  pypdf     pdf_filler.fill_application          (copy-on-write template clone)
+  formfields fill_via_formfields.fill_elterngeld_acroform (pypdf writer clone)
+  pdfrw     pdf_fill.fill_elterngeld_form
+  overlay   fill_overlay.overlay_fill            (reportlab overlay stamped on the template clone)
+
+Every engine runs in its own Python process, so cold timings and peak RSS are not
+skewed by another engine's imports or caches. Per engine it reports import time,
+the first (cold) fill, p50/p95 of the warm fills, peak RSS, traced allocations per
+fill and the output size. Results are written as JSON for regression tracking.
+
+    python bench_engines.py --iterations 50 --output bench_results.json
+    python bench_engines.py --engines pypdf pdfrw
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from importlib.metadata import PackageNotFoundError, version
+
+from engines import available_engines, get_engine
+
+DEFAULT_TEMPLATE = "Berlin-antrag-auf-elterngeld.pdf"
+ENGINES = available_engines()
+LIBRARIES = ('pypdf', 'pdfrw', 'reportlab', 'pikepdf')
+
+
+# ─── Synthetic data ─────────────────────────────────────────────────────
+
+_FIRST = ('Anna', 'Jörg', 'Lena', 'Mehmet', 'Sophie', 'Lukas', 'Zoë', 'Paul')
+_LAST = ('Müller', 'Schmidt', 'Yılmaz', 'Weber', 'Schäfer', 'Becker')
+_STREETS = ('Hauptstraße', 'Karl-Marx-Allee', 'Schönhauser Allee', 'Torstraße')
+
+
+def synthetic_session(i: int) -> dict:
+    """A plausible, fully filled application; the same i always gives the same data."""
+    rnd = random.Random(i)
+    last = rnd.choice(_LAST)
+    born = rnd.random() < 0.9
+    return {
+        'eligibility': {'is_resident': True},
+        'child_info': {
+            'is_born': 'yes' if born else 'no',
+            'vorname': rnd.choice(_FIRST),
+            'nachname': last,
+            'geburtsdatum': f"{rnd.randint(1, 28):02d}.{rnd.randint(1, 12):02d}.2025",
+            'fruehgeboren': rnd.random() < 0.1,
+            'due_date': '01.03.2025',
+            'multiple_births': rnd.choice(['1', '1', '1', '2']),
+        },
+        'applicant_info': {
+            'vorname': rnd.choice(_FIRST),
+            'nachname': last,
+            'geburtsdatum': f"19{rnd.randint(75, 99)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+            'geschlecht': rnd.choice(['weiblich', 'männlich', 'divers']),
+            'steuer_id': ''.join(rnd.choice('0123456789') for _ in range(11)),
+            'address_street': rnd.choice(_STREETS),
+            'address_housenumber': str(rnd.randint(1, 200)),
+            'address_plz': f"1{rnd.randint(0, 4999):04d}",
+            'address_city': 'Berlin',
+            'lives_in_germany': 'yes',
+            'residency_start_date_type': 'birth',
+            'email': f"eltern{i}@example.org",
+            'telefon': f"030 {rnd.randint(1000000, 9999999)}",
+            'other_parent_status': 'both',
+        },
+        'other_parent_info': {
+            'vorname': rnd.choice(_FIRST),
+            'nachname': last,
+            'geburtsdatum': '1988-03-02',
+            'geschlecht': rnd.choice(['weiblich', 'männlich']),
+            'steuer_id': ''.join(rnd.choice('0123456789') for _ in range(11)),
+            'same_address_as_applicant': rnd.random() < 0.8,
+            'address_street': rnd.choice(_STREETS),
+            'address_housenumber': '7',
+            'address_plz': '10115',
+            'address_city': 'Berlin',
+        },
+        'bank_info': {
+            'iban': 'DE' + ''.join(rnd.choice('0123456789') for _ in range(20)),
+            'bic': 'DEUTDEFFXXX',
+            'own_account': 'yes',
+        },
+    }
+
+
+# ─── Engines ────────────────────────────────────────────────────────────
+
+def load_engine(name: str):
+    """Import an engine (see engines.py) and return fill(template_path, data, output_path)."""
+    engine = get_engine(name)
+    engine.load()
+
+    def fill(template_path, data, output_path):
+        with open(output_path, 'wb') as f:
+            for part in engine.fill_parts(template_path, data):
+                f.write(part)
+    return fill
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def measure(name: str, template_path: str, iterations: int, alloc_iterations: int) -> dict:
+    """Run one engine in this process (see --worker) and return its measurements."""
+    started = time.perf_counter()
+    fill = load_engine(name)
+    import_ms = (time.perf_counter() - started) * 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = os.path.join(tmp, 'out.pdf')
+
+        # Cold: first fill in a fresh process, template not yet decrypted or parsed
+        started = time.perf_counter()
+        fill(template_path, synthetic_session(0), output_path)
+        cold_ms = (time.perf_counter() - started) * 1000
+        output_bytes = os.path.getsize(output_path)
+
+        warm = []
+        for i in range(1, iterations + 1):
+            data = synthetic_session(i)
+            started = time.perf_counter()
+            fill(template_path, data, output_path)
+            warm.append((time.perf_counter() - started) * 1000)
+
+        # Allocations in separate runs: tracing slows everything down
+        tracemalloc.start()
+        peaks, blocks = [], []
+        for i in range(alloc_iterations):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            before_snapshot = tracemalloc.take_snapshot()
+            fill(template_path, synthetic_session(iterations + 1 + i), output_path)
+            _, peak = tracemalloc.get_traced_memory()
+            diff = tracemalloc.take_snapshot().compare_to(before_snapshot, 'filename')
+            peaks.append(peak - before)
+            blocks.append(sum(max(stat.count_diff, 0) for stat in diff))
+        tracemalloc.stop()
+
+    return {
+        'engine': name,
+        'iterations': iterations,
+        'import_ms': round(import_ms, 2),
+        'cold_ms': round(cold_ms, 2),
+        'warm_p50_ms': round(statistics.median(warm), 2),
+        'warm_p95_ms': round(_percentile(warm, 0.95), 2),
+        'warm_mean_ms': round(statistics.fmean(warm), 2),
+        'warm_min_ms': round(min(warm), 2),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'alloc_peak_kb': round(statistics.median(peaks) / 1024, 1),
+        'alloc_retained_blocks': int(statistics.median(blocks)),
+        'output_bytes': output_bytes,
+    }
+
+
+# ─── Driver ─────────────────────────────────────────────────────────────
+
+def _metadata(template_path: str) -> dict:
+    def lib_version(name):
+        try:
+            return version(name)
+        except PackageNotFoundError:
+            return None
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    with open(template_path, 'rb') as f:
+        template_sha = hashlib.sha256(f.read()).hexdigest()
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'libraries': {name: lib_version(name) for name in LIBRARIES},
+        'template': os.path.basename(template_path),
+        'template_sha256': template_sha,
+    }
+
+
+def run_engine(name: str, template_path: str, iterations: int, alloc_iterations: int) -> dict:
+    """Measure one engine in a fresh interpreter."""
+    command = [sys.executable, os.path.abspath(__file__), '--worker', name, '--template', template_path,
+               '--iterations', str(iterations), '--alloc-iterations', str(alloc_iterations)]
+    proc = subprocess.run(command, capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        return {'engine': name, 'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def print_table(results):
+    columns = (('engine', 'engine', '{}'), ('import_ms', 'import ms', '{:.0f}'), ('cold_ms', 'cold ms', '{:.0f}'),
+               ('warm_p50_ms', 'p50 ms', '{:.1f}'), ('warm_p95_ms', 'p95 ms', '{:.1f}'),
+               ('peak_rss_mb', 'RSS MB', '{:.0f}'), ('alloc_peak_kb', 'alloc KB', '{:.0f}'),
+               ('output_bytes', 'output KB', '{}'))
+    print("  ".join(f"{title:>10}" for _, title, _ in columns))
+    for result in results:
+        if 'error' in result:
+            print(f"{result['engine']:>10}  error: {result['error']}")
+            continue
+        cells = []
+        for key, _, fmt in columns:
+            value = result[key] // 1024 if key == 'output_bytes' else result[key]
+            cells.append(f"{fmt.format(value):>10}")
+        print("  ".join(cells))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES))
+    parser.add_argument('--template', default=DEFAULT_TEMPLATE)
+    parser.add_argument('--iterations', type=int, default=30, help='warm fills per engine')
+    parser.add_argument('--alloc-iterations', type=int, default=3, help='fills traced with tracemalloc')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--worker', choices=ENGINES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, args.template, args.iterations, args.alloc_iterations)))
+        return 0
+
+    results = []
+    for name in args.engines:
+        print(f"… {name}", file=sys.stderr)
+        results.append(run_engine(name, args.template, args.iterations, args.alloc_iterations))
+    print_table(results)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'meta': _metadata(args.template), 'results': results}, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"results written to {args.output}")
+    return 1 if any('error' in result for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,282 @@
+# elterngeld_calc.py
+"""
+Elterngeld amount from the income before birth (BEEG §§ 2–2f, 4a), vectorized
+with NumPy: every quantity is an array with one entry per household, so a
+batch of thousands costs about as much as the single household in the wizard.
+
+    result = estimate(session)                     # one wizard session → floats
+    columns = households(records)                  # many records → arrays
+    result = calculate(**columns)                  # arrays of Basiselterngeld, ElterngeldPlus, ...
+
+    python elterngeld_calc.py hr_export.jsonl      # batch, one JSON line per record
+
+Steps, per household and month:
+
+  1. Einkommen: mean gross wage of the 12 assessment months minus 1/12 of the
+     Arbeitnehmer-Pauschbetrag (§2c), plus the profit per month of the profit
+     period (§2d). Wage replacements (Mutterschaftsgeld, Kurzarbeitergeld, ...)
+     are no income under §2 Abs. 1 and are left out.
+  2. Abzüge für Steuern (§2e): income tax after the §32a EStG tariff on the
+     annualized income, Solidaritätszuschlag and optionally 8 % church tax.
+     The Vorsorgepauschale is not deducted, so the tax is a little high and
+     the estimate errs on the low side.
+  3. Abzüge für Sozialabgaben (§2f): 21 % flat (9 % KV/PV, 10 % RV, 2 % AV)
+     on wages above the Minijob limit.
+  4. Ersatzrate 67 %; +0.1 points per 2 € below 1,000 € (up to 100 %),
+     −0.1 points per 2 € above 1,200 € (down to 65 %). Income counts up to 2,770 €.
+  5. Basiselterngeld between 300 € and 1,800 €, plus Geschwisterbonus (10 %,
+     at least 75 €) and Mehrlingszuschlag (300 € per additional child).
+     ElterngeldPlus is half of it (no income after birth).
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+# ─── Statutory amounts ──────────────────────────────────────────────────
+
+WERBUNGSKOSTEN_MONTH = 1230 / 12     # Arbeitnehmer-Pauschbetrag §9a EStG, per month
+SOZIALABGABEN_RATE = 0.21            # §2f Abs. 2: 9 % + 10 % + 2 %
+MINIJOB_LIMIT = 520.0                # wages up to this are free of social insurance
+CHURCH_TAX_RATE = 0.08               # §2e Abs. 5
+SOLI_RATE, SOLI_TAPER = 0.055, 0.119
+
+INCOME_CAP = 2770.0                  # income above this does not raise Elterngeld
+BASE_RATE, MAX_RATE, MIN_RATE = 0.67, 1.00, 0.65
+LOW_INCOME, HIGH_INCOME = 1000.0, 1200.0
+RATE_STEP = 0.001                    # 0.1 percentage points …
+INCOME_STEP = 2.0                    # … per full 2 € below LOW_INCOME / above HIGH_INCOME
+
+BASIS_MIN, BASIS_MAX = 300.0, 1800.0
+SIBLING_RATE, SIBLING_MIN = 0.10, 75.0
+MULTIPLE_BIRTH_BONUS = 300.0         # per additional child
+
+
+class TaxTariff(NamedTuple):
+    """§32a EStG for one year; zone 2 and 3 are the progressive polynomials."""
+    year: int
+    basic_allowance: float    # Grundfreibetrag
+    zone2_end: float
+    zone2_a: float
+    zone3_end: float
+    zone3_a: float
+    zone3_c: float
+    zone4_end: float
+    zone4_c: float
+    zone5_c: float
+    soli_exemption: float     # Freigrenze of the Solidaritätszuschlag (single assessment)
+
+
+TARIFF_2023 = TaxTariff(2023, 10908, 15999, 979.18, 62809, 192.59, 966.53, 277825, 9972.98, 18307.73, 17543)
+TARIFFS = {2023: TARIFF_2023}
+DEFAULT_TARIFF = TARIFF_2023
+
+
+class Elterngeld(NamedTuple):
+    """Per household (arrays, or floats from estimate()); amounts in € per month."""
+    gross: object             # Einkommen before deductions
+    taxes: object             # income tax + Soli + church tax
+    social: object            # Sozialabgaben
+    net_income: object        # Einkommen aus Erwerbstätigkeit before birth
+    rate: object              # Ersatzrate
+    basis: object             # Basiselterngeld incl. bonuses
+    plus: object              # ElterngeldPlus incl. bonuses
+
+    def as_dict(self) -> dict:
+        return {name: _plain(value) for name, value in self._asdict().items()}
+
+
+def _plain(value):
+    value = np.asarray(value)
+    return value.item() if value.ndim == 0 else value.tolist()
+
+
+def _cents(amount):
+    # Kaufmännisch runden (np.round rundet auf die gerade Ziffer)
+    return np.floor(np.asarray(amount, dtype=float) * 100 + 0.5) / 100
+
+
+# ─── Calculation ────────────────────────────────────────────────────────
+
+def income_tax(taxable, tariff: TaxTariff = DEFAULT_TARIFF):
+    """§32a EStG for annual taxable income (array), in whole euros."""
+    x = np.floor(np.maximum(np.asarray(taxable, dtype=float), 0))
+    y = (x - tariff.basic_allowance) / 10000
+    z = (x - tariff.zone2_end) / 10000
+    tax = np.select(
+        [x <= tariff.basic_allowance, x <= tariff.zone2_end, x <= tariff.zone3_end, x <= tariff.zone4_end],
+        [0.0, (tariff.zone2_a * y + 1400) * y, (tariff.zone3_a * z + 2397) * z + tariff.zone3_c,
+         0.42 * x - tariff.zone4_c],
+        0.45 * x - tariff.zone5_c,
+    )
+    return np.floor(tax)
+
+
+def solidarity_surcharge(tax, exemption: float):
+    """5.5 % of the income tax above the Freigrenze, phased in at 11.9 % of the excess."""
+    tax = np.asarray(tax, dtype=float)
+    return np.where(tax <= exemption, 0.0, np.minimum(SOLI_RATE * tax, SOLI_TAPER * (tax - exemption)))
+
+
+def replacement_rate(net_income):
+    """Ersatzrate for the (capped) monthly net income before birth."""
+    net = np.asarray(net_income, dtype=float)
+    below = np.floor(np.maximum(LOW_INCOME - net, 0) / INCOME_STEP)
+    above = np.floor(np.maximum(net - HIGH_INCOME, 0) / INCOME_STEP)
+    return np.clip(BASE_RATE + below * RATE_STEP - above * RATE_STEP, MIN_RATE, MAX_RATE)
+
+
+def calculate(wages, profit=0.0, children=1, siblings=False, church_tax=False, splitting=False,
+              tariff: TaxTariff = DEFAULT_TARIFF) -> Elterngeld:
+    """
+    wages: gross wage per assessment month, shape (n, 12), NaN/0 for months without;
+    profit: profit per month from self-employment, shape (n,);
+    children: children born (Mehrlinge > 1); siblings: Geschwisterbonus applies;
+    church_tax: member of a church; splitting: Steuerklasse III (Splittingtarif).
+    Scalars broadcast against the household axis.
+    """
+    wages = np.atleast_2d(np.nan_to_num(np.asarray(wages, dtype=float)))
+    n = wages.shape[0]
+    profit = np.broadcast_to(np.asarray(profit, dtype=float), (n,))
+    children = np.broadcast_to(np.asarray(children, dtype=float), (n,))
+    siblings = np.broadcast_to(np.asarray(siblings, dtype=bool), (n,))
+    church_tax = np.broadcast_to(np.asarray(church_tax, dtype=bool), (n,))
+    splitting = np.broadcast_to(np.asarray(splitting, dtype=bool), (n,))
+
+    # 1. Einkommen
+    wage = wages.mean(axis=1)
+    wage_income = np.where(wage > 0, np.maximum(wage - WERBUNGSKOSTEN_MONTH, 0), 0.0)
+    gross = wage_income + np.maximum(profit, 0)
+
+    # 2. Steuern: tariff on the annual income; splitting = twice the tax on half of it
+    annual = gross * 12
+    tax = np.where(splitting, 2 * income_tax(annual / 2, tariff), income_tax(annual, tariff))
+    soli = solidarity_surcharge(tax, np.where(splitting, 2 * tariff.soli_exemption, tariff.soli_exemption))
+    taxes = (tax + soli + np.where(church_tax, CHURCH_TAX_RATE * tax, 0.0)) / 12
+
+    # 3. Sozialabgaben on wages only
+    social = np.where(wage > MINIJOB_LIMIT, SOZIALABGABEN_RATE * wage_income, 0.0)
+
+    net_income = _cents(np.maximum(gross - taxes - social, 0))
+
+    # 4./5. Ersatzrate, Mindest- und Höchstbetrag, Zuschläge
+    rate = replacement_rate(np.minimum(net_income, INCOME_CAP))
+    basis = monthly_amount(net_income, children=children, siblings=siblings)
+    plus = monthly_amount(net_income, plus=True, children=children, siblings=siblings)
+    return Elterngeld(_cents(gross), _cents(taxes), _cents(social), net_income, rate, basis, plus)
+
+
+def monthly_amount(net_before, net_after=0.0, plus=False, children=1, siblings=False):
+    """
+    Elterngeld for one Lebensmonat (arrays broadcast): the Ersatzrate of the
+    income before birth applied to what is lost by the income after birth (§2
+    Abs. 3), both counted up to INCOME_CAP. Basiselterngeld is kept between
+    300 and 1,800 €. ElterngeldPlus is at most half of the Basiselterngeld
+    without income after birth (§4a Abs. 2), with minimum and bonuses halved.
+    """
+    before = np.minimum(np.asarray(net_before, dtype=float), INCOME_CAP)
+    after = np.minimum(np.asarray(net_after, dtype=float), INCOME_CAP)
+    rate = replacement_rate(before)
+    amount = _cents(rate * np.maximum(before - after, 0))
+    share = 0.5 if plus else 1.0
+    if plus:
+        amount = np.minimum(amount, _cents(np.clip(_cents(rate * before), BASIS_MIN, BASIS_MAX) / 2))
+    amount = np.clip(amount, BASIS_MIN * share, BASIS_MAX * share)
+    amount = amount + np.where(siblings, np.maximum(_cents(SIBLING_RATE * amount), SIBLING_MIN * share), 0.0)
+    amount = amount + np.maximum(np.asarray(children, dtype=float) - 1, 0) * MULTIPLE_BIRTH_BONUS * share
+    return _cents(amount)
+
+
+# ─── Session records ────────────────────────────────────────────────────
+
+def _amount(value) -> float:
+    try:
+        return float(value) if value not in (None, '') else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _months(start_month, start_year, end_month, end_year) -> int:
+    """Length of a month range given as form strings; 12 if incomplete."""
+    try:
+        months = (int(end_year) - int(start_year)) * 12 + int(end_month) - int(start_month) + 1
+    except (TypeError, ValueError):
+        return 12
+    return months if months > 0 else 12
+
+
+def _record_row(record: dict):
+    income = record.get('income_before_birth_info') or {}
+    months = income.get('gross_income_months') or []
+    if income.get('has_employed_income') == 'yes':
+        wages = [_amount(v) for v in months[:12]] + [0.0] * (12 - len(months[:12]))
+    else:
+        wages = [0.0] * 12
+    profit = 0.0
+    if income.get('has_self_employed_income') == 'yes':
+        period = _months(income.get('profit_assessment_start_month'), income.get('profit_assessment_start_year'),
+                         income.get('profit_assessment_end_month'), income.get('profit_assessment_end_year'))
+        profit = _amount(income.get('profit_amount')) / period
+    child = record.get('child_info') or {}
+    try:
+        children = max(int(child.get('multiple_births') or 1), 1)
+    except (TypeError, ValueError):
+        children = 1
+    return wages, profit, children
+
+
+def households(records, siblings=False, church_tax=False, splitting=False) -> dict:
+    """calculate() keyword arguments for session-shaped records (income_before_birth_info, child_info)."""
+    rows = [_record_row(record) for record in records]
+    return {
+        'wages': np.array([row[0] for row in rows], dtype=float).reshape(len(rows), 12),
+        'profit': np.array([row[1] for row in rows], dtype=float),
+        'children': np.array([row[2] for row in rows], dtype=float),
+        'siblings': siblings,
+        'church_tax': church_tax,
+        'splitting': splitting,
+    }
+
+
+def estimate(session: dict, siblings=False, church_tax=False, splitting=False) -> Elterngeld:
+    """calculate() for one wizard session; the fields are plain floats."""
+    result = calculate(**households([session], siblings, church_tax, splitting))
+    return Elterngeld(*(float(np.asarray(value)[0]) for value in result))
+
+
+# ─── CLI ────────────────────────────────────────────────────────────────
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='records as .jsonl or .csv (see batch_generate.py)')
+    parser.add_argument('--siblings', action='store_true', help='Geschwisterbonus for every record')
+    parser.add_argument('--church-tax', action='store_true', help='deduct 8 %% church tax')
+    parser.add_argument('--splitting', action='store_true', help='Splittingtarif (Steuerklasse III)')
+    args = parser.parse_args(argv)
+
+    from batch_generate import read_records
+    ids, records = [], []
+    for _, record_id, record in read_records(args.input):
+        ids.append(record_id)
+        records.append(record)
+    if not records:
+        print(f"No records in {args.input}", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    result = calculate(**households(records, args.siblings, args.church_tax, args.splitting))
+    seconds = time.perf_counter() - started
+
+    columns = result.as_dict()
+    for i, record_id in enumerate(ids):
+        print(json.dumps({'id': record_id, **{name: values[i] for name, values in columns.items()}}))
+    print(f"{len(records)} households in {seconds * 1000:.1f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+# elterngeld_optimizer.py
+"""
+Best split of Basiselterngeld, ElterngeldPlus and Partnerschaftsbonus months
+between two parents (other_parent_status == 'both').
+
+An allocation is (Basis months, Plus months) per parent plus the number of
+Partnerschaftsbonus months both take together. Allowed are those that keep
+to BEEG §4 and §4b:
+
+  - each parent at most 12 Basis months, one Basis month = two Plus months
+  - together 14 (with the two Partnermonate) if both take Elterngeld, else 12
+  - a parent who takes Elterngeld takes it for at least 2 Lebensmonate
+  - Partnerschaftsbonus: 2 to 4 months, both parents at the same time, both
+    working part-time (24–32 hours a week; here: both have income after birth)
+
+There are only a few tens of thousands of them, independent of income, so the
+table is built once per process. A query then prices every allocation with one
+matrix product and ranks them: a few milliseconds, and identical what-if
+queries are answered from a cache. Months are counted, not scheduled (Basis
+only in Lebensmonate 1–14, Plus after month 14 without gaps).
+
+    plans = best_plans(ParentAmounts.of(2100, 1200), ParentAmounts.of(2600), top=5)
+"""
+
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+
+from elterngeld_calc import monthly_amount
+
+MAX_BASIS_PER_PARENT = 12
+MAX_BASIS_TOGETHER = 14        # incl. 2 Partnermonate
+MAX_BASIS_ALONE = 12
+MIN_MONTHS = 2
+BONUS_MONTHS = (2, 3, 4)
+DEFAULT_TOP = 5
+
+
+class ParentAmounts(NamedTuple):
+    """Monthly Elterngeld of one parent: Basis without work, Plus (and bonus) while working part-time."""
+    basis: float
+    plus: float
+    works_part_time: bool
+
+    @classmethod
+    def of(cls, net_before: float, net_after: float = 0.0, children: int = 1, siblings: bool = False):
+        """From the net income before birth and during the part-time Plus months."""
+        basis = monthly_amount(net_before, children=children, siblings=siblings)
+        plus = monthly_amount(net_before, net_after, plus=True, children=children, siblings=siblings)
+        return cls(float(basis), float(plus), net_after > 0)
+
+
+class Allocation(NamedTuple):
+    basis_a: int
+    plus_a: int
+    basis_b: int
+    plus_b: int
+    bonus: int                 # Partnerschaftsbonus months, for each parent
+    total: float               # € over the whole Elterngeld period, both parents
+
+    @property
+    def months(self) -> int:
+        """Lebensmonate with Elterngeld if the parents take their months one after the other."""
+        return self.basis_a + self.plus_a + self.basis_b + self.plus_b + self.bonus
+
+    def as_dict(self) -> dict:
+        return {
+            'applicant': {'basis_months': self.basis_a, 'plus_months': self.plus_a, 'bonus_months': self.bonus},
+            'other_parent': {'basis_months': self.basis_b, 'plus_months': self.plus_b, 'bonus_months': self.bonus},
+            'months': self.months,
+            'total': self.total,
+        }
+
+
+# ─── Allowed allocations ────────────────────────────────────────────────
+
+@lru_cache(maxsize=2)
+def allocations(with_bonus: bool) -> np.ndarray:
+    """All allowed (basis_a, plus_a, basis_b, plus_b, bonus) as an int array, one row each."""
+    # One parent first: (Basis, Plus) within the per-parent limits, none or at least MIN_MONTHS
+    basis, plus = np.meshgrid(np.arange(MAX_BASIS_PER_PARENT + 1), np.arange(2 * MAX_BASIS_PER_PARENT + 1),
+                              indexing='ij')
+    single = np.stack([basis.ravel(), plus.ravel()], axis=1)
+    months = single.sum(axis=1)
+    single = single[(single[:, 0] * 2 + single[:, 1] <= 2 * MAX_BASIS_PER_PARENT)
+                    & ((months == 0) | (months >= MIN_MONTHS))]
+
+    # Both parents: counted in Plus months (half Basis months), the joint limit depends on who takes any
+    i, j = np.divmod(np.arange(len(single) ** 2), len(single))
+    a, b = single[i], single[j]
+    used = a[:, 0] * 2 + a[:, 1] + b[:, 0] * 2 + b[:, 1]
+    both = (a.sum(axis=1) > 0) & (b.sum(axis=1) > 0)
+    keep = used <= 2 * np.where(both, MAX_BASIS_TOGETHER, MAX_BASIS_ALONE)
+    pairs = np.concatenate([a[keep], b[keep]], axis=1)
+
+    bonus = (0,) + (BONUS_MONTHS if with_bonus else ())
+    table = np.concatenate([np.column_stack([pairs, np.full(len(pairs), k)]) for k in bonus])
+    table.setflags(write=False)
+    return table
+
+
+# ─── Search ─────────────────────────────────────────────────────────────
+
+def best_plans(parent_a: ParentAmounts, parent_b: ParentAmounts, top: int = DEFAULT_TOP) -> tuple:
+    """
+    The top allocations by total payout, best first. Allocations with the same
+    total count once, represented by the one covering the most Lebensmonate.
+    """
+    return _best_plans(tuple(parent_a), tuple(parent_b), top)
+
+
+@lru_cache(maxsize=1024)
+def _best_plans(parent_a: tuple, parent_b: tuple, top: int) -> tuple:
+    a, b = ParentAmounts(*parent_a), ParentAmounts(*parent_b)
+    table = allocations(a.works_part_time and b.works_part_time)
+    prices = np.array([a.basis, a.plus, b.basis, b.plus, a.plus + b.plus])
+    totals = np.round(table @ prices, 2)
+    months = table[:, :4].sum(axis=1) + table[:, 4]
+
+    # Highest total first; for equal totals the longest, then the one with fewer Plus months
+    order = np.lexsort((table[:, 1] + table[:, 3], -months, -totals))
+    _, first = np.unique(-totals[order], return_index=True)
+    best = order[np.sort(first)][:top]
+    return tuple(Allocation(*(int(v) for v in table[i]), float(totals[i])) for i in best)
+
+
+def clear_cache() -> None:
+    _best_plans.cache_clear()
@@ -0,0 +1,151 @@
+# engines.py
+"""
+Common interface for the PDF fill engines.
+
+Every engine takes the template path plus session-shaped application data
+(child_info, applicant_info, ...) and returns the filled PDF as bytes:
+
+    engine = get_engine('pdfrw')
+    pdf_bytes = engine.fill("Berlin-antrag-auf-elterngeld.pdf", data)
+
+plan= selects the template's field mapping (default: field_mapping.BERLIN_PLAN).
+
+Engines are registered by name; the app picks one through the PDF_ENGINE setting
+or ?engine=<name>. The engine modules are only imported when an engine is used.
+"""
+
+import importlib
+import io
+from abc import ABC, abstractmethod
+
+from field_mapping import BERLIN_PLAN
+
+DEFAULT_ENGINE = 'pypdf'
+
+
+class FillEngine(ABC):
+    """Base class: template + application data in, PDF bytes out. Subclasses implement fill()."""
+
+    name = None
+    description = ""
+    module = None             # module the engine lives in, imported on first use
+    options = frozenset()     # keyword options this engine understands
+
+    def load(self) -> None:
+        """Import the engine's module now instead of on the first fill."""
+        importlib.import_module(self.module)
+
+    def check_options(self, options: dict) -> None:
+        unknown = set(options) - self.options
+        if unknown:
+            raise ValueError(f"Engine {self.name!r} does not support: {', '.join(sorted(unknown))}")
+
+    @abstractmethod
+    def fill(self, template_path: str, data: dict, plan=BERLIN_PLAN, **options) -> bytes:
+        ...
+
+    def fill_parts(self, template_path: str, data: dict, plan=BERLIN_PLAN, **options):
+        """The document as a sequence of byte chunks, to stream without joining them first."""
+        return [self.fill(template_path, data, plan, **options)]
+
+
+_engines = {}
+# Former names, still accepted in PDF_ENGINE / ?engine=
+_aliases = {'pypdf2': 'formfields'}
+
+
+def register(engine_class):
+    """Class decorator: add an engine to the registry under its name."""
+    _engines[engine_class.name] = engine_class()
+    return engine_class
+
+
+def get_engine(name: str = None) -> FillEngine:
+    name = name or DEFAULT_ENGINE
+    name = _aliases.get(name, name)
+    try:
+        return _engines[name]
+    except KeyError:
+        raise ValueError(f"Unknown PDF engine {name!r} (available: {', '.join(available_engines())})") from None
+
+
+def available_engines() -> tuple:
+    return tuple(_engines)
+
+
+def fill_pdf(template_path: str, data: dict, engine: str = None, plan=BERLIN_PLAN, **options) -> bytes:
+    """Fill with the named engine (default: DEFAULT_ENGINE)."""
+    selected = get_engine(engine)
+    selected.check_options(options)
+    return selected.fill(template_path, data, plan, **options)
+
+
+# ─── Registered engines ─────────────────────────────────────────────────
+
+@register
+class PypdfEngine(FillEngine):
+    name = 'pypdf'
+    module = 'pdf_filler'
+    description = "pdf_filler: copy-on-write clone of the cached template"
+    options = frozenset({'appearances', 'flatten', 'incremental'})
+
+    def fill(self, template_path, data, plan=BERLIN_PLAN, **options):
+        from pdf_filler import fill_application
+        self.check_options(options)
+        return fill_application(template_path, data, plan, **options).getvalue()
+
+    def fill_parts(self, template_path, data, plan=BERLIN_PLAN, **options):
+        from pdf_filler import fill_application_parts
+        self.check_options(options)
+        if options.pop('incremental', False) and not options.get('flatten'):
+            # Shared template bytes + this request's update section, never joined
+            return list(fill_application_parts(template_path, data, plan,
+                                               appearances=options.get('appearances', False)))
+        return [self.fill(template_path, data, plan, **options)]
+
+
+class _FileEngine(FillEngine):
+    """Adapter for the engines that write to a path or binary stream. Subclasses implement write()."""
+
+    @abstractmethod
+    def write(self, template_path, data, output, plan):
+        ...
+
+    def fill(self, template_path, data, plan=BERLIN_PLAN, **options):
+        self.check_options(options)
+        output = io.BytesIO()
+        self.write(template_path, data, output, plan)
+        return output.getvalue()
+
+
+@register
+class FormFieldsEngine(_FileEngine):
+    name = 'formfields'
+    module = 'fill_via_formfields'
+    description = "fill_via_formfields: pypdf PdfWriter.update_page_form_field_values"
+
+    def write(self, template_path, data, output, plan):
+        from fill_via_formfields import fill_elterngeld_acroform
+        fill_elterngeld_acroform(template_path, output, data, plan)
+
+
+@register
+class PdfrwEngine(_FileEngine):
+    name = 'pdfrw'
+    module = 'pdf_fill'
+    description = "pdf_fill: pdfrw widget annotations, read-only fields"
+
+    def write(self, template_path, data, output, plan):
+        from pdf_fill import fill_elterngeld_form
+        fill_elterngeld_form(template_path, output, data, plan)
+
+
+@register
+class OverlayEngine(_FileEngine):
+    name = 'overlay'
+    module = 'fill_overlay'
+    description = "fill_overlay: reportlab text overlay stamped onto the pages with data"
+
+    def write(self, template_path, data, output, plan):
+        from fill_overlay import overlay_fill
+        overlay_fill(template_path, output, data, plan)
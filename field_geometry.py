@@ -0,0 +1,239 @@
+# field_geometry.py
+"""
+Widget geometry of a form template: for every field, where each of its widgets sits
+(page, /Rect), the /DA font size and how text is laid out (multiline, quadding).
+
+Extracting it needs the decrypted template and a walk over the AcroForm, so it is
+done once and cached as a compact JSON table next to the template:
+
+    python field_geometry.py Berlin-antrag-auf-elterngeld.pdf
+        → Berlin-antrag-auf-elterngeld.geometry.json
+
+At runtime get_geometry(template_path) loads that table (checked against the
+template's SHA-256) or, if it is missing or stale, extracts it once per process.
+The overlay engine (fill_overlay.py) places its text from this table.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from typing import NamedTuple, Optional, Tuple
+
+FORMAT_VERSION = 1
+GEOMETRY_SUFFIX = ".geometry.json"
+
+# Multiline text field flag (PDF 32000-1, Table 228)
+_MULTILINE = 1 << 12
+
+
+class WidgetBox(NamedTuple):
+    page: int                # page index
+    x1: float                # /Rect, normalised so that x1 < x2 and y1 < y2
+    y1: float
+    x2: float
+    y2: float
+    font_size: float         # size from /DA, 0 = auto
+    quadding: int            # 0 left, 1 centred, 2 right
+    on_state: Optional[str]  # buttons: export value ("/On", "/Ja", ...); None for text
+
+    @property
+    def width(self) -> float:
+        return self.x2 - self.x1
+
+    @property
+    def height(self) -> float:
+        return self.y2 - self.y1
+
+
+class FieldGeometry(NamedTuple):
+    name: str
+    field_type: str          # "/Tx", "/Btn", "/Ch" or "/Sig"
+    flags: int
+    widgets: Tuple[WidgetBox, ...]
+
+    @property
+    def multiline(self) -> bool:
+        return self.field_type == "/Tx" and bool(self.flags & _MULTILINE)
+
+
+class GeometryTable:
+    """{field name: FieldGeometry} for one template, identified by its SHA-256."""
+
+    def __init__(self, digest: str, fields: dict):
+        self.digest = digest
+        self.fields = fields
+
+    def __getitem__(self, name: str) -> FieldGeometry:
+        return self.fields[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.fields
+
+    def __len__(self) -> int:
+        return len(self.fields)
+
+    def get(self, name: str, default=None):
+        return self.fields.get(name, default)
+
+    # Compact form: one row per widget, [page, x1, y1, x2, y2, font size, quadding, on-state]
+    def to_json(self) -> dict:
+        return {
+            "format": FORMAT_VERSION,
+            "template_sha256": self.digest,
+            "fields": {
+                name: [field.field_type, field.flags, [list(box) for box in field.widgets]]
+                for name, field in self.fields.items()
+            },
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "GeometryTable":
+        if data.get("format") != FORMAT_VERSION:
+            raise ValueError(f"unsupported geometry table format {data.get('format')!r}")
+        fields = {
+            name: FieldGeometry(name, field_type, flags, tuple(WidgetBox(*row) for row in rows))
+            for name, (field_type, flags, rows) in data["fields"].items()
+        }
+        return cls(data["template_sha256"], fields)
+
+
+# ─── Extraction ─────────────────────────────────────────────────────────
+
+def _da_font_size(da: str) -> float:
+    tokens = str(da or "").split()
+    for i in range(len(tokens) - 1, 1, -1):
+        if tokens[i] == "Tf":
+            try:
+                return float(tokens[i - 1])
+            except ValueError:
+                break
+    return 0.0
+
+
+def _round(value) -> float:
+    return round(float(value), 2)
+
+
+def extract_geometry(template) -> GeometryTable:
+    """Build the table from a PdfTemplate (pdf_template.get_template)."""
+    acroform = template.reader.trailer["/Root"].get("/AcroForm", {})
+    default_da = acroform.get("/DA", "")
+    default_q = int(acroform.get("/Q", 0))
+
+    fields = {}
+    for name, info in template.fields.items():
+        field = info.ref.get_object()
+        boxes = []
+        for widget_info in info.widgets:
+            widget = widget_info.ref.get_object()
+            if "/Rect" not in widget:
+                continue
+            x1, y1, x2, y2 = (float(v) for v in widget["/Rect"])
+            da = widget.get("/DA") or field.get("/DA") or default_da
+            quadding = int(widget.get("/Q", field.get("/Q", default_q)))
+            boxes.append(WidgetBox(
+                widget_info.page,
+                _round(min(x1, x2)), _round(min(y1, y2)), _round(max(x1, x2)), _round(max(y1, y2)),
+                _da_font_size(da), quadding, widget_info.on_state,
+            ))
+        fields[name] = FieldGeometry(name, str(info.field_type), info.flags, tuple(boxes))
+    return GeometryTable(template.digest, fields)
+
+
+def table_path(template_path: str) -> str:
+    return os.path.splitext(template_path)[0] + GEOMETRY_SUFFIX
+
+
+def write_table(table: GeometryTable, path: str) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(table.to_json(), f, ensure_ascii=False, separators=(",", ":"))
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def read_table(path: str) -> GeometryTable:
+    with open(path, encoding="utf-8") as f:
+        return GeometryTable.from_json(json.load(f))
+
+
+# ─── Process-level cache ────────────────────────────────────────────────
+
+_tables = {}
+_lock = threading.Lock()
+
+
+def get_geometry(template_path: str) -> GeometryTable:
+    """
+    Return the geometry table for a template: from the cached table file if it
+    matches the template's hash, otherwise extracted from the template itself.
+    Cached per process until the template's mtime/size changes.
+    """
+    # Imported here: loading a table file must not need the PDF libraries
+    from pdf_template import _sha256
+
+    path = os.path.abspath(template_path)
+    st = os.stat(path)
+    key = (st.st_mtime, st.st_size)
+    cached = _tables.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with _lock:
+        cached = _tables.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        digest = _sha256(path)
+        table = None
+        try:
+            table = read_table(table_path(path))
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        if table is None or table.digest != digest:
+            from pdf_template import get_template
+            table = extract_geometry(get_template(path))
+        _tables[path] = (key, table)
+        return table
+
+
+def evict(template_path: str) -> None:
+    _tables.pop(os.path.abspath(template_path), None)
+
+
+def clear_cache() -> None:
+    with _lock:
+        _tables.clear()
+
+
+# ─── CLI ────────────────────────────────────────────────────────────────
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('template', help='PDF form template')
+    parser.add_argument('--output', help=f'table file (default: <template>{GEOMETRY_SUFFIX})')
+    parser.add_argument('--show', nargs='*', metavar='FIELD', help='print the geometry of these fields (all if none given)')
+    args = parser.parse_args(argv)
+
+    from pdf_template import get_template
+    table = extract_geometry(get_template(args.template))
+    output = args.output or table_path(args.template)
+    write_table(table, output)
+    widgets = sum(len(field.widgets) for field in table.fields.values())
+    print(f"{len(table)} fields, {widgets} widgets → {output} ({os.path.getsize(output) // 1024} KB)")
+
+    if args.show is not None:
+        for name in args.show or table.fields:
+            field = table.get(name)
+            if field is None:
+                print(f"  {name}: not in the form", file=sys.stderr)
+                continue
+            for box in field.widgets:
+                print(f"  {name} [{field.field_type}] page {box.page + 1} "
+                      f"rect ({box.x1}, {box.y1}, {box.x2}, {box.y2}) size {box.font_size or 'auto'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
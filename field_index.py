@@ -0,0 +1,88 @@
+# field_index.py
+
+from typing import NamedTuple, Optional, Tuple
+
+from pypdf.generic import IndirectObject
+
+
+class Widget(NamedTuple):
+    page: int            # page index
+    annot_pos: int       # position in the page's /Annots array
+    ref: IndirectObject  # the widget annotation
+    on_state: Optional[str]  # export value for buttons ("/On", "/Ja", ...), None for text
+
+
+class FieldInfo(NamedTuple):
+    name: str            # fully qualified name, e.g. "Vornamen" or "parent.kid"
+    ref: IndirectObject  # terminal field dictionary (holds /V)
+    field_type: str      # "/Tx", "/Btn", "/Ch" or "/Sig"
+    flags: int
+    widgets: Tuple[Widget, ...]
+
+    @property
+    def pages(self) -> Tuple[int, ...]:
+        return tuple(sorted({w.page for w in self.widgets}))
+
+    @property
+    def on_states(self) -> Tuple[str, ...]:
+        return tuple(w.on_state for w in self.widgets if w.on_state)
+
+    @property
+    def is_radio(self) -> bool:
+        return self.field_type == "/Btn" and bool(self.flags & (1 << 15))
+
+
+def _on_state(widget) -> Optional[str]:
+    normal = widget.get("/AP", {}).get("/N", {})
+    if not hasattr(normal, "keys"):
+        return None
+    states = [state for state in normal.keys() if state != "/Off"]
+    return states[0] if states else None
+
+
+def build_field_index(reader, page_refs) -> dict:
+    """
+    Walk the AcroForm field tree once and return {qualified name: FieldInfo}.
+    reader is the template's PdfReader; page_refs its page references in order.
+    """
+    root = reader.trailer["/Root"]
+    if "/AcroForm" not in root:
+        return {}
+
+    # Which page / Annots slot each widget sits in
+    placement = {}
+    for page_index, page_ref in enumerate(page_refs):
+        for annot_pos, ref in enumerate(page_ref.get_object().get("/Annots", [])):
+            if isinstance(ref, IndirectObject):
+                placement[ref.idnum] = (page_index, annot_pos, ref)
+
+    index = {}
+
+    def visit(ref, parent_name, inherited_type, inherited_flags):
+        node = ref.get_object()
+        partial = node.get("/T")
+        name = f"{parent_name}.{partial}" if parent_name and partial else (partial or parent_name)
+        field_type = node.get("/FT", inherited_type)
+        flags = int(node.get("/Ff", inherited_flags))
+
+        kids = node.get("/Kids", [])
+        named_kids = [kid for kid in kids if "/T" in kid.get_object()]
+        if named_kids:
+            for kid in named_kids:
+                visit(kid, name, field_type, flags)
+            return
+
+        # Terminal field: its widgets are either the merged field itself or its /Kids
+        widget_refs = kids if kids else [ref]
+        widgets = []
+        for widget_ref in widget_refs:
+            if widget_ref.idnum not in placement:
+                continue
+            page_index, annot_pos, _ = placement[widget_ref.idnum]
+            on_state = _on_state(widget_ref.get_object()) if field_type == "/Btn" else None
+            widgets.append(Widget(page_index, annot_pos, widget_ref, on_state))
+        index[name] = FieldInfo(name, ref, field_type, flags, tuple(widgets))
+
+    for field_ref in root["/AcroForm"].get("/Fields", []):
+        visit(field_ref, "", None, 0)
+    return index
@@ -0,0 +1,221 @@
+# field_mapping.py
+"""
+Declarative mapping from the wizard's session data to the fields of the Berlin
+Elterngeld form.
+
+BERLIN_MAPPING lists every PDF field we fill. It is compiled once at import into
+BERLIN_PLAN, a flat tuple of (pdf field name, kind, getter) steps, so every fill
+engine turns session data into field values with one linear pass:
+
+    values = BERLIN_PLAN.values(session_data)   # {pdf field name: str | bool}
+
+Text fields map to strings; checkboxes map to booleans (the engine picks the
+button's real on-state).
+"""
+
+from datetime import datetime
+from typing import Any, Callable, NamedTuple, Optional
+
+# Session sections the wizard stores (see app.py)
+SESSION_SECTIONS = (
+    'eligibility', 'child_info', 'applicant_info', 'residency_abroad_info',
+    'other_parent_info', 'income_before_birth_info', 'bank_info',
+)
+
+
+# ─── Value transforms ───────────────────────────────────────────────────
+
+def german_date(value) -> str:
+    """'2025-02-01' or '01.02.2025' → '01.02.2025'; anything else is passed through."""
+    if not value:
+        return ""
+    value = str(value)
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%d.%m.%Y')
+    except ValueError:
+        return value
+
+
+_GENDER_CODES = {
+    'weiblich': 'w', 'w': 'w',
+    'männlich': 'm', 'm': 'm',
+    'divers': 'd', 'd': 'd',
+    'ohne Angaben': 'o', 'ohne Angabe': 'o', 'o': 'o',
+}
+
+
+def gender_code(value) -> str:
+    """Form choices ('weiblich', ...) and short codes ('w', ...) → 'w' / 'm' / 'd' / 'o'."""
+    return _GENDER_CODES.get(value, '')
+
+
+# ─── Declarative spec ───────────────────────────────────────────────────
+
+class Text(NamedTuple):
+    pdf_name: str
+    section: str
+    key: str
+    transform: Optional[Callable[[Any], str]] = None
+    when: Optional[dict] = None     # only filled if these keys of the same section match
+
+
+class Check(NamedTuple):
+    pdf_name: str
+    section: str
+    key: str
+    equals: Any = True              # True = checked when the value is truthy
+    transform: Optional[Callable[[Any], Any]] = None
+    when: Optional[dict] = None
+
+
+BERLIN_MAPPING = (
+    # Abschnitt 1: Angaben zum Kind (Seite 1)
+    Text("Vornamen", "child_info", "vorname"),
+    Text("Nachname", "child_info", "nachname"),
+    Text("Vorname01", "child_info", "multi_name_1"),
+    Text("Vorname02", "child_info", "multi_name_2"),
+    Text("Vorname03", "child_info", "multi_name_3"),
+    Text("Vorname04", "child_info", "multi_name_4"),
+    Text("Geburtsdatum", "child_info", "geburtsdatum", german_date),
+    Check("Ja01", "child_info", "fruehgeboren"),
+    Text("Ursprünglich errechneter Geburtstermin", "child_info", "due_date", german_date),
+    Check("Nein", "child_info", "fruehgeboren", equals=False, when={'is_born': 'yes'}),
+    Check("keine", "child_info", "multiple_births", equals='1'),
+    Check("insgesamt", "child_info", "multiple_births", equals=True, when={'is_born': 'yes'},
+          transform=lambda n: n not in (None, '', '1')),
+    Text("Anzahl", "child_info", "multiple_births", transform=lambda n: '' if n in (None, '', '1') else str(n)),
+
+    # Abschnitt 2: Antragsteller (Seite 2)
+    Text("Vornamen_2", "applicant_info", "vorname"),
+    Text("Nachname_2", "applicant_info", "nachname"),
+    Text("Geburtsdatum_2", "applicant_info", "geburtsdatum", german_date),
+    Check("weiblich", "applicant_info", "geschlecht", 'w', gender_code),
+    Check("männlich", "applicant_info", "geschlecht", 'm', gender_code),
+    Check("divers", "applicant_info", "geschlecht", 'd', gender_code),
+    Check("ohne Angabe nach Personenstandsgesetz", "applicant_info", "geschlecht", 'o', gender_code),
+    Text("SteuerIdentifikationsnummer", "applicant_info", "steuer_id"),
+    Text("Straße", "applicant_info", "address_street"),
+    Text("Hausnr", "applicant_info", "address_housenumber"),
+    Text("Postleitzahl", "applicant_info", "address_plz"),
+    Text("Ort", "applicant_info", "address_city"),
+    Text("Adresszusatz", "applicant_info", "address_addon"),
+    Check("Ja_2", "applicant_info", "lives_in_germany", 'yes'),
+    Check("seit meiner Geburt_2", "applicant_info", "residency_start_date_type", 'birth', when={'lives_in_germany': 'yes'}),
+    Check("seit_2", "applicant_info", "residency_start_date_type", 'date', when={'lives_in_germany': 'yes'}),
+    Text("Datum_2", "applicant_info", "residency_start_date", german_date),
+
+    # Abschnitt 2: anderer Elternteil (Seite 2)
+    Text("Vornamen_3", "other_parent_info", "vorname"),
+    Text("Nachname_3", "other_parent_info", "nachname"),
+    Text("Geburtsdatum_3", "other_parent_info", "geburtsdatum", german_date),
+    Check("weiblich_2", "other_parent_info", "geschlecht", 'w', gender_code),
+    Check("männlich_2", "other_parent_info", "geschlecht", 'm', gender_code),
+    Check("divers_2", "other_parent_info", "geschlecht", 'd', gender_code),
+    Check("ohne Angabe nach Personenstandsgesetz_2", "other_parent_info", "geschlecht", 'o', gender_code),
+    Text("SteuerIdentifikationsnummer_2", "other_parent_info", "steuer_id"),
+    Check("Ich wohne mit dem anderen Elternteil zusammen", "other_parent_info", "same_address_as_applicant"),
+    Text("Straße_2", "other_parent_address", "address_street"),
+    Text("Hausnr_2", "other_parent_address", "address_housenumber"),
+    Text("Postleitzahl_2", "other_parent_address", "address_plz"),
+    Text("Ort_2", "other_parent_address", "address_city"),
+    Text("Adresszusatz_2", "other_parent_address", "address_addon"),
+
+    # Wohnsitz im Ausland (Seite 3)
+    Check("Nein ich lebe in", "applicant_info", "lives_in_germany", 'no'),
+    Text("Staat", "residency_abroad_info", "foreign_country"),
+    Text("Welche Adresse haben Sie", "residency_abroad_info", "foreign_address"),
+    Text("Warum halten Sie sich im Ausland auf", "residency_abroad_info", "reason_abroad"),
+
+    # Bankverbindung und Kontakt (Seite 23)
+    Text("Kontonummer IBAN", "bank_info", "iban"),
+    Text("BIC", "bank_info", "bic"),
+    Check("Ja_S23-1", "bank_info", "own_account", 'yes'),
+    Check("Nein, das ist das Konto des anderen Eltenteils; dessen Name ist in diesem Formular eingetragen_1",
+          "bank_info", "own_account", 'other_parent'),
+    Check("Nein, das ist das Konto von_1", "bank_info", "own_account", 'third'),
+    Text("Vornamen_7", "bank_info", "account_holder", when={'own_account': 'third'}),
+    Text("Telefonnummer Angabe freiwillig", "applicant_info", "telefon"),
+    Text("EMailAdresse Angabe freiwillig", "applicant_info", "email"),
+    Text("Telefonnummer Angabe freiwillig_2", "other_parent_info", "telefon"),
+    Text("EMailAdresse Angabe freiwillig_2", "other_parent_info", "email"),
+)
+
+
+# ─── Derived sections ───────────────────────────────────────────────────
+
+_ADDRESS_KEYS = ('address_street', 'address_housenumber', 'address_plz', 'address_city', 'address_addon')
+
+
+def normalize(session_data: dict) -> dict:
+    """
+    Return the session sections plus the derived ones the mapping reads:
+    'other_parent_address' (the applicant's address if both live together) and
+    residency_abroad_info['foreign_address'].
+    """
+    data = {section: session_data.get(section) or {} for section in SESSION_SECTIONS}
+    applicant, other = data['applicant_info'], data['other_parent_info']
+    source = applicant if other.get('same_address_as_applicant') else other
+    data['other_parent_address'] = {key: source.get(key, '') for key in _ADDRESS_KEYS} if other else {}
+
+    abroad = data['residency_abroad_info']
+    if abroad:
+        street = " ".join(filter(None, (abroad.get('foreign_street'), abroad.get('foreign_housenumber'))))
+        city = " ".join(filter(None, (abroad.get('foreign_plz'), abroad.get('foreign_city'))))
+        data['residency_abroad_info'] = dict(abroad, foreign_address=", ".join(filter(None, (street, city))))
+    return data
+
+
+# ─── Compilation ────────────────────────────────────────────────────────
+
+def _compile(spec):
+    """Turn one spec into a (pdf_name, kind, getter) step; getter(data) → value."""
+    section, key, transform = spec.section, spec.key, spec.transform
+    conditions = tuple((spec.when or {}).items())
+
+    def holds(data):
+        values = data.get(section) or {}
+        return all(values.get(k) == v for k, v in conditions)
+
+    def raw(data):
+        if conditions and not holds(data):
+            return None
+        value = (data.get(section) or {}).get(key)
+        return transform(value) if transform else value
+
+    if isinstance(spec, Check):
+        equals = spec.equals
+        if equals is True:
+            return spec.pdf_name, 'check', lambda data: bool(raw(data))
+        if equals is False:
+            return spec.pdf_name, 'check', lambda data: holds(data) and not raw(data)
+        return spec.pdf_name, 'check', lambda data: raw(data) == equals
+
+    def text(data):
+        value = raw(data)
+        return "" if value is None else str(value)
+    return spec.pdf_name, 'text', text
+
+
+class FillPlan:
+    """A compiled mapping: one step per PDF field, executed in order."""
+
+    def __init__(self, specs):
+        self.steps = tuple(_compile(spec) for spec in specs)
+        self.kinds = {name: kind for name, kind, _ in self.steps}
+
+    def values(self, session_data: dict) -> dict:
+        data = normalize(session_data)
+        return {name: get(data) for name, _, get in self.steps}
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def __len__(self):
+        return len(self.steps)
+
+
+def compile_plan(specs) -> FillPlan:
+    return FillPlan(specs)
+
+
+BERLIN_PLAN = compile_plan(BERLIN_MAPPING)
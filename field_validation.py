@@ -0,0 +1,65 @@
+# field_validation.py
+"""
+Live checks of single fields or small groups against the wizard's own forms,
+without a full-page POST:
+
+    POST /validate/applicant_info
+    {"fields": {"geburtsdatum": "2015-04-01", "steuer_id": "1234567890x"}, "check": ["geburtsdatum"]}
+    → {"valid": false, "errors": {"geburtsdatum": ["Der Antragsteller muss mindestens 16 Jahre alt sein."]},
+       "undecided": []}
+
+The step's form is bound to the given values, and each field in "check"
+(default: all given ones) runs exactly the checks a submit runs for it: its
+validators and its validate_<field> rule from forms.py. The other given values
+are context for those rules (is_born for the child's dates, lives_in_germany
+for the residency date, ...). A rule that compares with another field which was
+not sent, or is no valid date, cannot be decided: the field is listed in
+"undecided" and "valid" is null unless some checked field has an error.
+
+The checkboxes of a group (german_ss_*) are checked through the group's field,
+which carries the rule; its errors are reported under the checked names.
+Given values that are no field of the step are ignored; unknown names in
+"check" are an error.
+
+Values are strings as a browser would post them; for checkboxes true/false.
+"""
+
+from werkzeug.datastructures import MultiDict
+from wtforms import SubmitField
+
+from session_codec import CODECS
+
+
+def _formdata(values: dict) -> MultiDict:
+    data = MultiDict()
+    for name, value in values.items():
+        if value is None or value is False:
+            continue                      # an unchecked checkbox is not posted at all
+        for item in value if isinstance(value, list) else [value]:
+            data.add(name, 'y' if item is True else str(item))
+    return data
+
+
+def validate(step: str, values: dict, check=None) -> dict:
+    """{'valid': True/False/None, 'errors': {field: [message, ...]}, 'undecided': [field, ...]} for step."""
+    codec = CODECS[step]
+    form = codec.form_class(formdata=_formdata(values), meta={'csrf': False})
+    names = {name for name, field in form._fields.items() if not isinstance(field, SubmitField)}
+    check = [name for name in values if name in names] if check is None else list(check)
+    unknown = sorted(set(check) - names)
+    if unknown:
+        raise ValueError(f"Unbekannte Felder für {step}: {', '.join(unknown)}")
+
+    # german_ss_kranken → german_social_security_types
+    groups = {attr: group for _, attr, _, group, _ in codec.flags if group}
+    for name in {groups.get(name, name) for name in check}:
+        form.validate_field(name)
+
+    errors, undecided = {}, []
+    for name in check:
+        target = groups.get(name, name)
+        if form[target].errors:
+            errors[name] = list(form[target].errors)
+        elif target in form.undecided:
+            undecided.append(name)
+    return {'valid': False if errors else (None if undecided else True), 'errors': errors, 'undecided': undecided}
@@ -3,131 +3,208 @@
 import io
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
-from PyPDF2 import PdfReader, PdfWriter
-import pikepdf
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject
 
-def overlay_fill(template_path: str, output_path: str, data: dict):
+from field_geometry import get_geometry
+from field_mapping import BERLIN_PLAN
+from metrics import stage
+from pdf_appearance import AUTO_MAX_SIZE, AUTO_MIN_SIZE, PADDING
+from pdf_flatten import _inherited, _resolve
+from pdf_template import get_template
+
+
+OVERLAY_FONT = "Helvetica"
+_face = pdfmetrics.getFont(OVERLAY_FONT).face
+_ASCENT, _DESCENT = _face.ascent / 1000, _face.descent / 1000
+_CAP_HEIGHT = 0.718     # Helvetica.afm CapHeight 718
+_FONT_RESOURCES = None
+
+
+def _font_resources() -> DictionaryObject:
     """
-    1. Decrypt the protected Berlin Elterngeld PDF (template_path) into 'decrypted_elterngeld.pdf'
-    2. Create an in-memory overlay PDF that draws only text at fixed coordinates.
-    3. Merge overlay onto each decrypted page and write final PDF to output_path.
+    The /Resources of a reportlab page that uses OVERLAY_FONT, as direct objects.
+    Rendered once per process (a blank page with the font set up) and shared by all
+    overlays, which reportlab always writes with the same font names.
     """
+    global _FONT_RESOURCES
+    if _FONT_RESOURCES is None:
+        buffer = io.BytesIO()
+        blank = canvas.Canvas(buffer, pagesize=A4, pageCompression=0)
+        blank.setFont(OVERLAY_FONT, 10)
+        blank.drawString(0, 0, " ")
+        blank.showPage()
+        blank.save()
+        fonts = PdfReader(io.BytesIO(buffer.getvalue())).pages[0]["/Resources"]["/Font"]
+        _FONT_RESOURCES = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({
+                NameObject(name): DictionaryObject(fonts[name].get_object()) for name in fonts
+            }),
+        })
+    return _FONT_RESOURCES
+
+
+# ─── Layout from the template's widget geometry (field_geometry.py) ────
 
-    # ─── Step 1: Decrypt into a relative file ────────────────────────────
-    decrypted_path = "decrypted_elterngeld.pdf"
-    with pikepdf.open(template_path) as pdf:
-        pdf.save(decrypted_path)
+_plans = {}
 
-    reader = PdfReader(decrypted_path)
-    num_pages = len(reader.pages)
 
-    # ─── Step 2: Build in-memory overlay PDF ────────────────────────────
+def _plan_pages(geometry, plan) -> dict:
+    """
+    The plan's fields grouped by page, once per geometry table and plan:
+    {Seite: ((Feldname, FieldGeometry, WidgetBox), ...)} in page order.
+    """
+    cached = _plans.get((geometry.digest, id(plan)))
+    if cached is None:
+        pages = {}
+        for field_name, _, _ in plan:
+            field = geometry.get(field_name)
+            for box in field.widgets if field else ():
+                pages.setdefault(box.page, []).append((field_name, field, box))
+        cached = _plans[geometry.digest, id(plan)] = {seite: tuple(felder) for seite, felder in sorted(pages.items())}
+    return cached
+
+
+def _text_layout(field, box, text: str):
+    """Font size and (x, y, line) for each line, placed like the field's own appearance."""
+    inner_width, inner_height = box.width - 2 * PADDING, box.height - 2 * PADDING
+    line_height = _ASCENT - _DESCENT
+    size = box.font_size
+    if field.multiline:
+        size = size or AUTO_MAX_SIZE
+        lines = simpleSplit(text, OVERLAY_FONT, size, inner_width) or [""]
+        while not box.font_size and size > AUTO_MIN_SIZE and len(lines) * size * line_height > inner_height:
+            size -= 0.5
+            lines = simpleSplit(text, OVERLAY_FONT, size, inner_width) or [""]
+        top = box.y2 - PADDING - _ASCENT * size
+    else:
+        lines = [text.replace("\r", " ").replace("\n", " ")]
+        if not size:
+            size = min(AUTO_MAX_SIZE, inner_height / line_height)
+            text_width = pdfmetrics.stringWidth(lines[0], OVERLAY_FONT, 1)
+            if text_width * size > inner_width:
+                size = max(AUTO_MIN_SIZE, inner_width / text_width)
+        top = box.y1 + (box.height - size * line_height) / 2 - _DESCENT * size
+
+    placed = []
+    for i, line in enumerate(lines):
+        line_width = pdfmetrics.stringWidth(line, OVERLAY_FONT, size)
+        if box.quadding == 1:
+            x = box.x1 + (box.width - line_width) / 2
+        elif box.quadding == 2:
+            x = box.x2 - PADDING - line_width
+        else:
+            x = box.x1 + PADDING
+        placed.append((x, top - i * size * line_height, line))
+    return size, placed
+
+
+def _check_layout(box):
+    """An 'X' centred in the checkbox."""
+    size = box.font_size or min(box.width, box.height) * 0.8
+    x = box.x1 + (box.width - pdfmetrics.stringWidth("X", OVERLAY_FONT, size)) / 2
+    y = box.y1 + (box.height - _CAP_HEIGHT * size) / 2
+    return size, [(x, y, "X")]
+
+
+def _is_checked(box, value) -> bool:
+    if isinstance(value, str):
+        # Export value of a radio option / checkbox state
+        return box.on_state in (value, "/" + value)
+    return bool(value)
+
+
+def _overlay_pages(geometry, plan, values: dict) -> dict:
+    """Draw only the pages that carry data; returns {Seite: content stream bytes}."""
     overlay_buffer = io.BytesIO()
-    overlay_canvas = canvas.Canvas(overlay_buffer, pagesize=A4)
-
-    FeldPositionen = {
-        'Kind_Vorname':      (0, 150, 710, 10),
-        'Kind_Nachname':     (0, 350, 710, 10),
-        'Kind_Geburtsdatum': (0, 150, 690, 10),
-        'Kind_Fruehgeboren': (0, 150, 670, 8),
-        'Kind_Behinderung':  (0, 150, 655, 8),
-        'Kind_Mehrlinge':    (0, 350, 670, 10),
-
-        'Antr_Vorname':      (1, 150, 750, 10),
-        'Antr_Nachname':     (1, 350, 750, 10),
-        'Antr_Geburtsdatum': (1, 150, 730, 10),
-        'Antr_Geschlecht':   (1, 150, 710, 10),
-        'Antr_SteuerID':     (1, 350, 710, 10),
-        'Antr_Strasse':      (1, 150, 690, 10),
-        'Antr_PLZ':          (1, 150, 670, 10),
-        'Antr_Ort':          (1, 350, 670, 10),
-        'Antr_Email':        (1, 150, 650, 10),
-        'Antr_Telefon':      (1, 350, 650, 10),
-        'Antr_Status':       (1, 150, 630, 10),
-
-        'OEP_Vorname':       (2, 150, 750, 10),
-        'OEP_Nachname':      (2, 350, 750, 10),
-        'OEP_Geburtsdatum':  (2, 150, 730, 10),
-        'OEP_Geschlecht':    (2, 150, 710, 10),
-        'OEP_SteuerID':      (2, 350, 710, 10),
-        'OEP_Email':         (2, 150, 690, 10),
-        'OEP_Telefon':       (2, 350, 690, 10),
-
-        'Income_Art':        (3, 150, 750, 10),
-        'Income_Betrag':     (3, 350, 750, 10),
-        'Income_Ersatz':     (3, 150, 730, 10),
-        'Income_Details':    (3, 150, 710, 10),
-
-        'Bank_IBAN':         (4, 150, 600, 10),
-        'Bank_BIC':          (4, 350, 600, 10),
-        'Bank_Kontoinh':     (4, 150, 580, 10),
-    }
-
-    for page_num in range(num_pages):
-        for field_name, (seite, x, y, font_size) in FeldPositionen.items():
-            if seite != page_num:
+    overlay_canvas = canvas.Canvas(overlay_buffer, pagesize=A4, pageCompression=0)
+    drawn = []
+    for seite, felder in _plan_pages(geometry, plan).items():
+        current_size = None
+        for field_name, field, box in felder:
+            value = values.get(field_name)
+            if field.field_type == "/Btn":
+                if not value or not _is_checked(box, value):
+                    continue
+                size, placed = _check_layout(box)
+            elif value:
+                size, placed = _text_layout(field, box, str(value))
+            else:
                 continue
+            if size != current_size:
+                overlay_canvas.setFont(OVERLAY_FONT, size)
+                current_size = size
+            for x, y, line in placed:
+                overlay_canvas.drawString(x, y, line)
+        if current_size is not None:
+            overlay_canvas.showPage()
+            drawn.append(seite)
+
+    if not drawn:
+        return {}
+    overlay_canvas.save()
+    overlay_reader = PdfReader(io.BytesIO(overlay_buffer.getvalue()))
+    return {seite: page.get_contents().get_data() for seite, page in zip(drawn, overlay_reader.pages)}
 
-            mapping = {
-                'Kind_Vorname':       ('child_info', 'vorname'),
-                'Kind_Nachname':      ('child_info', 'nachname'),
-                'Kind_Geburtsdatum':  ('child_info', 'geburtsdatum'),
-                'Kind_Fruehgeboren':  ('child_info', 'fruehgeboren'),
-                'Kind_Behinderung':   ('child_info', 'behinderung'),
-                'Kind_Mehrlinge':     ('child_info', 'multiple_births'),
-
-                'Antr_Vorname':       ('applicant_info', 'vorname'),
-                'Antr_Nachname':      ('applicant_info', 'nachname'),
-                'Antr_Geburtsdatum':  ('applicant_info', 'geburtsdatum'),
-                'Antr_Geschlecht':    ('applicant_info', 'geschlecht'),
-                'Antr_SteuerID':      ('applicant_info', 'steuer_id'),
-                'Antr_Strasse':       ('applicant_info', 'address_street'),
-                'Antr_PLZ':           ('applicant_info', 'address_plz'),
-                'Antr_Ort':           ('applicant_info', 'address_city'),
-                'Antr_Email':         ('applicant_info', 'email'),
-                'Antr_Telefon':       ('applicant_info', 'telefon'),
-                'Antr_Status':        ('applicant_info', 'other_parent_status'),
-
-                'OEP_Vorname':        ('other_parent_info', 'vorname'),
-                'OEP_Nachname':       ('other_parent_info', 'nachname'),
-                'OEP_Geburtsdatum':   ('other_parent_info', 'geburtsdatum'),
-                'OEP_Geschlecht':     ('other_parent_info', 'geschlecht'),
-                'OEP_SteuerID':       ('other_parent_info', 'steuer_id'),
-                'OEP_Email':          ('other_parent_info', 'email'),
-                'OEP_Telefon':        ('other_parent_info', 'telefon'),
-
-                'Income_Art':         ('income_info', 'income_type'),
-                'Income_Betrag':      ('income_info', 'income_amount'),
-                'Income_Ersatz':      ('income_info', 'received_benefits'),
-                'Income_Details':     ('income_info', 'benefits_details'),
-
-                'Bank_IBAN':          ('bank_info', 'iban'),
-                'Bank_BIC':           ('bank_info', 'bic'),
-                'Bank_Kontoinh':      ('bank_info', 'account_holder'),
-            }
-
-            section_key, data_key = mapping[field_name]
-            value = data.get(section_key, {}).get(data_key, '')
-
-            if isinstance(value, bool):
-                value = 'Ja' if value else 'Nein'
-
-            overlay_canvas.setFont("Helvetica", font_size)
-            overlay_canvas.drawString(x, y, str(value))
-
-        overlay_canvas.showPage()
 
-    overlay_canvas.save()
-    overlay_buffer.seek(0)
+def _stream(data: bytes, **entries) -> DecodedStreamObject:
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    stream.update({NameObject(key): value for key, value in entries.items()})
+    return stream
 
-    overlay_reader = PdfReader(overlay_buffer)
-    writer = PdfWriter()
 
-    for page_num in range(num_pages):
-        original_page = reader.pages[page_num]
-        overlay_page = overlay_reader.pages[page_num]
-        original_page.merge_page(overlay_page)
-        writer.add_page(original_page)
+def overlay_fill(template_path: str, output_path: str, data: dict, plan=BERLIN_PLAN):
+    """
+    1. Take the decrypted, parsed Berlin Elterngeld PDF from the template cache (no re-parse).
+    2. Draw the mapped values with reportlab into the widgets' boxes (field_geometry table),
+       one overlay page per template page that has data.
+    3. Attach each overlay page as a form XObject to its template page and write the PDF
+       to output_path; pages without data are not touched.
+    """
 
-    with open(output_path, 'wb') as f:
-        writer.write(f)
+    # ─── Step 1: Parsed template comes from the process-level cache ─────
+    doc = get_template(template_path).clone()
+
+    with stage('fill'):
+        # ─── Step 2: Build the overlay content for pages with data only ─
+        overlays = _overlay_pages(get_geometry(template_path), plan, plan.values(data))
+        # ─── Step 3: Stamp each overlay onto its page ───────────────────
+        _stamp(doc, overlays)
+
+    # output_path: Dateipfad oder beschreibbarer Binär-Stream
+    if hasattr(output_path, "write"):
+        doc.write(output_path)
+    else:
+        with open(output_path, "wb") as f:
+            doc.write(f)
+
+
+def _stamp(doc, overlays: dict) -> None:
+    """Attach each overlay content stream as a form XObject to its page."""
+    resources = _font_resources()
+    for seite, content in overlays.items():
+        page_ref = doc.template.page_refs[seite]
+        page = doc.edit(page_ref)
+        # /MediaBox and /Resources may be inherited from the page tree
+        form = doc.add(_stream(
+            content,
+            **{"/Type": NameObject("/XObject"), "/Subtype": NameObject("/Form"),
+               "/BBox": _inherited(doc, page, "/MediaBox"), "/Resources": resources},
+        ))
+
+        page_resources = DictionaryObject(_inherited(doc, page, "/Resources") or {})
+        existing = _resolve(doc, page_resources.raw_get("/XObject")) if "/XObject" in page_resources else {}
+        xobjects = DictionaryObject(existing)
+        xobjects[NameObject("/Overlay")] = form
+        page_resources[NameObject("/XObject")] = xobjects
+        page[NameObject("/Resources")] = page_resources
+
+        # Original content in q/Q, so the overlay starts from the default graphics state
+        contents = page.raw_get("/Contents") if "/Contents" in page else ArrayObject()
+        contents = list(_resolve(doc, contents)) if isinstance(_resolve(doc, contents), list) else [contents]
+        page[NameObject("/Contents")] = ArrayObject(
+            [doc.add(_stream(b"q\n"))] + contents + [doc.add(_stream(b"Q\nq /Overlay Do Q\n"))]
+        )
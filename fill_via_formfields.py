@@ -1,83 +1,60 @@
 # fill_via_formfields.py
 
-import pikepdf
-from PyPDF2 import PdfReader, PdfWriter
+import io
+from pypdf import PdfReader, PdfWriter
 
-def fill_elterngeld_acroform(template_path: str, output_path: str, data: dict):
+from field_mapping import BERLIN_PLAN
+from metrics import stage
+from pdf_template import get_template
+
+def fill_elterngeld_acroform(template_path: str, output_path: str, data: dict, plan=BERLIN_PLAN):
     """
-    1. Decrypt the Berlin form.
-    2. Use PdfReader to list all AcroForm fields.
-    3. Build a values_to_set dict mapping each field name → string/“Ja”/“”.
-    4. Clone into a PdfWriter, call update_page_form_field_values() per page,
-       and save.
+    1. Take the decrypted Berlin form from the template cache.
+    2. Look the AcroForm fields up in the template's field index.
+    3. Build a values_to_set dict mapping each field name → string / on-state / “/Off”.
+    4. Clone into a PdfWriter, call update_page_form_field_values() only on the
+       pages that hold those fields, and save.
     """
 
-    # ─── Step 1: Decrypt into a temp file ─────────────────────────────────────
-    temp_decrypted = "decrypted_elterngeld.pdf"
-    with pikepdf.open(template_path) as pdf:
-        pdf.save(temp_decrypted)
-
-    # ─── Step 2: Read fields with PdfReader ───────────────────────────────────
-    reader = PdfReader(temp_decrypted)
-    fields = reader.get_fields() or {}
-    # fields is a dict: { fieldname → FieldObject }
-
-    # ─── Step 3: Build values_to_set mapping ──────────────────────────────────
-    # (Use your exact field_map from earlier.)
-    field_map = {
-        # Example mappings (add every field you need):
-        'Vornamen':      ('child_info', 'vorname'),
-        'Nachname':      ('child_info', 'nachname'),
-        'Geburtsdatum':  ('child_info', 'geburtsdatum'),
-        'Ja01':          ('child_info', 'fruehgeboren'),
-        'Nein':          ('child_info', 'fruehgeboren'),
-        # … fill out all your fields exactly as they appear …
-        'Vornamen_2':    ('applicant_info', 'vorname'),
-        'Nachname_2':    ('applicant_info', 'nachname'),
-        'Geburtsdatum_2':('applicant_info', 'geburtsdatum'),
-        'weiblich':      ('applicant_info', 'geschlecht'),
-        'männlich':      ('applicant_info', 'geschlecht'),
-        'divers':        ('applicant_info', 'geschlecht'),
-        'SteuerIdentifikationsnummer': ('applicant_info', 'steuer_id'),
-        'Straße':        ('applicant_info', 'address_street'),
-        'Hausnr':        ('applicant_info', 'address_street'),
-        'Postleitzahl':  ('applicant_info', 'address_plz'),
-        'Ort':           ('applicant_info', 'address_city'),
-        'EMailAdresse':  ('applicant_info', 'email'),
-        'Telefonnummer Angabe freiwillig': ('applicant_info', 'telefon'),
-        # … Other Parent Info, Income Info, Bank Info fields …
-        'Kontonummer IBAN': ('bank_info', 'iban'),
-        'BIC':              ('bank_info', 'bic'),
-        'Vornamen_7':       ('bank_info', 'account_holder'),
-        'Ja_S23-1':         ('bank_info', 'own_account'),
-        'Nein, das ist das Konto des anderen Eltenteils; dessen Name ist in diesem Formular eingetragen_1':
-                              ('bank_info', 'own_account'),
-        'Nein, das ist das Konto von_1': ('bank_info', 'own_account'),
-    }
-
-    values_to_set = {}
-    for fieldname, (section_key, data_key) in field_map.items():
-        if fieldname not in fields:
-            # if the PDF doesn't actually have that field name, skip it:
-            continue
-
-        section = data.get(section_key, {})
-        raw = section.get(data_key, "")
-        if isinstance(raw, bool):
-            # Checkboxes / radios: set “Ja” if True, blank if False
-            values_to_set[fieldname] = "Ja" if raw else ""
-        else:
-            # Text fields
-            values_to_set[fieldname] = str(raw)
-
-    # ─── Step 4: Clone to PdfWriter and fill values ───────────────────────────
-    writer = PdfWriter()
-    writer.clone_document_from_reader(reader)  # copy pages + /AcroForm
-
-    # Now write those values into each page’s form:
-    for page in writer.pages:
-        writer.update_page_form_field_values(page, values_to_set)
-
-    # ─── Step 5: Save out the filled PDF ──────────────────────────────────────
-    with open(output_path, "wb") as out_f:
-        writer.write(out_f)
+    # ─── Step 1: Decrypted bytes come from the process-level cache ───────────
+    template = get_template(template_path)
+
+    # ─── Step 2: Field names come from the template's precomputed index ───────
+    with stage('parse'):
+        reader = PdfReader(io.BytesIO(template.data))
+    fields = template.fields
+    # fields is a dict: { fieldname → FieldInfo (pages, widgets, type, on-states) }
+
+    with stage('fill'):
+        # ─── Step 3: Build values_to_set mapping ──────────────────────────────────
+        # Field names and values come from the compiled mapping in field_mapping.py
+        values_to_set = {}
+        for fieldname, value in plan.values(data).items():
+            if fieldname not in fields:
+                # if the PDF doesn't actually have that field name, skip it:
+                continue
+
+            if fields[fieldname].field_type == "/Btn":
+                # Checkboxes: the button's real on-state if checked, /Off otherwise
+                on_states = fields[fieldname].on_states
+                values_to_set[fieldname] = on_states[0] if value and on_states else "/Off"
+            else:
+                # Text fields
+                values_to_set[fieldname] = value
+
+        # ─── Step 4: Clone to PdfWriter and fill values ───────────────────────────
+        # clone_from copies the whole document incl. /AcroForm (PyPDF2's
+        # clone_document_from_reader dropped it, leaving a PDF without form fields)
+        writer = PdfWriter(clone_from=reader)
+
+        # Only visit the pages that hold a field being set, with just those fields
+        values_by_page = {}
+        for fieldname, value in values_to_set.items():
+            for page_index in fields[fieldname].pages:
+                values_by_page.setdefault(page_index, {})[fieldname] = value
+        for page_index, page_values in values_by_page.items():
+            writer.update_page_form_field_values(writer.pages[page_index], page_values, auto_regenerate=False)
+
+    # ─── Step 5: Save out the filled PDF (output_path may also be a binary stream) ─
+    with stage('serialize'):
+        writer.write(output_path)
@@ -8,17 +8,78 @@ from urllib.parse import urlencode
 werkzeug.urls.url_encode = staticmethod(urlencode)
 
 # ─── Rest of your imports ───────────────────────────────────────────────
-from datetime import date, timedelta
+from datetime import date
 from flask_wtf import FlaskForm
 from wtforms import (
     StringField, DateField, BooleanField, RadioField,
     SelectField, SubmitField, EmailField, TextAreaField, DecimalField
 )
 from wtforms.validators import DataRequired, Email, Length, Optional, ValidationError, NumberRange, Regexp # <--- Add Regexp
+from wtforms.validators import StopValidation
 # ─────────────────────────────────────────────────────────────────────
 
 
-class ChildInfoForm(FlaskForm):
+# ─── Per-field rules ────────────────────────────────────────────────────
+# The rules that involve other fields are validate_<field> methods and RequiredIf
+# validators, so each field can be checked on its own (field_validation.py).
+
+class RequiredIf:
+    """
+    Required while the named other fields hold the given values, e.g.
+    RequiredIf(msg, is_born='yes'); otherwise nothing. Goes before Optional(),
+    which ends the chain for an empty field.
+    """
+
+    def __init__(self, message, **conditions):
+        self.message = message
+        self.conditions = conditions
+
+    def __call__(self, form, field):
+        if any(form[name].data != value for name, value in self.conditions.items()):
+            return
+        if not field.raw_data or (isinstance(field.raw_data[0], str) and not field.raw_data[0].strip()):
+            raise StopValidation(self.message)
+
+
+def _digits(message):
+    """Optional text field that must be a whole number (years)."""
+    def check(form, field):
+        if field.data and not field.data.isdigit():
+            raise ValidationError(message)
+    return check
+
+
+class WizardForm(FlaskForm):
+    """Base of the wizard steps: validate() or one field at a time with validate_field()."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.undecided = set()      # fields whose rule lacked another field's value
+
+    def validate(self, extra_validators=None):
+        self.undecided = set()
+        return super().validate(extra_validators)
+
+    def validate_field(self, name) -> bool:
+        """The field's validators plus its validate_<name> rule, as validate() runs them."""
+        self.undecided.discard(name)
+        inline = getattr(self.__class__, f"validate_{name}", None)
+        return self[name].validate(self, [inline] if inline else ())
+
+    def depends_on(self, field, name):
+        """
+        The value of another field a rule for field compares with. If it is missing the
+        rule is skipped and field counts as undecided; on submit the other field's own
+        check reports it.
+        """
+        value = self[name].data
+        if value is None:
+            self.undecided.add(field.name)
+            raise StopValidation()
+        return value
+
+
+class ChildInfoForm(WizardForm):
     # This field matches the template's radio field structure
     is_born = RadioField(
         'Ist das Kind bereits geboren?',
@@ -28,12 +89,14 @@ class ChildInfoForm(FlaskForm):
     )
     
     # Basic child information fields
-    vorname = StringField('Vorname des Kindes', validators=[Optional()])
-    nachname = StringField('Nachname des Kindes', validators=[Optional()])
+    vorname = StringField('Vorname des Kindes', validators=[
+        RequiredIf('Vorname ist erforderlich wenn das Kind geboren ist', is_born='yes'), Optional()])
+    nachname = StringField('Nachname des Kindes', validators=[
+        RequiredIf('Nachname ist erforderlich wenn das Kind geboren ist', is_born='yes'), Optional()])
     geburtsdatum = DateField(
         'Geburtsdatum des Kindes',
         format='%Y-%m-%d',
-        validators=[Optional()],
+        validators=[RequiredIf('Geburtsdatum ist erforderlich wenn das Kind geboren ist', is_born='yes'), Optional()],
         render_kw={"type": "date"}
     )
     
@@ -42,7 +105,8 @@ class ChildInfoForm(FlaskForm):
     due_date = DateField(
         'Ursprünglich errechneter Geburtstermin',
         format='%Y-%m-%d',
-        validators=[Optional()],
+        validators=[RequiredIf('Ursprünglicher Geburtstermin ist erforderlich bei Frühgeburt',
+                               is_born='yes', fruehgeboren=True), Optional()],
         render_kw={"type": "date"}
     )
     
@@ -53,7 +117,7 @@ class ChildInfoForm(FlaskForm):
     multiple_births = SelectField(
         'Wie viele Kinder insgesamt geboren?',
         choices=[('1','1'),('2','2'),('3','3'),('4','4'),('5','5 oder mehr')],
-        validators=[Optional()],
+        validators=[RequiredIf('Bitte Anzahl Kinder angeben', is_born='yes'), Optional()],
         default='1'
     )
     
@@ -65,55 +129,17 @@ class ChildInfoForm(FlaskForm):
 
     submit = SubmitField('Weiter')
 
-    def validate(self, **kwargs):
-        if not super().validate(**kwargs):
-            return False
-
-        # Only validate if child is born
-        if self.is_born.data == 'yes':
-            today = date.today()
-            
-            # Name validation
-            if not self.vorname.data or not self.vorname.data.strip():
-                self.vorname.errors.append('Vorname ist erforderlich wenn das Kind geboren ist')
-                return False
-                
-            if not self.nachname.data or not self.nachname.data.strip():
-                self.nachname.errors.append('Nachname ist erforderlich wenn das Kind geboren ist')
-                return False
+    # Only checked if the child is born
+    def validate_geburtsdatum(self, field):
+        if self.is_born.data == 'yes' and field.data and field.data > date.today():
+            raise ValidationError('Geburtsdatum kann nicht in der Zukunft liegen')
 
-            # Birth date validation
-            if not self.geburtsdatum.data:
-                self.geburtsdatum.errors.append('Geburtsdatum ist erforderlich wenn das Kind geboren ist')
-                return False
+    def validate_due_date(self, field):
+        if self.is_born.data == 'yes' and field.data and field.data <= self.depends_on(field, 'geburtsdatum'):
+            raise ValidationError('Ursprünglicher Termin muss nach dem tatsächlichen Geburtsdatum liegen')
 
-            if self.geburtsdatum.data > today:
-                self.geburtsdatum.errors.append('Geburtsdatum kann nicht in der Zukunft liegen')
-                return False
-
-            # Early birth validation - ADD THIS
-            if self.fruehgeboren.data and not self.due_date.data:
-                self.due_date.errors.append('Ursprünglicher Geburtstermin ist erforderlich bei Frühgeburt')
-                return False
-
-            if self.due_date.data and self.due_date.data <= self.geburtsdatum.data:
-                self.due_date.errors.append('Ursprünglicher Termin muss nach dem tatsächlichen Geburtsdatum liegen')
-                return False
 
-            # Check if application is within 3 months of birth (warning, not error)
-            if self.geburtsdatum.data < today - timedelta(days=90):
-                # Don't return False for this - it's just a warning
-                pass
-
-            # Multiple births validation
-            if not self.multiple_births.data:
-                self.multiple_births.errors.append('Bitte Anzahl Kinder angeben')
-                return False
-
-        return True
-
-
-class EligibilityForm(FlaskForm):
+class EligibilityForm(WizardForm):
     citizenship = SelectField(
         'Staatsangehörigkeit',
         choices=[
@@ -168,7 +194,7 @@ from datetime import date
 
 # Define the form classes as provided in the problem description
 # (ApplicantInfoForm remains largely unchanged, just ensuring it's shown for context)
-class ApplicantInfoForm(FlaskForm):
+class ApplicantInfoForm(WizardForm):
     # ... (Your existing ApplicantInfoForm fields) ...
     vorname = StringField('Vorname', validators=[DataRequired(message="Pflichtfeld")])
     nachname = StringField('Nachname', validators=[DataRequired(message="Pflichtfeld")])
@@ -225,52 +251,38 @@ class ApplicantInfoForm(FlaskForm):
             ('birth', 'Geburt'),
             ('date', 'Datum')
         ],
-        validators=[Optional()]
+        validators=[RequiredIf('Bitte wählen Sie, seit wann Sie Ihren Wohnsitz in Deutschland haben.',
+                               lives_in_germany='yes'), Optional()]
     )
     residency_start_date = DateField(
         'Datum (TT.MM.JJJJ)',
         format='%Y-%m-%d',
-        validators=[Optional()],
+        validators=[RequiredIf('Bitte geben Sie das Startdatum Ihres Wohnsitzes an.',
+                               lives_in_germany='yes', residency_start_date_type='date'), Optional()],
         render_kw={"type": "date"}
     )
 
     submit = SubmitField('Weiter')
 
-    def validate(self, **kwargs):
-        if not super().validate(**kwargs):
-            return False
-
+    def validate_geburtsdatum(self, field):
         today = date.today()
-        bd = self.geburtsdatum.data
-        if bd > today:
-            self.geburtsdatum.errors.append('Geburtsdatum kann nicht in der Zukunft liegen.')
-            return False
+        if field.data > today:
+            raise ValidationError('Geburtsdatum kann nicht in der Zukunft liegen.')
         sixteen_years_ago = today.replace(year=today.year - 16)
-        if bd > sixteen_years_ago:
-            self.geburtsdatum.errors.append('Der Antragsteller muss mindestens 16 Jahre alt sein.')
-            return False
+        if field.data > sixteen_years_ago:
+            raise ValidationError('Der Antragsteller muss mindestens 16 Jahre alt sein.')
 
-        if not self.steuer_id.data.isdigit():
-            self.steuer_id.errors.append('Steuer-ID muss nur aus Ziffern bestehen.')
-            return False
-        
-        if self.lives_in_germany.data == 'yes':
-            if not self.residency_start_date_type.data:
-                self.residency_start_date_type.errors.append('Bitte wählen Sie, seit wann Sie Ihren Wohnsitz in Deutschland haben.')
-                return False
+    def validate_steuer_id(self, field):
+        if not field.data.isdigit():
+            raise ValidationError('Steuer-ID muss nur aus Ziffern bestehen.')
 
-            if self.residency_start_date_type.data == 'date':
-                if not self.residency_start_date.data:
-                    self.residency_start_date.errors.append('Bitte geben Sie das Startdatum Ihres Wohnsitzes an.')
-                    return False
-                if self.residency_start_date.data > today:
-                    self.residency_start_date.errors.append('Das Startdatum kann nicht in der Zukunft liegen.')
-                    return False
-        
-        return True
+    def validate_residency_start_date(self, field):
+        if (self.lives_in_germany.data == 'yes' and self.residency_start_date_type.data == 'date'
+                and field.data and field.data > date.today()):
+            raise ValidationError('Das Startdatum kann nicht in der Zukunft liegen.')
 
 
-class ResidencyAbroadForm(FlaskForm):
+class ResidencyAbroadForm(WizardForm):
     reason_abroad = TextAreaField(
         'Warum halten Sie sich im Ausland auf? (z. B. Entsendung, Studium, dauerhafter Wohnsitz)',
         validators=[DataRequired(message="Bitte geben Sie einen Grund an.")]
@@ -304,9 +316,9 @@ class ResidencyAbroadForm(FlaskForm):
         validators=[DataRequired("Bitte wählen Sie eine Option.")],
         default='no'
     )
+    # Carries the rule and the errors for the german_ss_* checkboxes below; no Optional(), so the rule runs when empty
     german_social_security_types = StringField( # Will handle this as a comma-separated list or similar
-        'Welche der oben genannten Versicherungen (falls zutreffend)?',
-        validators=[Optional()]
+        'Welche der oben genannten Versicherungen (falls zutreffend)?'
     )
     # The PDF has checkboxes for Kranken, Pflege, Renten, Arbeitslosen. We'll simulate this with a StringField
     # or consider a MultiCheckboxField if WTForms-Plus is used. For simplicity, we'll use a StringField for now.
@@ -325,41 +337,27 @@ class ResidencyAbroadForm(FlaskForm):
     )
     foreign_social_security_details = TextAreaField(
         'Welche Sozialversicherung im Gastland?',
-        validators=[Optional()]
+        validators=[RequiredIf('Bitte geben Sie die Art der Sozialversicherung im Gastland an.',
+                               foreign_social_security='yes'), Optional()]
     )
 
     submit = SubmitField('Weiter')
 
-    def validate_on_submit(self):
-        # Base validation first
-        if not super().validate_on_submit():
-            return False
-        
-        # Custom validation for dates
-        today = date.today()
-        if self.date_of_departure.data and self.date_of_departure.data > today:
-            self.date_of_departure.errors.append('Datum der Ausreise kann nicht in der Zukunft liegen.')
-            return False
-        
-        if self.expected_date_of_return.data and self.expected_date_of_return.data < self.date_of_departure.data:
-            self.expected_date_of_return.errors.append('Rückreisedatum kann nicht vor dem Ausreisedatum liegen.')
-            return False
+    def validate_date_of_departure(self, field):
+        if field.data > date.today():
+            raise ValidationError('Datum der Ausreise kann nicht in der Zukunft liegen.')
+
+    def validate_expected_date_of_return(self, field):
+        if field.data and field.data < self.depends_on(field, 'date_of_departure'):
+            raise ValidationError('Rückreisedatum kann nicht vor dem Ausreisedatum liegen.')
 
-        # Conditional validation for German social security types
+    def validate_german_social_security_types(self, field):
         if self.german_social_security_abroad.data == 'yes':
             if not (self.german_ss_kranken.data or self.german_ss_pflege.data or self.german_ss_renten.data or self.german_ss_arbeitslosen.data):
-                self.german_social_security_types.errors.append('Bitte wählen Sie mindestens eine Versicherungsart.')
-                return False
-        
-        # Conditional validation for foreign social security details
-        if self.foreign_social_security.data == 'yes' and not self.foreign_social_security_details.data:
-            self.foreign_social_security_details.errors.append('Bitte geben Sie die Art der Sozialversicherung im Gastland an.')
-            return False
+                raise ValidationError('Bitte wählen Sie mindestens eine Versicherungsart.')
 
-        return True
-        
-        
-class OtherParentInfoForm(FlaskForm):
+
+class OtherParentInfoForm(WizardForm):
     vorname = StringField('Vorname des anderen Elternteils', validators=[DataRequired(message="Pflichtfeld")])
     nachname = StringField('Nachname des anderen Elternteils', validators=[DataRequired(message="Pflichtfeld")])
     geburtsdatum = DateField(
@@ -387,21 +385,13 @@ class OtherParentInfoForm(FlaskForm):
 
     submit = SubmitField('Weiter')
 
-    def validate(self, **kwargs):
-        if not super().validate(**kwargs):
-            return False
+    def validate_geburtsdatum(self, field):
+        if field.data > date.today():
+            raise ValidationError('Geburtsdatum kann nicht in der Zukunft liegen.')
 
-        today = date.today()
-        bd = self.geburtsdatum.data
-        if bd > today:
-            self.geburtsdatum.errors.append('Geburtsdatum kann nicht in der Zukunft liegen.')
-            return False
-
-        if not self.steuer_id.data.isdigit():
-            self.steuer_id.errors.append('Steuer-ID muss nur aus Ziffern bestehen.')
-            return False
-
-        return True
+    def validate_steuer_id(self, field):
+        if not field.data.isdigit():
+            raise ValidationError('Steuer-ID muss nur aus Ziffern bestehen.')
 
 class IncomeForm(FlaskForm):
     """
@@ -475,7 +465,7 @@ class IncomeForm(FlaskForm):
         return True
 
 
-class BankInfoForm(FlaskForm):
+class BankInfoForm(WizardForm):
     # IBAN (German format starts with "DE" followed by 20 digits)
     iban = StringField(
         'Kontonummer (IBAN)',
@@ -512,7 +502,15 @@ class BankInfoForm(FlaskForm):
 
 
 # --- NEW CLASS: IncomeBeforeBirthForm ---
-class IncomeBeforeBirthForm(FlaskForm):
+# A period's four fields are required together; each reports a missing part itself
+_OTHER_PERIOD = RequiredIf('Bitte geben Sie den vollständigen abweichenden Bemessungszeitraum an.',
+                           assessment_period_type='other')
+_PROFIT_PERIOD = RequiredIf('Bitte geben Sie den vollständigen Ermittlungszeitraum des Gewinns an.',
+                            has_self_employed_income='yes')
+_YEAR = _digits('Jahr muss eine gültige Zahl sein.')
+
+
+class IncomeBeforeBirthForm(WizardForm):
     # 5.1 Bemessungszeitraum (Assessment Period)
     assessment_period_type = RadioField(
         'Bemessungszeitraum',
@@ -524,25 +522,26 @@ class IncomeBeforeBirthForm(FlaskForm):
     )
     other_assessment_reason = TextAreaField(
         'Begründung (falls "Andere Kalendermonate" gewählt)',
-        validators=[Optional()]
+        validators=[RequiredIf('Bitte geben Sie eine Begründung für den abweichenden Bemessungszeitraum an.',
+                               assessment_period_type='other'), Optional()]
     )
     other_assessment_start_month = SelectField(
         'Monat (von)',
         choices=[(str(i), str(i)) for i in range(1, 13)],
-        validators=[Optional()]
+        validators=[_OTHER_PERIOD, Optional()]
     )
     other_assessment_start_year = StringField(
         'Jahr (von)',
-        validators=[Optional(), Length(min=4, max=4, message="Bitte geben Sie ein 4-stelliges Jahr ein.")]
+        validators=[_OTHER_PERIOD, Optional(), Length(min=4, max=4, message="Bitte geben Sie ein 4-stelliges Jahr ein."), _YEAR]
     )
     other_assessment_end_month = SelectField(
         'Monat (bis)',
         choices=[(str(i), str(i)) for i in range(1, 13)],
-        validators=[Optional()]
+        validators=[_OTHER_PERIOD, Optional()]
     )
     other_assessment_end_year = StringField(
         'Jahr (bis)',
-        validators=[Optional(), Length(min=4, max=4, message="Bitte geben Sie ein 4-stelliges Jahr ein.")]
+        validators=[_OTHER_PERIOD, Optional(), Length(min=4, max=4, message="Bitte geben Sie ein 4-stelliges Jahr ein."), _YEAR]
     )
 
     # 5.2 Einkommen aus nichtselbständiger Arbeit (Income from Employment)
@@ -552,7 +551,8 @@ class IncomeBeforeBirthForm(FlaskForm):
         validators=[DataRequired("Bitte geben Sie an, ob Sie Einkommen aus nichtselbständiger Arbeit hatten.")],
         default='no'
     )
-    employer_name = StringField('Name des Arbeitgebers / Dienstherrn / Ausbildung', validators=[Optional()])
+    employer_name = StringField('Name des Arbeitgebers / Dienstherrn / Ausbildung', validators=[
+        RequiredIf('Bitte geben Sie den Namen des Arbeitgebers an.', has_employed_income='yes'), Optional()])
 
     # Dynamically create fields for 12 months of gross income
     # Note: For simplicity, we'll assume a fixed 12 months for now.
@@ -575,19 +575,24 @@ class IncomeBeforeBirthForm(FlaskForm):
     # 5.3 Besondere Einnahmen (Special Income)
     # Checkboxes for special income types
     has_mutterschaftsgeld = BooleanField('Mutterschaftsgeld')
-    mutterschaftsgeld_amount = DecimalField('Höhe des Mutterschaftsgeldes in Euro', places=2, validators=[Optional(), NumberRange(min=0, message="Der Wert muss positiv sein.")])
+    mutterschaftsgeld_amount = DecimalField('Höhe des Mutterschaftsgeldes in Euro', places=2, validators=[
+        RequiredIf('Bitte geben Sie die Höhe des Mutterschaftsgeldes an.', has_mutterschaftsgeld=True), Optional(), NumberRange(min=0, message="Der Wert muss positiv sein.")])
 
     has_krankentagegeld = BooleanField('Krankentagegeld')
-    krankentagegeld_amount = DecimalField('Höhe des Krankentagegeldes in Euro', places=2, validators=[Optional(), NumberRange(min=0, message="Der Wert muss positiv sein.")])
+    krankentagegeld_amount = DecimalField('Höhe des Krankentagegeldes in Euro', places=2, validators=[
+        RequiredIf('Bitte geben Sie die Höhe des Krankentagegeldes an.', has_krankentagegeld=True), Optional(), NumberRange(min=0, message="Der Wert muss positiv sein.")])
 
     has_kurzarbeitergeld = BooleanField('Kurzarbeitergeld / Arbeitslosengeld I')
-    kurzarbeitergeld_amount = DecimalField('Höhe des Kurzarbeitergeldes / Arbeitslosengeldes I in Euro', places=2, validators=[Optional(), NumberRange(min=0, message="Der Wert muss positiv sein.")])
+    kurzarbeitergeld_amount = DecimalField('Höhe des Kurzarbeitergeldes / Arbeitslosengeldes I in Euro', places=2, validators=[
+        RequiredIf('Bitte geben Sie die Höhe des Kurzarbeitergeldes / Arbeitslosengeldes I an.', has_kurzarbeitergeld=True), Optional(), NumberRange(min=0, message="Der Wert muss positiv sein.")])
 
     has_elterngeld_older_child = BooleanField('Elterngeld für ein älteres Kind')
-    elterngeld_older_child_amount = DecimalField('Höhe des Elterngeldes für älteres Kind in Euro', places=2, validators=[Optional(), NumberRange(min=0, message="Der Wert muss positiv sein.")])
+    elterngeld_older_child_amount = DecimalField('Höhe des Elterngeldes für älteres Kind in Euro', places=2, validators=[
+        RequiredIf('Bitte geben Sie die Höhe des Elterngeldes für älteres Kind an.', has_elterngeld_older_child=True), Optional(), NumberRange(min=0, message="Der Wert muss positiv sein.")])
 
     has_other_income = BooleanField('Sonstige Einnahmen')
-    other_income_amount = DecimalField('Höhe der sonstigen Einnahmen in Euro', places=2, validators=[Optional(), NumberRange(min=0, message="Der Wert muss positiv sein.")])
+    other_income_amount = DecimalField('Höhe der sonstigen Einnahmen in Euro', places=2, validators=[
+        RequiredIf('Bitte geben Sie die Höhe der sonstigen Einnahmen an.', has_other_income=True), Optional(), NumberRange(min=0, message="Der Wert muss positiv sein.")])
 
 
     # 5.4 Einkommen aus selbständiger Tätigkeit, Gewerbebetrieb, Land- und Forstwirtschaft (Self-Employment Income)
@@ -597,84 +602,27 @@ class IncomeBeforeBirthForm(FlaskForm):
         validators=[DataRequired("Bitte geben Sie an, ob Sie Einkommen aus selbständiger Tätigkeit hatten.")],
         default='no'
     )
-    self_employment_activity_type = StringField('Art der Tätigkeit', validators=[Optional()])
+    self_employment_activity_type = StringField('Art der Tätigkeit', validators=[
+        RequiredIf('Bitte geben Sie die Art der Tätigkeit an.', has_self_employed_income='yes'), Optional()])
     profit_assessment_start_month = SelectField(
         'Ermittlungszeitraum des Gewinns (von Monat)',
         choices=[(str(i), str(i)) for i in range(1, 13)],
-        validators=[Optional()]
+        validators=[_PROFIT_PERIOD, Optional()]
     )
     profit_assessment_start_year = StringField(
         'Ermittlungszeitraum des Gewinns (von Jahr)',
-        validators=[Optional(), Length(min=4, max=4, message="Bitte geben Sie ein 4-stelliges Jahr ein.")]
+        validators=[_PROFIT_PERIOD, Optional(), Length(min=4, max=4, message="Bitte geben Sie ein 4-stelliges Jahr ein."), _YEAR]
     )
     profit_assessment_end_month = SelectField(
         'Ermittlungszeitraum des Gewinns (bis Monat)',
         choices=[(str(i), str(i)) for i in range(1, 13)],
-        validators=[Optional()]
+        validators=[_PROFIT_PERIOD, Optional()]
     )
     profit_assessment_end_year = StringField(
         'Ermittlungszeitraum des Gewinns (bis Jahr)',
-        validators=[Optional(), Length(min=4, max=4, message="Bitte geben Sie ein 4-stelliges Jahr ein.")]
+        validators=[_PROFIT_PERIOD, Optional(), Length(min=4, max=4, message="Bitte geben Sie ein 4-stelliges Jahr ein."), _YEAR]
     )
-    profit_amount = DecimalField('Höhe des Gewinns in Euro', places=2, validators=[Optional(), NumberRange(min=0, message="Der Wert muss positiv sein.")])
+    profit_amount = DecimalField('Höhe des Gewinns in Euro', places=2, validators=[
+        RequiredIf('Bitte geben Sie die Höhe des Gewinns an.', has_self_employed_income='yes'), Optional(), NumberRange(min=0, message="Der Wert muss positiv sein.")])
 
     submit = SubmitField('Weiter')
-
-    def validate_on_submit(self):
-        if not super().validate_on_submit():
-            return False
-
-        # Conditional validation for "Other Assessment Period"
-        if self.assessment_period_type.data == 'other':
-            if not self.other_assessment_reason.data:
-                self.other_assessment_reason.errors.append('Bitte geben Sie eine Begründung für den abweichenden Bemessungszeitraum an.')
-            if not (self.other_assessment_start_month.data and self.other_assessment_start_year.data and
-                    self.other_assessment_end_month.data and self.other_assessment_end_year.data):
-                self.other_assessment_start_month.errors.append('Bitte geben Sie den vollständigen abweichenden Bemessungszeitraum an.')
-            try:
-                if self.other_assessment_start_year.data:
-                    int(self.other_assessment_start_year.data)
-                if self.other_assessment_end_year.data:
-                    int(self.other_assessment_end_year.data)
-            except ValueError:
-                self.other_assessment_start_year.errors.append('Jahr muss eine gültige Zahl sein.')
-
-        # Conditional validation for Employed Income
-        if self.has_employed_income.data == 'yes':
-            if not self.employer_name.data:
-                self.employer_name.errors.append('Bitte geben Sie den Namen des Arbeitgebers an.')
-            # You might want to add validation that at least some monthly income is entered,
-            # but for now, Optional() allows empty fields if user chooses to not fill all 12.
-            # A more robust check might be `if any(field.data for field in self.gross_income_months)`
-
-        # Conditional validation for Special Income amounts if checkbox is checked
-        if self.has_mutterschaftsgeld.data and self.mutterschaftsgeld_amount.data is None:
-            self.mutterschaftsgeld_amount.errors.append('Bitte geben Sie die Höhe des Mutterschaftsgeldes an.')
-        if self.has_krankentagegeld.data and self.krankentagegeld_amount.data is None:
-            self.krankentagegeld_amount.errors.append('Bitte geben Sie die Höhe des Krankentagegeldes an.')
-        if self.has_kurzarbeitergeld.data and self.kurzarbeitergeld_amount.data is None:
-            self.kurzarbeitergeld_amount.errors.append('Bitte geben Sie die Höhe des Kurzarbeitergeldes / Arbeitslosengeldes I an.')
-        if self.has_elterngeld_older_child.data and self.elterngeld_older_child_amount.data is None:
-            self.elterngeld_older_child_amount.errors.append('Bitte geben Sie die Höhe des Elterngeldes für älteres Kind an.')
-        if self.has_other_income.data and self.other_income_amount.data is None:
-            self.other_income_amount.errors.append('Bitte geben Sie die Höhe der sonstigen Einnahmen an.')
-
-
-        # Conditional validation for Self-Employed Income
-        if self.has_self_employed_income.data == 'yes':
-            if not self.self_employment_activity_type.data:
-                self.self_employment_activity_type.errors.append('Bitte geben Sie die Art der Tätigkeit an.')
-            if not (self.profit_assessment_start_month.data and self.profit_assessment_start_year.data and
-                    self.profit_assessment_end_month.data and self.profit_assessment_end_year.data):
-                self.profit_assessment_start_month.errors.append('Bitte geben Sie den vollständigen Ermittlungszeitraum des Gewinns an.')
-            if self.profit_amount.data is None:
-                self.profit_amount.errors.append('Bitte geben Sie die Höhe des Gewinns an.')
-            try:
-                if self.profit_assessment_start_year.data:
-                    int(self.profit_assessment_start_year.data)
-                if self.profit_assessment_end_year.data:
-                    int(self.profit_assessment_end_year.data)
-            except ValueError:
-                self.profit_assessment_start_year.errors.append('Jahr muss eine gültige Zahl sein.')
-
-        return True
@@ -0,0 +1,26 @@
+# gunicorn.conf.py
+#
+#   gunicorn -c gunicorn.conf.py
+#
+# The app is built and warmed up (PDF libraries, parsed template, Jinja templates;
+# see preload.py) once in the master; the forked workers share it copy-on-write.
+
+import multiprocessing
+import os
+
+wsgi_app = "app:create_app()"
+preload_app = True
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# Each worker owns a pool of PDF_JOB_WORKERS job processes (default 1, see pdf_jobs.py), started on its first job
+# A cold fill used to take seconds; with preload the first request is as fast as any other
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+# Recycle workers now and then; the copy-on-write pages stay shared with the master
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = 200
+accesslog = "-"
+
+
+def when_ready(server):
+    server.log.info("Master warmed up, forking %s workers", server.cfg.workers)
@@ -0,0 +1,82 @@
+# import_report.py
+"""
+Where the cold-start import time of the web app goes.
+
+Imports a module in a fresh interpreter with `python -X importtime` and sums the
+self time per top-level package, so a dependency that sneaks into the import path
+(a PDF library pulled in by app.py instead of lazily by an engine) shows up at once:
+
+    python import_report.py                   # app
+    python import_report.py --module engines --top 15
+    python import_report.py --json > import_times.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+DEFAULT_MODULE = "app"
+# Libraries that belong to the fill path and should only load on first use
+PDF_LIBRARIES = ('pikepdf', 'pypdf', 'pdfrw', 'reportlab')
+
+
+def measure(module: str) -> dict:
+    """Run `import module` under -X importtime; return per-package and total times in ms."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    packages = defaultdict(float)
+    total = 0.0
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        packages[name.strip().split(".")[0]] += int(self_us) / 1000
+        # One space of indentation: imported directly by the -c statement
+        if not name.startswith("  "):
+            total += int(cumulative_us) / 1000
+    return {
+        "module": module,
+        "total_ms": round(total, 1),
+        "packages": {name: round(ms, 1) for name, ms in sorted(packages.items(), key=lambda kv: -kv[1])},
+        "pdf_libraries": [lib for lib in PDF_LIBRARIES if lib in packages],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default=DEFAULT_MODULE, help=f'module to import (default: {DEFAULT_MODULE})')
+    parser.add_argument('--top', type=int, default=20, help='packages to list')
+    parser.add_argument('--json', action='store_true', help='print the full report as JSON')
+    args = parser.parse_args(argv)
+
+    try:
+        report = measure(args.module)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return 0
+
+    print(f"import {report['module']}: {report['total_ms']:.1f} ms")
+    for name, ms in list(report['packages'].items())[:args.top]:
+        print(f"  {name:<24} {ms:8.1f} ms")
+    loaded = report['pdf_libraries']
+    print(f"PDF libraries imported: {', '.join(loaded) if loaded else 'none'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+# metrics.py
+"""
+Counters and histograms in the Prometheus text format, without an external
+service or client library:
+
+    inc('pdf_errors_total', engine='pypdf')
+    observe('pdf_output_bytes', len(pdf), engine='pypdf')
+    with stage('fill'):             # pdf_stage_seconds{stage="fill"}
+        ...
+    render()                        # text for GET /metrics
+
+Every metric is declared in METRICS below. Values live in the process that
+recorded them; with a directory configured (configure()), each process also
+writes a snapshot to <directory>/<pid>-<token>.json and render() adds up the
+snapshots of all processes, so a scrape that reaches one gunicorn worker still
+sees the whole server, PDF pool processes included. flush() writes at most
+once per interval (configure(interval=...), default 5 s; force=True and process
+exit write at once), so other processes' values in a scrape are up to that old. Snapshots of exited
+processes stay until the directory is reset (server start), so counters do not
+go backwards when a worker is recycled.
+"""
+
+import atexit
+import glob
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+COUNTER, HISTOGRAM = 'counter', 'histogram'
+
+_LATENCY = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+_STAGE = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5)
+_PDF_BYTES = tuple(1 << n for n in range(14, 25))          # 16 KB … 16 MB
+_SESSION_BYTES = tuple(1 << n for n in range(7, 17))       # 128 B … 64 KB
+
+DEFAULT_FLUSH_INTERVAL = 5.0
+
+# name → (type, help, histogram buckets)
+METRICS = {
+    'http_request_duration_seconds': (HISTOGRAM, "Request latency by endpoint", _LATENCY),
+    'http_errors_total': (COUNTER, "Responses with status >= 500 and unhandled exceptions by endpoint", None),
+    'pdf_stage_seconds': (HISTOGRAM, "PDF generation time by stage: decrypt, parse, fill, serialize, send", _STAGE),
+    'pdf_output_bytes': (HISTOGRAM, "Size of generated PDFs by engine", _PDF_BYTES),
+    'pdf_errors_total': (COUNTER, "Failed PDF generations by engine", None),
+    'pdf_cache_requests_total': (COUNTER, "PDF cache lookups by result (hit, miss)", None),
+    'session_payload_bytes': (HISTOGRAM, "Serialized size of saved sessions", _SESSION_BYTES),
+}
+
+# (name, ((label, value), ...)) → counter: [value]; histogram: [bucket counts..., +Inf count, sum]
+_values = {}
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_directory = None
+_snapshot = None          # this process's snapshot file
+_interval = DEFAULT_FLUSH_INTERVAL
+_flushed = 0.0            # time.monotonic() of the last write
+
+
+def _reset_after_fork():
+    # A forked child starts at zero: its parent's values are counted in the parent's snapshot
+    global _lock, _flush_lock, _snapshot, _flushed
+    _lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    _values.clear()
+    _snapshot = None
+    _flushed = 0.0
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def configure(directory: str = None, reset: bool = False, interval: float = None) -> None:
+    """Share values between processes through directory; reset=True deletes old snapshots (server start)."""
+    global _directory, _snapshot, _interval
+    _directory = directory
+    _snapshot = None
+    if interval is not None:
+        _interval = interval
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        if reset:
+            for path in glob.glob(os.path.join(directory, '*.json')) + glob.glob(os.path.join(directory, '.snapshot-*.tmp')):
+                os.unlink(path)
+
+
+# ─── Recording ──────────────────────────────────────────────────────────
+
+def _key(name, labels):
+    if name not in METRICS:
+        raise KeyError(f"undeclared metric {name!r}")
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    key = _key(name, labels)
+    with _lock:
+        entry = _values.get(key)
+        if entry is None:
+            entry = _values[key] = [0]
+        entry[0] += amount
+
+
+def observe(name: str, value: float, **labels) -> None:
+    key = _key(name, labels)
+    buckets = METRICS[name][2]
+    with _lock:
+        entry = _values.get(key)
+        if entry is None:
+            entry = _values[key] = [0] * (len(buckets) + 2)
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                entry[i] += 1
+                break
+        else:
+            entry[len(buckets)] += 1
+        entry[-1] += value
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as pdf_stage_seconds{stage=name}."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('pdf_stage_seconds', time.perf_counter() - started, stage=name)
+
+
+# ─── Sharing between processes ──────────────────────────────────────────
+
+def _dump() -> list:
+    with _lock:
+        return [[name, list(labels), list(entry)] for (name, labels), entry in _values.items()]
+
+
+def flush(force: bool = False) -> None:
+    """
+    Write this process's snapshot if the last write is an interval ago
+    (force=True: always). No-op without a directory or values; safe from any thread.
+    """
+    global _snapshot, _flushed
+    if not _directory or not _values:
+        return
+    if not force and time.monotonic() - _flushed < _interval:
+        return
+    # Non-blocking: if another thread is writing right now, its snapshot will do
+    if not _flush_lock.acquire(blocking=force):
+        return
+    try:
+        if _snapshot is None:
+            _snapshot = os.path.join(_directory, f"{os.getpid()}-{secrets.token_hex(4)}.json")
+        fd, tmp = tempfile.mkstemp(dir=_directory, prefix='.snapshot-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(_dump(), f, separators=(',', ':'))
+            os.replace(tmp, _snapshot)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        _flushed = time.monotonic()
+    finally:
+        _flush_lock.release()
+
+
+def _flush_at_exit():
+    try:
+        flush(force=True)
+    except OSError:
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def _merged() -> dict:
+    rows = []
+    if _directory:
+        for path in glob.glob(os.path.join(_directory, '*.json')):
+            if path == _snapshot:
+                continue      # our own values are read from memory, they are newer
+            try:
+                with open(path, encoding='utf-8') as f:
+                    rows.extend(json.load(f))
+            except (OSError, ValueError):
+                continue
+    rows.extend(_dump())
+
+    merged = {}
+    for name, labels, entry in rows:
+        if name not in METRICS:
+            continue
+        key = name, tuple(tuple(pair) for pair in labels)
+        total = merged.get(key)
+        if total is None or len(total) != len(entry):
+            merged[key] = list(entry)
+        else:
+            for i, value in enumerate(entry):
+                total[i] += value
+    return merged
+
+
+# ─── Exposition ─────────────────────────────────────────────────────────
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ''
+    escaped = (v.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render() -> str:
+    """All metrics of all processes in the Prometheus text format (version 0.0.4)."""
+    merged = _merged()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for (metric, labels), entry in sorted(merged.items()):
+            if metric != name:
+                continue
+            if kind == COUNTER:
+                lines.append(f"{name}{_labels(labels)} {_number(entry[0])}")
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), entry):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(entry[-1])}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+    return '\n'.join(lines) + '\n'
+
+
+def clear() -> None:
+    with _lock:
+        _values.clear()
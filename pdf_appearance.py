@@ -0,0 +1,211 @@
+# pdf_appearance.py
+"""
+Server-side appearance streams for filled text fields.
+
+With /NeedAppearances true the viewer has to draw every field itself, which many
+mobile and browser viewers skip (blank fields) or do slowly on open. Here each
+filled text widget gets its own /AP /N form XObject instead, drawn with the
+form's default-resource fonts (/DR) and the widget's /DA.
+
+The fonts, their encodings and glyph widths are resolved once per template and
+shared by every request; building a stream is then pure string work.
+"""
+
+import threading
+
+from pypdf._codecs import _std_encoding, adobe_glyphs
+from pypdf.generic import (
+    ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject,
+)
+from reportlab.pdfbase import pdfmetrics
+
+PADDING = 2.0           # Abstand zwischen Feldrand und Text
+AUTO_MAX_SIZE = 12.0    # Obergrenze für Auto-Schriftgröße (/DA ... 0 Tf)
+AUTO_MIN_SIZE = 4.0
+
+# Multiline text field flag (PDF 32000-1, Table 228)
+_MULTILINE = 1 << 12
+
+
+# ─── Fonts ──────────────────────────────────────────────────────────────
+
+class FontResource:
+    """A /DR font: the resource name, its encoding (char → code) and glyph widths."""
+
+    def __init__(self, name: str, font: DictionaryObject):
+        self.name = name
+        base_font = str(font.get("/BaseFont", "/Helvetica"))[1:]
+        if base_font not in pdfmetrics.standardFonts:
+            base_font = "Helvetica"
+        face = pdfmetrics.getFont(base_font).face
+        self.ascent = face.ascent / 1000
+        self.descent = face.descent / 1000
+
+        chars = list(_std_encoding)
+        encoding = font.get("/Encoding")
+        if encoding is not None and hasattr(encoding, "get"):
+            code = 0
+            for item in encoding.get("/Differences", []):
+                if isinstance(item, int):
+                    code = int(item)
+                    continue
+                chars[code] = adobe_glyphs.get(item, "")
+                code += 1
+        self.codes = {char: code for code, char in enumerate(chars) if len(char) == 1 and code >= 32}
+        self.widths = [pdfmetrics.stringWidth(char, base_font, 1) if char else 0.0 for char in chars]
+
+    def encode(self, text: str) -> bytes:
+        """Encode for a literal string; characters the font cannot show become '?'."""
+        question = self.codes["?"]
+        return bytes(self.codes.get(char, question) for char in text)
+
+    def width(self, encoded: bytes, size: float) -> float:
+        return sum(self.widths[code] for code in encoded) * size
+
+
+class AppearanceResources:
+    """Everything per template that appearance streams need, built once."""
+
+    def __init__(self, template):
+        acroform = template.reader.trailer["/Root"].get("/AcroForm", {})
+        dr_fonts = acroform.get("/DR", {}).get("/Font", {})
+        self.fonts = {str(name): FontResource(str(name), dr_fonts[name]) for name in dr_fonts}
+        self.default_da = str(acroform.get("/DA", "/Helv 0 Tf 0 g"))
+        self.default_q = int(acroform.get("/Q", 0))
+        # Shared /Resources dictionary, referencing the template's own font objects
+        self.resources = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({
+                NameObject(name): dr_fonts.raw_get(name) for name in dr_fonts
+            }),
+        })
+
+    def font(self, name: str) -> FontResource:
+        # Fonts missing from /DR (e.g. "/Arial") fall back to Helvetica
+        return self.fonts.get(name) or self.fonts.get("/Helv") or next(iter(self.fonts.values()))
+
+
+_resources = {}
+_lock = threading.Lock()
+
+
+def get_resources(template) -> AppearanceResources:
+    """Return the cached AppearanceResources for a PdfTemplate."""
+    key = (template.path, template.digest)
+    cached = _resources.get(key)
+    if cached is None:
+        with _lock:
+            cached = _resources.get(key)
+            if cached is None:
+                cached = _resources[key] = AppearanceResources(template)
+    return cached
+
+
+def evict(template) -> None:
+    _resources.pop((template.path, template.digest), None)
+
+
+# ─── Streams ────────────────────────────────────────────────────────────
+
+def parse_da(da: str):
+    """'/Helv 0 Tf 0 g' → ('/Helv', 0.0, '0 g')"""
+    tokens = da.split()
+    font, size, color = "/Helv", 0.0, []
+    i = 0
+    while i < len(tokens):
+        if i + 2 < len(tokens) and tokens[i + 2] == "Tf":
+            font, size = tokens[i], float(tokens[i + 1])
+            i += 3
+            continue
+        color.append(tokens[i])
+        i += 1
+    return font, size, " ".join(color) or "0 g"
+
+
+def _num(value: float) -> str:
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def _escape(encoded: bytes) -> bytes:
+    return encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _wrap(font: FontResource, text: str, size: float, width: float):
+    """Greedy word wrap of text into lines no wider than width."""
+    lines = []
+    for paragraph in text.splitlines() or [""]:
+        line = ""
+        for word in paragraph.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if line and font.width(font.encode(candidate), size) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+
+def text_appearance(resources: AppearanceResources, widget, field, value: str, flags: int):
+    """Build the /N appearance stream for one text widget showing value."""
+    x1, y1, x2, y2 = (float(v) for v in widget["/Rect"])
+    width, height = abs(x2 - x1), abs(y2 - y1)
+    font_name, size, color = parse_da(str(widget.get("/DA") or field.get("/DA") or resources.default_da))
+    font = resources.font(font_name)
+    quadding = int(field.get("/Q", widget.get("/Q", resources.default_q)))
+    inner_width, inner_height = width - 2 * PADDING, height - 2 * PADDING
+    line_height = font.ascent - font.descent
+
+    if flags & _MULTILINE:
+        auto = not size
+        size = size or AUTO_MAX_SIZE
+        lines = _wrap(font, value, size, inner_width)
+        # Auto size: shrink until the wrapped text fits the box
+        while auto and size > AUTO_MIN_SIZE and len(lines) * size * line_height > inner_height:
+            size -= 0.5
+            lines = _wrap(font, value, size, inner_width)
+        top = height - PADDING - font.ascent * size
+    else:
+        lines = [value.replace("\r", " ").replace("\n", " ")]
+        if not size:
+            size = min(AUTO_MAX_SIZE, inner_height / line_height)
+            text_width = font.width(font.encode(lines[0]), 1)
+            if text_width * size > inner_width:
+                size = max(AUTO_MIN_SIZE, inner_width / text_width)
+        # Vertically centred on the glyph box
+        top = (height - size * line_height) / 2 - font.descent * size
+
+    ops = [b"/Tx BMC", b"q", f"1 1 {_num(width - 2)} {_num(height - 2)} re W n".encode(), b"BT",
+           f"{font.name} {_num(size)} Tf {color}".encode()]
+    for i, line in enumerate(lines):
+        encoded = font.encode(line)
+        line_width = font.width(encoded, size)
+        if quadding == 1:
+            x = (width - line_width) / 2
+        elif quadding == 2:
+            x = width - PADDING - line_width
+        else:
+            x = PADDING
+        y = top - i * size * line_height
+        ops.append(f"1 0 0 1 {_num(x)} {_num(y)} Tm".encode())
+        ops.append(b"(" + _escape(encoded) + b") Tj")
+    ops += [b"ET", b"Q", b"EMC"]
+
+    stream = DecodedStreamObject()
+    stream.set_data(b"\n".join(ops) + b"\n")
+    stream.update({
+        NameObject("/Type"): NameObject("/XObject"),
+        NameObject("/Subtype"): NameObject("/Form"),
+        NameObject("/BBox"): ArrayObject([FloatObject(0), FloatObject(0), FloatObject(width), FloatObject(height)]),
+        NameObject("/Resources"): resources.resources,
+    })
+    return stream
+
+
+def set_text_appearance(doc, info, value: str) -> None:
+    """Give every widget of a filled text field (FieldInfo) a fresh /AP on the TemplateClone."""
+    resources = get_resources(doc.template)
+    field = doc.get(info.ref)
+    for widget_info in info.widgets:
+        widget = doc.edit(widget_info.ref)
+        stream = text_appearance(resources, widget, field, value, info.flags)
+        widget[NameObject("/AP")] = DictionaryObject({NameObject("/N"): doc.add(stream)})
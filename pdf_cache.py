@@ -0,0 +1,209 @@
+# pdf_cache.py
+"""
+Content-addressed cache of generated PDFs.
+
+A document is identified by what actually goes into it: the template version,
+the engine and its options, and the field values the mapping derives from the
+session (field_mapping.BERLIN_PLAN), so session keys the PDF never shows do not
+cause a miss. The key doubles as the response's ETag.
+
+Two size-bounded LRU tiers:
+
+  memory   per process; entries keep the engine's parts, so the template bytes an
+           incremental fill shares with every other document are not counted
+  disk     <dir>/<key>.pdf, shared by all workers; file atime is the LRU clock,
+           mtime the time the document was written
+
+The documents hold personal data (names, tax ids, IBANs, income), so both tiers
+also drop them max_age seconds after they were generated, however often they are
+used: get() treats older entries as missing, and every disk write purges them.
+
+    cache = PdfCache("instance/pdf_cache", memory_bytes=64 << 20, disk_bytes=512 << 20, max_age=3600)
+    key = document_key(template.digest, "pypdf", options, data)
+    parts = cache.get(key) or cache.put(key, engine.fill_parts(...), shared=(template.data,))
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+from field_mapping import BERLIN_PLAN
+
+# Bump when a code change alters the generated PDFs for the same input
+CACHE_VERSION = 1
+DEFAULT_MAX_AGE = 3600
+
+
+def document_key(template_digest: str, engine_name: str, options: dict, data: dict, plan=BERLIN_PLAN) -> str:
+    """Hex SHA-256 over the template's SHA-256, engine, options and the normalized field values."""
+    payload = json.dumps(
+        [CACHE_VERSION, template_digest, engine_name, options, plan.values(data)],
+        sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PdfCache:
+
+    def __init__(self, directory: str = None, memory_bytes: int = 64 << 20, disk_bytes: int = 512 << 20,
+                 max_age: float = DEFAULT_MAX_AGE):
+        self.directory = directory if disk_bytes else None
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.max_age = max_age           # seconds; 0/None: only the size limits apply
+        self._memory = OrderedDict()     # key → (parts, counted size, time written)
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._evict_disk()         # documents left over from before a restart
+
+    def _expired(self, written: float) -> bool:
+        return bool(self.max_age) and time.time() - written > self.max_age
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".pdf")
+
+    # ─── Lookup ─────────────────────────────────────────────────────────
+
+    def get(self, key: str):
+        """The cached document as a list of byte parts, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._expired(entry[2]):
+                self._forget(key)
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                metrics.inc("pdf_cache_requests_total", result="hit")
+                return list(entry[0])
+
+        if self.directory:
+            path = self._path(key)
+            try:
+                written = os.stat(path).st_mtime
+                if self._expired(written):
+                    os.unlink(path)
+                    data = None
+                else:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    os.utime(path, (time.time(), written))      # LRU: atime = last use
+            except FileNotFoundError:
+                data = None
+            if data is not None:
+                self._remember(key, (data,), len(data), written)
+                with self._lock:
+                    self.hits += 1
+                metrics.inc("pdf_cache_requests_total", result="hit")
+                return [data]
+
+        with self._lock:
+            self.misses += 1
+        metrics.inc("pdf_cache_requests_total", result="miss")
+        return None
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._memory.get(key)
+        if entry is not None and not self._expired(entry[2]):
+            return True
+        if not self.directory:
+            return False
+        try:
+            return not self._expired(os.stat(self._path(key)).st_mtime)
+        except FileNotFoundError:
+            return False
+
+    # ─── Store ──────────────────────────────────────────────────────────
+
+    def put(self, key: str, parts, shared=()) -> list:
+        """
+        Store a document given as byte parts and return the parts. Parts that are
+        identical (is) to one in shared, e.g. the template's bytes, cost no memory budget.
+        """
+        parts = tuple(parts)
+        size = sum(len(part) for part in parts if not any(part is s for s in shared))
+        self._remember(key, parts, size, time.time())
+        if self.directory:
+            self._write(key, parts)
+        return list(parts)
+
+    def _remember(self, key, parts, size, written):
+        if not self.memory_bytes or size > self.memory_bytes:
+            return
+        with self._lock:
+            self._forget(key)
+            self._memory[key] = (parts, size, written)
+            self._memory_size += size
+            while self._memory_size > self.memory_bytes:
+                _, (_, evicted, _) = self._memory.popitem(last=False)
+                self._memory_size -= evicted
+
+    def _forget(self, key):
+        # Caller holds self._lock
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_size -= old[1]
+
+    def _write(self, key, parts):
+        path = self._path(key)
+        try:
+            if not self._expired(os.stat(path).st_mtime):
+                os.utime(path, None)     # same document written again: a fresh copy
+                return
+        except FileNotFoundError:
+            pass
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            for part in parts:
+                f.write(part)
+        os.replace(tmp, path)
+        self._evict_disk()
+
+    def _evict_disk(self):
+        """Delete expired files, then the least recently used until the directory fits disk_bytes again."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".pdf"):
+                continue
+            try:
+                st = entry.stat()
+                if self._expired(st.st_mtime):
+                    os.unlink(entry.path)
+                    continue
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_atime, st.st_size, entry.path))
+            total += st.st_size
+        if total <= self.disk_bytes:
+            return
+        # Etwas Luft lassen, damit nicht jeder neue Eintrag wieder aufräumt
+        target = self.disk_bytes * 0.9
+        for _, size, path in sorted(entries):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            if total <= target:
+                break
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
+        if self.directory:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".pdf"):
+                    os.unlink(entry.path)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size}
@@ -0,0 +1,223 @@
+# pdf_flatten.py
+"""
+Flatten a filled TemplateClone: draw every visible widget's current appearance
+into its page's content, then drop the widget annotations and the AcroForm.
+
+The result can no longer be edited, and written with the object set flatten()
+returns it no longer carries the field dictionaries and unused appearance states.
+Fill with appearances=True first, so text fields have an /AP to burn in.
+"""
+
+import threading
+
+from pypdf.generic import (
+    ArrayObject, DecodedStreamObject, DictionaryObject, IndirectObject, NameObject,
+)
+
+from pdf_template import _references, _serialize
+
+# Annotation flags (PDF 32000-1, Table 165)
+_HIDDEN = 1 << 1
+_NO_VIEW = 1 << 5
+
+
+def _resolve(doc, obj):
+    return doc.get(obj) if isinstance(obj, IndirectObject) else obj
+
+
+def _inherited(doc, page, key):
+    """A page attribute that may be inherited from the page tree (/Resources, ...)."""
+    node = page
+    while node is not None:
+        if key in node:
+            return _resolve(doc, node.raw_get(key))
+        node = _resolve(doc, node.raw_get("/Parent")) if "/Parent" in node else None
+    return None
+
+
+def _num(value: float) -> str:
+    return f"{value:.4f}".rstrip("0").rstrip(".")
+
+
+def _appearance(doc, widget):
+    """The widget's current normal appearance as (stream ref, stream), or None."""
+    ap = _resolve(doc, widget.raw_get("/AP")) if "/AP" in widget else None
+    if not ap or "/N" not in ap:
+        return None
+    normal = ap.raw_get("/N")
+    resolved = _resolve(doc, normal)
+    if "/BBox" not in resolved:
+        # Dictionary of states (checkboxes, radio buttons): pick the one in /AS
+        state = widget.get("/AS")
+        if state is None or state not in resolved:
+            return None
+        normal = resolved.raw_get(state)
+        resolved = _resolve(doc, normal)
+    if not isinstance(normal, IndirectObject):
+        normal = doc.add(resolved)
+    return normal, resolved
+
+
+def _placement(rect, stream) -> str:
+    """The cm operator that maps the form's (transformed) /BBox onto the annotation /Rect."""
+    x1, y1, x2, y2 = (float(v) for v in rect)
+    x1, x2 = min(x1, x2), max(x1, x2)
+    y1, y2 = min(y1, y2), max(y1, y2)
+    bx1, by1, bx2, by2 = (float(v) for v in stream["/BBox"])
+    a, b, c, d, e, f = (float(v) for v in stream.get("/Matrix", (1, 0, 0, 1, 0, 0)))
+    corners = [(a * x + c * y + e, b * x + d * y + f) for x in (bx1, bx2) for y in (by1, by2)]
+    left, right = min(x for x, _ in corners), max(x for x, _ in corners)
+    bottom, top = min(y for _, y in corners), max(y for _, y in corners)
+    sx = (x2 - x1) / (right - left) if right > left else 1.0
+    sy = (y2 - y1) / (top - bottom) if top > bottom else 1.0
+    return f"{_num(sx)} 0 0 {_num(sy)} {_num(x1 - left * sx)} {_num(y1 - bottom * sy)} cm"
+
+
+def _content_stream(data: bytes) -> DecodedStreamObject:
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    return stream
+
+
+def flatten_page(doc, page_index: int) -> None:
+    page_ref = doc.template.page_refs[page_index]
+    page = doc.get(page_ref)
+    if "/Annots" not in page:
+        return
+
+    keep, draws, xobjects = [], [], {}
+    for annot_ref in _resolve(doc, page.raw_get("/Annots")):
+        annot = _resolve(doc, annot_ref)
+        if annot.get("/Subtype") != "/Widget":
+            keep.append(annot_ref)
+            continue
+        if int(annot.get("/F", 0)) & (_HIDDEN | _NO_VIEW):
+            continue
+        appearance = _appearance(doc, annot)
+        if appearance is None:
+            continue
+        ref, stream = appearance
+        name = f"/Fm{len(xobjects)}"
+        xobjects[NameObject(name)] = ref
+        draws.append(f"q {_placement(annot['/Rect'], stream)} {name} Do Q")
+
+    page = doc.edit(page_ref)
+    if keep:
+        page[NameObject("/Annots")] = ArrayObject(keep)
+    else:
+        del page[NameObject("/Annots")]
+    if not draws:
+        return
+
+    # Page content runs inside q/Q, so our drawing starts from the default graphics state
+    resources = DictionaryObject(_inherited(doc, page, "/Resources") or {})
+    existing = _resolve(doc, resources.raw_get("/XObject")) if "/XObject" in resources else {}
+    resources[NameObject("/XObject")] = DictionaryObject({**existing, **xobjects})
+    page[NameObject("/Resources")] = resources
+
+    contents = page.raw_get("/Contents") if "/Contents" in page else ArrayObject()
+    if isinstance(_resolve(doc, contents), list):
+        contents = list(_resolve(doc, contents))
+    else:
+        contents = [contents]
+    page[NameObject("/Contents")] = ArrayObject(
+        [doc.add(_content_stream(b"q\n"))] + contents
+        + [doc.add(_content_stream(("Q\n" + "\n".join(draws) + "\n").encode()))]
+    )
+
+
+# ─── Per-template preparation ───────────────────────────────────────────
+
+def _widget_ids(template) -> set:
+    return {
+        ref.idnum for page_ref in template.page_refs for ref in page_ref.get_object().get("/Annots", [])
+        if isinstance(ref, IndirectObject) and ref.get_object().get("/Subtype") == "/Widget"
+    }
+
+
+def _struct_patches(template, widgets: set):
+    """
+    Yield (idnum, patched element) for every tagged-PDF structure element that points
+    at a widget annotation, with those kids dropped from its /K. Otherwise the
+    structure tree (and the outline, through it) keeps the removed widgets alive.
+    """
+    objects = template.objects
+
+    def is_widget(kid):
+        kid = objects[kid.idnum - 1] if isinstance(kid, IndirectObject) else kid
+        target = kid.raw_get("/Obj") if isinstance(kid, dict) and kid.get("/Type") == "/OBJR" else None
+        return isinstance(target, IndirectObject) and target.idnum in widgets
+
+    for idnum, obj in enumerate(objects, start=1):
+        if not isinstance(obj, DictionaryObject) or "/S" not in obj or "/K" not in obj:
+            continue
+        kids = obj.raw_get("/K")
+        resolved = objects[kids.idnum - 1] if isinstance(kids, IndirectObject) else kids
+        items = resolved if isinstance(resolved, list) else [kids]
+        remaining = [kid for kid in items if not is_widget(kid)]
+        if len(remaining) != len(items):
+            patched = DictionaryObject(obj)
+            patched[NameObject("/K")] = ArrayObject(remaining)
+            yield idnum, patched
+
+
+class FlattenBase:
+    """
+    What every flattened copy of a template has in common, computed once:
+    the patched structure elements (already serialized) and the objects that stay
+    reachable once the form is gone, so pruning only walks what a request added.
+    """
+
+    def __init__(self, template):
+        self.patches = tuple(
+            (idnum, obj, _serialize(idnum, obj), _references(obj))
+            for idnum, obj in _struct_patches(template, _widget_ids(template))
+        )
+        doc = template.clone()
+        self.apply(doc)
+        for page_index, page_ref in enumerate(template.page_refs):
+            page = doc.get(page_ref)
+            if "/Annots" in page:
+                kept = [ref for ref in _resolve(doc, page.raw_get("/Annots"))
+                        if _resolve(doc, ref).get("/Subtype") != "/Widget"]
+                doc.edit(page_ref)[NameObject("/Annots")] = ArrayObject(kept)
+        self.keep = frozenset(doc.reachable())
+
+    def apply(self, doc) -> None:
+        """The request-independent part of flattening: structure tree and /AcroForm."""
+        for idnum, obj, chunk, references in self.patches:
+            doc.replace(idnum, obj, chunk, references)
+        root = doc.edit(doc.template.root_ref)
+        if "/AcroForm" in root:
+            del root[NameObject("/AcroForm")]
+
+
+_bases = {}
+_lock = threading.Lock()
+
+
+def get_flatten_base(template) -> FlattenBase:
+    key = (template.path, template.digest)
+    cached = _bases.get(key)
+    if cached is None:
+        with _lock:
+            cached = _bases.get(key)
+            if cached is None:
+                cached = _bases[key] = FlattenBase(template)
+    return cached
+
+
+def evict(template) -> None:
+    _bases.pop((template.path, template.digest), None)
+
+
+def flatten(doc) -> set:
+    """
+    Burn all widget appearances into the pages and remove the interactive form.
+    Returns the object numbers still in use, for doc.write(keep=...).
+    """
+    base = get_flatten_base(doc.template)
+    for page_index in range(len(doc.template.page_refs)):
+        flatten_page(doc, page_index)
+    base.apply(doc)
+    return doc.reachable(base.keep)
@@ -0,0 +1,208 @@
+# pdf_jobs.py
+"""
+Asynchronous PDF generation.
+
+/generate-pdf fills the PDF inside the web worker. In job mode the request only
+submits the work to a local process pool and returns a job id; the browser polls
+the job's status and downloads the finished file:
+
+    queue = PdfJobQueue("instance/pdf_jobs", workers=2, ttl=900)
+    job_id = queue.submit("pypdf", ("BE", "2023-04"), data, {"appearances": True})
+    queue.status(job_id)       # {"status": "queued" | "running" | "done" | "failed", ...}
+    queue.result_path(job_id)  # the PDF, once done
+
+Templates are named by their template_registry key (state, version), which the
+pool process resolves to the PDF and its field mapping. Status and result live in a spool directory (<id>.json, <id>.pdf), so any web
+worker can answer for a job that another worker submitted. Finished jobs are
+deleted ttl seconds after their last status change.
+"""
+
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import metrics
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+DEFAULT_TTL = 15 * 60
+# Pool processes per web worker. Every gunicorn worker owns its own pool, so a server runs
+# web workers × this many, each loading its own template (~40 MB) and sharing the same cores
+DEFAULT_WORKERS = 1
+PURGE_INTERVAL = 60.0
+
+_JOB_ID = re.compile(r"^[A-Za-z0-9_-]{22}$")   # secrets.token_urlsafe(16)
+
+
+# ─── Spool directory ────────────────────────────────────────────────────
+
+def _status_path(spool: str, job_id: str) -> str:
+    return os.path.join(spool, job_id + '.json')
+
+
+def _result_path(spool: str, job_id: str) -> str:
+    return os.path.join(spool, job_id + '.pdf')
+
+
+def _write_status(spool: str, job_id: str, status: dict) -> None:
+    # Erst unter temporärem Namen schreiben: Leser sehen nie eine halbe Datei
+    path = _status_path(spool, job_id)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(status, f)
+    os.replace(tmp, path)
+
+
+def _read_status(spool: str, job_id: str):
+    try:
+        with open(_status_path(spool, job_id), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# ─── Pool worker ────────────────────────────────────────────────────────
+
+def _init_worker(template):
+    """Runs once per pool process: load (decrypt, parse, index) the template."""
+    if template:
+        from template_registry import get_spec, load
+        load(get_spec(*template))
+
+
+def run_job(spool: str, job_id: str, engine_name: str, template: tuple, data: dict, options: dict) -> None:
+    """Fill one PDF into the spool directory; runs in a pool process and never raises."""
+    from engines import get_engine
+    from template_registry import get_spec, load
+
+    status = _read_status(spool, job_id) or {'id': job_id, 'created': time.time()}
+    status.update(status=RUNNING, started=time.time())
+    _write_status(spool, job_id, status)
+    path = _result_path(spool, job_id)
+    try:
+        spec = get_spec(*template)
+        load(spec)
+        with open(path + '.part', 'wb') as f:
+            for part in get_engine(engine_name).fill_parts(spec.path, data, spec.plan, **options):
+                f.write(part)
+        os.replace(path + '.part', path)
+        status.update(status=DONE, bytes=os.path.getsize(path))
+        metrics.observe('pdf_output_bytes', status['bytes'], engine=engine_name)
+    except Exception as e:
+        status.update(status=FAILED, error=f"{type(e).__name__}: {e}", traceback=traceback.format_exc(limit=5))
+        metrics.inc('pdf_errors_total', engine=engine_name)
+        if os.path.exists(path + '.part'):
+            os.unlink(path + '.part')
+    status['finished'] = time.time()
+    _write_status(spool, job_id, status)
+    # Pool processes serve no requests and skip atexit: publish their stage timings after every job
+    metrics.flush(force=True)
+
+
+# ─── Queue ──────────────────────────────────────────────────────────────
+
+class PdfJobQueue:
+    """Submits fill jobs to a process pool owned by this (web worker) process."""
+
+    def __init__(self, spool: str, workers: int = None, ttl: int = DEFAULT_TTL, template: tuple = None):
+        self.spool = spool
+        self.workers = workers or DEFAULT_WORKERS
+        self.ttl = ttl
+        self.template = template     # (state, version) warmed up in every pool process
+        os.makedirs(spool, exist_ok=True)
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        # Created on first use in the process that submits: a pool inherited across a fork is unusable
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 initargs=(self.template,))
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def submit(self, engine_name: str, template: tuple, data: dict, options: dict, key: str = None) -> str:
+        """Queue a fill; key (e.g. the pdf_cache document key) is kept in the status."""
+        self.purge()
+        job_id = secrets.token_urlsafe(16)
+        _write_status(self.spool, job_id, {'id': job_id, 'status': QUEUED, 'created': time.time(), 'key': key})
+        try:
+            future = self._executor().submit(run_job, self.spool, job_id, engine_name, tuple(template), data, options)
+        except Exception as e:
+            self._fail(job_id, e)
+            raise
+
+        def on_done(f):
+            # A crashed pool process (BrokenProcessPool, ...) still ends the job
+            if not f.cancelled() and f.exception() is not None:
+                self._fail(job_id, f.exception())
+        future.add_done_callback(on_done)
+        return job_id
+
+    def finished(self, parts, key: str = None) -> str:
+        """A job that is done right away, for a document that is already at hand (cache hit)."""
+        self.purge()
+        job_id = secrets.token_urlsafe(16)
+        path = _result_path(self.spool, job_id)
+        with open(path + '.part', 'wb') as f:
+            for part in parts:
+                f.write(part)
+        os.replace(path + '.part', path)
+        now = time.time()
+        _write_status(self.spool, job_id, {'id': job_id, 'status': DONE, 'created': now, 'started': now,
+                                           'finished': now, 'bytes': os.path.getsize(path), 'key': key})
+        return job_id
+
+    def _fail(self, job_id: str, error: BaseException) -> None:
+        status = _read_status(self.spool, job_id) or {'id': job_id}
+        if status.get('status') in (DONE, FAILED):
+            return
+        status.update(status=FAILED, error=f"{type(error).__name__}: {error}", finished=time.time())
+        _write_status(self.spool, job_id, status)
+
+    def status(self, job_id: str):
+        """The job's status dict (without traceback), or None if unknown or expired."""
+        if not _JOB_ID.match(job_id or ''):
+            return None
+        self.purge()
+        status = _read_status(self.spool, job_id)
+        if status is not None:
+            status.pop('traceback', None)
+        return status
+
+    def result_path(self, job_id: str):
+        """Path of the finished PDF, or None while the job is not done."""
+        status = self.status(job_id)
+        if status is None or status['status'] != DONE:
+            return None
+        path = _result_path(self.spool, job_id)
+        return path if os.path.exists(path) else None
+
+    def purge(self, now: float = None) -> int:
+        """Delete spool files untouched for longer than ttl; at most once per PURGE_INTERVAL."""
+        now = now or time.time()
+        if now < self._next_purge:
+            return 0
+        self._next_purge = now + PURGE_INTERVAL
+        removed = 0
+        for entry in os.scandir(self.spool):
+            try:
+                if entry.stat().st_mtime < now - self.ttl:
+                    os.unlink(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass   # another worker purged it first
+        return removed
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=True)
+            self._pool = None
@@ -0,0 +1,504 @@
+# pdf_template.py
+
+import hashlib
+import io
+import mmap
+import os
+import threading
+import zlib
+
+import pikepdf
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject, DictionaryObject, IndirectObject, NameObject, NumberObject, StreamObject,
+)
+
+from field_index import build_field_index
+from metrics import stage
+
+
+def _references(obj) -> frozenset:
+    """Object numbers of every indirect reference inside obj (not followed)."""
+    found = set()
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, IndirectObject):
+            found.add(item.idnum)
+        elif isinstance(item, dict):
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return frozenset(found)
+
+
+def _is_container(obj) -> bool:
+    return isinstance(obj, StreamObject) and obj.get("/Type") in ("/ObjStm", "/XRef")
+
+
+# Objects per object stream in a full rewrite (as qpdf packs them)
+_OBJSTM_SIZE = 100
+
+
+def _serialize(idnum: int, obj):
+    if obj is None:
+        return None
+    buffer = io.BytesIO()
+    buffer.write(b"%d 0 obj\n" % idnum)
+    obj.write_to_stream(buffer)
+    buffer.write(b"\nendobj\n")
+    return buffer.getvalue()
+
+
+class PdfTemplate:
+    """
+    A decrypted, fully parsed form template that is shared by every request.
+
+    The objects in here are never modified after loading. Requests work on a
+    TemplateClone, which copies an object the first time it is edited.
+    """
+
+    def __init__(self, path: str, mtime: float, size: int, digest: str, data: bytes):
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.digest = digest
+        # Decrypted bytes, object streams kept: the base every download is built on
+        self.data = data
+        self._plain_data = None
+        self._plain_lock = threading.Lock()
+
+        self.reader = PdfReader(io.BytesIO(data))
+        trailer = self.reader.trailer
+        self.objects = tuple(
+            self.reader.get_object(idnum) for idnum in range(1, int(trailer["/Size"]))
+        )
+        # Serialized once: writing a pypdf StreamObject temporarily mutates it,
+        # so requests must never call write_to_stream() on these shared objects.
+        # Object and xref streams are containers of this file, not document objects:
+        # a full rewrite lists their contents one by one and leaves them out
+        self.serialized = tuple(
+            None if _is_container(obj) else _serialize(idnum, obj)
+            for idnum, obj in enumerate(self.objects, start=1)
+        )
+        # Sizes for template_registry.footprint()
+        self.chunk_size = sum(len(chunk) for chunk in self.serialized if chunk)
+        self.stream_size = sum(len(obj._data) for obj in self.objects if isinstance(obj, StreamObject))
+        self.root_ref = trailer.raw_get("/Root")
+        self.info_ref = trailer.raw_get("/Info") if "/Info" in trailer else None
+        self.file_id = trailer.get("/ID")
+        # Offset of the template's own xref table, for /Prev in incremental updates
+        self.startxref = int(data[data.rindex(b"startxref") + len(b"startxref"):].split()[0])
+        # Updates to a file with an xref stream must bring their own xref stream
+        self.xref_stream = not data.startswith(b"xref", self.startxref)
+        self.page_refs = tuple(page.indirect_reference for page in self.reader.pages)
+        self.fields = build_field_index(self.reader, self.page_refs)
+        self._links = None
+        self._packed = None
+
+    @property
+    def links(self) -> tuple:
+        """Per object (index idnum - 1): the object numbers it references. Built on first use."""
+        if self._links is None:
+            self._links = tuple(_references(obj) for obj in self.objects)
+        return self._links
+
+    @property
+    def packed(self) -> tuple:
+        """
+        (streams, where): the plain (non-stream) template objects, packed once into
+        compressed object streams of _OBJSTM_SIZE, as (idnums, first, data) each;
+        where maps idnum → (stream, index). A full rewrite refers to these instead of
+        writing every object out. Built on first use.
+        """
+        if self._packed is None:
+            members = [
+                idnum for idnum, (obj, chunk) in enumerate(zip(self.objects, self.serialized), start=1)
+                if chunk is not None and not isinstance(obj, StreamObject)
+            ]
+            streams, where = [], {}
+            for start in range(0, len(members), _OBJSTM_SIZE):
+                idnums = tuple(members[start:start + _OBJSTM_SIZE])
+                table, bodies, offset = [], [], 0
+                for index, idnum in enumerate(idnums):
+                    chunk = self.serialized[idnum - 1]
+                    body = chunk[len(b"%d 0 obj\n" % idnum):-len(b"endobj\n")]
+                    table.append(b"%d %d" % (idnum, offset))
+                    bodies.append(body)
+                    offset += len(body)
+                    where[idnum] = (len(streams), index)
+                head = b" ".join(table) + b"\n"
+                streams.append((idnums, len(head), zlib.compress(head + b"".join(bodies))))
+            self._packed = (tuple(streams), where)
+        return self._packed
+
+    @property
+    def plain_data(self) -> bytes:
+        """The decrypted bytes without object streams, which pdfrw cannot read. Made on first use."""
+        if self._plain_data is None:
+            with self._plain_lock:
+                if self._plain_data is None:
+                    buffer = io.BytesIO()
+                    with pikepdf.open(io.BytesIO(self.data)) as pdf:
+                        pdf.save(buffer, object_stream_mode=pikepdf.ObjectStreamMode.disable)
+                    self._plain_data = buffer.getvalue()
+        return self._plain_data
+
+    @property
+    def plain_size(self) -> int:
+        return len(self._plain_data) if self._plain_data is not None else 0
+
+    @property
+    def version(self) -> str:
+        return self.digest[:16]
+
+    def clone(self) -> "TemplateClone":
+        return TemplateClone(self)
+
+
+class TemplateClone:
+    """
+    Per-request view of a PdfTemplate.
+
+    Edited objects are shallow-copied into the clone, so nothing a request
+    writes can be seen by another request. Look indirect objects up with
+    get(); using a reference's own get_object() returns the shared original.
+    """
+
+    def __init__(self, template: PdfTemplate):
+        self.template = template
+        self.changed = {}
+        self.added = []
+        self.prepared = {}    # idnum → (serialized bytes, references) of replace()d objects
+
+    def _idnum(self, ref) -> int:
+        return ref.idnum if isinstance(ref, IndirectObject) else int(ref)
+
+    def get(self, ref):
+        idnum = self._idnum(ref)
+        if idnum in self.changed:
+            return self.changed[idnum]
+        if idnum > len(self.template.objects):
+            return self.added[idnum - len(self.template.objects) - 1]
+        return self.template.objects[idnum - 1]
+
+    def edit(self, ref):
+        """
+        Return a private copy of the object, to modify in place.
+        Nested dictionaries and arrays are still shared: replace them, don't mutate them.
+        """
+        idnum = self._idnum(ref)
+        if idnum in self.prepared:
+            # Shared replacement: copy it before handing it out for editing
+            del self.prepared[idnum]
+            original = self.changed.pop(idnum)
+        elif idnum in self.changed or idnum > len(self.template.objects):
+            return self.get(idnum)
+        else:
+            original = self.template.objects[idnum - 1]
+        if isinstance(original, StreamObject):
+            copy = original.__class__()
+            copy.update(original)
+            copy._data = original._data
+        elif isinstance(original, DictionaryObject):
+            copy = DictionaryObject(original)
+        elif isinstance(original, ArrayObject):
+            copy = ArrayObject(original)
+        else:
+            raise TypeError(f"Object {idnum} ({type(original).__name__}) cannot be edited")
+        self.changed[idnum] = copy
+        return copy
+
+    def replace(self, idnum: int, obj, chunk: bytes, references: frozenset) -> None:
+        """
+        Swap in a replacement object that is the same for every request, together with
+        its precomputed serialization and references, so write() need not redo them.
+        """
+        self.changed[idnum] = obj
+        self.prepared[idnum] = (chunk, references)
+
+    def add(self, obj) -> IndirectObject:
+        self.added.append(obj)
+        return IndirectObject(len(self.template.objects) + len(self.added), 0, self.template.reader)
+
+    @property
+    def root(self) -> DictionaryObject:
+        return self.get(self.template.root_ref)
+
+    def page(self, page_index: int) -> DictionaryObject:
+        return self.get(self.template.page_refs[page_index])
+
+    def acroform(self) -> DictionaryObject:
+        """Return an editable /AcroForm dictionary, or raise if the template has none."""
+        af = self.root.raw_get("/AcroForm") if "/AcroForm" in self.root else None
+        if af is None:
+            raise RuntimeError("No AcroForm in PDF")
+        if isinstance(af, IndirectObject):
+            return self.edit(af)
+        af = DictionaryObject(af)
+        self.edit(self.template.root_ref)[NameObject("/AcroForm")] = af
+        return af
+
+    def reachable(self, known: frozenset = frozenset()) -> set:
+        """
+        Object numbers reachable from the trailer (/Root, /Info) in this clone.
+        known: template objects already known to be reachable, together with everything
+        they refer to; the walk only descends into those this clone has changed.
+        """
+        links = self.template.links
+        seen = set()
+        stack = [self.template.root_ref.idnum]
+        if self.template.info_ref is not None:
+            stack.append(self.template.info_ref.idnum)
+        # Changed objects may hang below an unchanged known one (e.g. pages below /Pages)
+        stack.extend(idnum for idnum in self.changed if idnum in known)
+        while stack:
+            idnum = stack.pop()
+            if idnum in seen:
+                continue
+            seen.add(idnum)
+            if idnum in self.prepared:
+                stack.extend(self.prepared[idnum][1])
+            elif idnum in self.changed or idnum > len(self.template.objects):
+                stack.extend(_references(self.get(idnum)))
+            elif idnum not in known:
+                stack.extend(links[idnum - 1])
+        return seen | known
+
+    def write(self, stream, keep: set = None) -> None:
+        """
+        Serialize the whole document (template objects plus this clone's changes).
+        keep: if given, only these object numbers are written (see reachable()).
+        """
+        with stage('serialize'):
+            self._write(stream, keep)
+
+    def _write(self, stream, keep):
+        # Object streams need PDF 1.5
+        stream.write(max(self.template.reader.pdf_header, "%PDF-1.5").encode() + b"\n%\xe2\xe3\xcf\xd3\n")
+        streams, where = self.template.packed
+        chunks = self.template.serialized + (None,) * len(self.added)
+        objects = self.template.objects + tuple(self.added)
+        # Xref entries (type, field 2, field 3): 1 = offset, 2 = object stream and index, 0 = free
+        entries = [(0, 0, 0xFFFF)]
+        used = {}    # packed stream → its object number here, numbered after the objects
+        dropped = []
+        for idnum, chunk in enumerate(chunks, start=1):
+            if keep is not None and idnum not in keep:
+                if idnum in where:
+                    dropped.append(idnum)
+                chunk = None
+            elif idnum in self.prepared:
+                chunk = self.prepared[idnum][0]
+            elif idnum in self.changed or idnum > len(self.template.objects):
+                chunk = _serialize(idnum, self.get(idnum))
+            elif idnum in where:
+                packed, index = where[idnum]
+                entries.append((2, used.setdefault(packed, len(objects) + 1 + len(used)), index))
+                continue
+            if chunk is None:
+                entries.append((0, 0, 1))
+                continue
+            entries.append((1, stream.tell(), 0))
+            stream.write(chunk)
+
+        # A dropped object that shares a written stream is in the file anyway: list it, as readers expect
+        for idnum in dropped:
+            packed, index = where[idnum]
+            if packed in used:
+                entries[idnum] = (2, used[packed], index)
+
+        # Only the object streams that hold a written object; edited ones are superseded by the xref
+        for packed, number in used.items():
+            idnums, first, data = streams[packed]
+            entries.append((1, stream.tell(), 0))
+            stream.write(b"%d 0 obj\n<< /Type /ObjStm /N %d /First %d /Filter /FlateDecode /Length %d >>\nstream\n"
+                         % (number, len(idnums), first, len(data)))
+            stream.write(data + b"\nendstream\nendobj\n")
+
+        xref_offset = stream.tell()
+        idnum = len(entries)
+        entries.append((1, xref_offset, 0))
+        self._write_xref_stream(stream, idnum, entries, self._trailer(idnum + 1))
+        stream.write(b"startxref\n%d\n%%%%EOF\n" % xref_offset)
+
+    def _trailer(self, size: int, prev: int = None) -> DictionaryObject:
+        trailer = DictionaryObject({
+            NameObject("/Size"): NumberObject(size),
+            NameObject("/Root"): self.template.root_ref,
+        })
+        if self.template.info_ref is not None:
+            trailer[NameObject("/Info")] = self.template.info_ref
+        if self.template.file_id is not None:
+            trailer[NameObject("/ID")] = self.template.file_id
+        if prev is not None:
+            trailer[NameObject("/Prev")] = NumberObject(prev)
+        return trailer
+
+    def _write_trailer(self, stream, xref_offset: int, prev: int = None) -> None:
+        stream.write(b"trailer\n")
+        self._trailer(len(self.template.objects) + len(self.added) + 1, prev).write_to_stream(stream)
+        stream.write(b"\nstartxref\n%d\n%%%%EOF\n" % xref_offset)
+
+    def _write_xref_stream(self, stream, idnum: int, entries: list, trailer: DictionaryObject,
+                           index: list = None) -> None:
+        """Write object idnum: an xref stream (/W [1 4 2]) of entries [(type, field 2, field 3)]."""
+        rows = zlib.compress(b"".join(
+            bytes((kind,)) + second.to_bytes(4, "big") + third.to_bytes(2, "big") for kind, second, third in entries
+        ))
+        trailer.update({
+            NameObject("/Type"): NameObject("/XRef"),
+            NameObject("/W"): ArrayObject([NumberObject(1), NumberObject(4), NumberObject(2)]),
+            NameObject("/Filter"): NameObject("/FlateDecode"),
+            NameObject("/Length"): NumberObject(len(rows)),
+        })
+        if index is not None:
+            trailer[NameObject("/Index")] = ArrayObject(NumberObject(n) for n in index)
+        stream.write(b"%d 0 obj\n" % idnum)
+        trailer.write_to_stream(stream)
+        stream.write(b"\nstream\n" + rows + b"\nendstream\nendobj\n")
+
+    def to_bytes(self, keep: set = None) -> bytes:
+        buffer = io.BytesIO()
+        self.write(buffer, keep)
+        return buffer.getvalue()
+
+    # ─── Incremental update ─────────────────────────────────────────────
+
+    def update_section(self) -> bytes:
+        """
+        The incremental-update section to append to template.data: only the changed
+        and added objects, their xref subsections and a trailer whose /Prev points at
+        the template's xref. Its cost depends on the number of edits, not the
+        document size.
+        """
+        with stage('serialize'):
+            return self._update_section()
+
+    def _update_section(self) -> bytes:
+        data = self.template.data
+        count = len(self.template.objects)
+        section = io.BytesIO()
+        if not data.endswith(b"\n"):
+            section.write(b"\n")
+
+        offsets = []
+        for idnum in sorted(self.changed) + list(range(count + 1, count + len(self.added) + 1)):
+            if idnum in self.prepared:
+                chunk = self.prepared[idnum][0]
+            else:
+                chunk = _serialize(idnum, self.get(idnum))
+            offsets.append((idnum, len(data) + section.tell()))
+            section.write(chunk)
+
+        if self.template.xref_stream:
+            # The section's own xref stream, listed in itself
+            idnum = count + len(self.added) + 1
+            xref_offset = len(data) + section.tell()
+            offsets.append((idnum, xref_offset))
+            index = []
+            for run in _runs(offsets):
+                index += [run[0][0], len(run)]
+            trailer = self._trailer(idnum + 1, prev=self.template.startxref)
+            self._write_xref_stream(section, idnum, [(1, offset, 0) for _, offset in offsets], trailer, index)
+            section.write(b"startxref\n%d\n%%%%EOF\n" % xref_offset)
+            return section.getvalue()
+
+        xref_offset = len(data) + section.tell()
+        section.write(b"xref\n")
+        # One subsection per run of consecutive object numbers
+        for run in _runs(offsets):
+            section.write(b"%d %d\n" % (run[0][0], len(run)))
+            for _, offset in run:
+                section.write(b"%010d 00000 n \n" % offset)
+        self._write_trailer(section, xref_offset, prev=self.template.startxref)
+        return section.getvalue()
+
+    def incremental_parts(self):
+        """
+        (prefix, update): the shared template bytes themselves (immutable, never
+        copied) and this clone's update section. Sent back to back they form the
+        filled document.
+        """
+        return self.template.data, self.update_section()
+
+    def write_incremental(self, stream) -> None:
+        for part in self.incremental_parts():
+            stream.write(part)
+
+
+def _runs(entries: list):
+    """Split [(idnum, offset)] sorted by idnum into runs of consecutive object numbers."""
+    start = 0
+    while start < len(entries):
+        end = start + 1
+        while end < len(entries) and entries[end][0] == entries[end - 1][0] + 1:
+            end += 1
+        yield entries[start:end]
+        start = end
+
+
+# ─── Process-level cache ────────────────────────────────────────────────
+
+_templates = {}
+_lock = threading.Lock()
+
+
+def _sha256(path: str) -> str:
+    # Memory-mapped: hashing does not pull the file through Python buffers
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return hashlib.sha256(mapped).hexdigest()
+
+
+def _decrypt(path: str) -> bytes:
+    buffer = io.BytesIO()
+    with stage('decrypt'), pikepdf.open(path) as pdf:
+        # Object streams kept: about half the size of the expanded file, and every download starts with it
+        pdf.save(buffer, object_stream_mode=pikepdf.ObjectStreamMode.generate)
+    return buffer.getvalue()
+
+
+def get_template(path: str) -> PdfTemplate:
+    """
+    Return the cached PdfTemplate for path, decrypting and parsing it on first use.
+    The entry is rebuilt when the file's mtime/size changes and its hash differs.
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    cached = _templates.get(path)
+    if cached is not None and (cached.mtime, cached.size) == (st.st_mtime, st.st_size):
+        return cached
+
+    with _lock:
+        cached = _templates.get(path)
+        if cached is not None and (cached.mtime, cached.size) == (st.st_mtime, st.st_size):
+            return cached
+        digest = _sha256(path)
+        if cached is not None and cached.digest == digest:
+            # Touched but unchanged: keep the parsed objects
+            cached.mtime, cached.size = st.st_mtime, st.st_size
+            return cached
+        data = _decrypt(path)
+        with stage('parse'):
+            template = PdfTemplate(path, st.st_mtime, st.st_size, digest, data)
+        _templates[path] = template
+        return template
+
+
+def cached_templates() -> dict:
+    """{path: PdfTemplate} of everything currently loaded."""
+    return dict(_templates)
+
+
+def evict(path: str):
+    """Drop one template from the cache (requests still holding a clone keep it alive)."""
+    with _lock:
+        return _templates.pop(os.path.abspath(path), None)
+
+
+def clear_cache() -> None:
+    with _lock:
+        _templates.clear()
@@ -0,0 +1,88 @@
+# preload.py
+"""
+Warm-up of everything the first PDF request would otherwise pay for.
+
+Run in the gunicorn master before it forks (preload_app = True, see
+gunicorn.conf.py), the imported PDF libraries, the parsed template with its
+field index and appearance fonts, and the compiled Jinja templates are shared
+copy-on-write by every worker instead of being built N times. Afterwards the
+collector's objects are frozen (gc.freeze), so garbage collection in the
+workers does not touch, and thereby copy, the shared pages.
+
+    warm_up(app)          # blocking, in the master
+    start_warm_up(app)    # in a background thread (development server)
+    status()              # for /ready
+"""
+
+import gc
+import threading
+import time
+
+_status = {'ready': False, 'started': None, 'seconds': None, 'steps': {}, 'error': None}
+_lock = threading.Lock()
+
+
+def _step(name, fn):
+    started = time.perf_counter()
+    result = fn()
+    _status['steps'][name] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def warm_up(app, freeze: bool = True) -> dict:
+    """Import the PDF stack, load the default template and its derived caches, compile Jinja templates."""
+    from engines import available_engines, get_engine
+
+    names = app.config.get('PDF_PRELOAD_ENGINES') or app.config['PDF_ENGINE']
+    if names == 'all':
+        names = ','.join(available_engines())
+    from template_registry import digest, get_spec, load
+
+    with _lock:
+        if _status['ready']:
+            return status()
+        _status.update(started=time.time(), error=None)
+        started = time.perf_counter()
+        try:
+            # Only the configured engines: every extra PDF library costs import time and resident memory
+            _step('engines', lambda: [get_engine(name.strip()).load() for name in names.split(',') if name.strip()])
+
+            spec = get_spec(app.config['PDF_STATE'])
+            _step('template_hash', lambda: digest(spec))
+            template = _step('template', lambda: load(spec))
+
+            from field_geometry import get_geometry
+            from pdf_appearance import get_resources
+            from pdf_flatten import get_flatten_base
+            _step('appearance_fonts', lambda: get_resources(template))
+            _step('flatten_base', lambda: get_flatten_base(template))
+            _step('object_streams', lambda: template.packed)
+            _step('geometry', lambda: get_geometry(spec.path))
+            if 'pdfrw' in (name.strip() for name in names.split(',')):
+                _step('pdfrw_template', lambda: template.plain_data)
+
+            _step('jinja', lambda: [app.jinja_env.get_template(name) for name in app.jinja_env.list_templates()
+                                    if name.endswith('.html')])
+        except Exception as e:
+            # Not ready, but the app still serves: everything loads lazily on first use
+            _status['error'] = f"{type(e).__name__}: {e}"
+            app.logger.exception("Warm-up failed")
+            return status()
+
+        if freeze:
+            gc.collect()
+            gc.freeze()
+        _status.update(ready=True, seconds=round(time.perf_counter() - started, 3))
+        app.logger.info("Warm-up done in %.2fs", _status['seconds'])
+        return status()
+
+
+def start_warm_up(app) -> threading.Thread:
+    """warm_up() in a daemon thread; /ready reports 503 until it is done."""
+    thread = threading.Thread(target=warm_up, args=(app, False), name='warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def status() -> dict:
+    return {**_status, 'steps': dict(_status['steps'])}
@@ -0,0 +1,185 @@
+# profiling.py
+"""
+Opt-in profiling of single requests in production, and a report over the
+captured profiles.
+
+With PROFILING=1 and a PROFILE_TOKEN set, a request to one of the
+PROFILE_ENDPOINTS (default: generate_pdf) that carries the token, as header
+
+    X-Profile-Token: <token>        or        ?profile=<token>
+
+runs under cProfile. The stats are written to PROFILE_DIR as <name>.prof, with
+the request's metadata (endpoint, query, status, duration, size, pid) next to
+it as <name>.json. Requests without the token are not slowed down.
+
+    python profiling.py instance/profiles                      # hottest functions, all profiles
+    python profiling.py instance/profiles --endpoint generate_pdf --sort tottime --top 40
+    python profiling.py instance/profiles --packages           # time per library: pypdf, pikepdf, ...
+
+The package table answers the usual question (pypdf parsing, pikepdf
+decryption or our own serialization?) without reading individual functions.
+"""
+
+import argparse
+import cProfile
+import glob
+import hmac
+import io
+import json
+import os
+import pstats
+import secrets
+import sys
+import sysconfig
+import time
+from collections import defaultdict
+
+HEADER = 'X-Profile-Token'
+QUERY_FLAG = 'profile'
+DEFAULT_ENDPOINTS = 'generate_pdf'
+DEFAULT_MAX_FILES = 500
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_STDLIB = sysconfig.get_paths()['stdlib']
+
+
+# ─── Capture ────────────────────────────────────────────────────────────
+
+def requested(config, endpoint: str, supplied: str) -> bool:
+    """Whether this request is to be profiled: enabled, endpoint selected, admin token given."""
+    token = config.get('PROFILE_TOKEN')
+    if not config.get('PROFILING') or not token or not supplied or endpoint is None:
+        return False
+    endpoints = config.get('PROFILE_ENDPOINTS') or DEFAULT_ENDPOINTS
+    if endpoints != 'all' and endpoint not in (name.strip() for name in endpoints.split(',')):
+        return False
+    return hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def start():
+    """A running cProfile.Profile, or None if another profiler is active (Python ≥ 3.12)."""
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None
+    return profiler
+
+
+def save(profiler, directory: str, metadata: dict, max_files: int = DEFAULT_MAX_FILES) -> str:
+    """Stop the profiler, write <name>.prof and <name>.json; returns the .prof path."""
+    profiler.disable()
+    os.makedirs(directory, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{metadata.get('endpoint', 'request')}-{secrets.token_hex(3)}"
+    path = os.path.join(directory, name + '.prof')
+    profiler.dump_stats(path)
+    with open(os.path.join(directory, name + '.json'), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=1)
+    _prune(directory, max_files)
+    return path
+
+
+def _prune(directory: str, max_files: int) -> None:
+    profiles = sorted(glob.glob(os.path.join(directory, '*.prof')))
+    for path in profiles[:max(0, len(profiles) - max_files)]:
+        for stale in (path, path[:-len('.prof')] + '.json'):
+            try:
+                os.unlink(stale)
+            except FileNotFoundError:
+                pass
+
+
+# ─── Report ─────────────────────────────────────────────────────────────
+
+def _metadata(path: str) -> dict:
+    try:
+        with open(path[:-len('.prof')] + '.json', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def select(directory: str, endpoint: str = None, since: str = None) -> list:
+    """Profile files in directory, optionally only one endpoint's or those from since (YYYYmmdd-HHMMSS) on."""
+    paths = sorted(glob.glob(os.path.join(directory, '*.prof')))
+    if since:
+        paths = [p for p in paths if os.path.basename(p) >= since]
+    if endpoint:
+        paths = [p for p in paths if _metadata(p).get('endpoint') == endpoint]
+    return paths
+
+
+def package(filename: str) -> str:
+    """Library a profiled function belongs to: 'pypdf', 'pikepdf', 'app:<module>' for ours, 'stdlib', ..."""
+    if filename == '~' or filename.startswith('<'):
+        return 'builtins'
+    filename = os.path.abspath(filename)
+    marker = os.sep + 'site-packages' + os.sep
+    if marker in filename:
+        return filename.split(marker, 1)[1].split(os.sep, 1)[0].split('.', 1)[0]
+    if filename.startswith(_STDLIB):
+        return 'stdlib'
+    if os.path.dirname(filename) == _APP_DIR:
+        return 'app:' + os.path.splitext(os.path.basename(filename))[0]
+    return 'other'
+
+
+def by_package(stats: pstats.Stats) -> list:
+    """
+    [(package, self seconds, calls)], most expensive first. Built-in functions
+    (bytes.join, zlib.compress, ...) count for the package that called them.
+    """
+    totals = defaultdict(lambda: [0.0, 0])
+    for (filename, _, _), (_, calls, tottime, _, callers) in stats.stats.items():
+        name = package(filename)
+        if name == 'builtins' and callers:
+            for (caller, _, _), (_, caller_calls, caller_tottime, _) in callers.items():
+                entry = totals[package(caller)]
+                entry[0] += caller_tottime
+                entry[1] += caller_calls
+            continue
+        entry = totals[name]
+        entry[0] += tottime
+        entry[1] += calls
+    return sorted(((name, t, n) for name, (t, n) in totals.items()), key=lambda row: -row[1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', help='PROFILE_DIR with the captured .prof files')
+    parser.add_argument('--endpoint', help='only profiles of this endpoint')
+    parser.add_argument('--since', help='only profiles from this time on (YYYYmmdd-HHMMSS prefix)')
+    parser.add_argument('--sort', default='cumulative', choices=('cumulative', 'tottime', 'ncalls'),
+                        help='order of the function list (default: cumulative)')
+    parser.add_argument('--top', type=int, default=25, help='functions to list')
+    parser.add_argument('--packages', action='store_true', help='only the self time per package')
+    args = parser.parse_args(argv)
+
+    paths = select(args.directory, args.endpoint, args.since)
+    if not paths:
+        print(f"No profiles in {args.directory}", file=sys.stderr)
+        return 1
+
+    durations = [_metadata(p).get('duration_ms') for p in paths]
+    durations = sorted(d for d in durations if d is not None)
+    print(f"{len(paths)} profiles", end='')
+    if durations:
+        print(f", request time median {durations[len(durations) // 2]:.0f} ms, max {durations[-1]:.0f} ms", end='')
+    print()
+
+    stats = pstats.Stats(*paths, stream=io.StringIO())
+    rows = by_package(stats)
+    total = sum(t for _, t, _ in rows) or 1.0
+    print("\nSelf time per package (all profiles):")
+    for name, seconds, calls in rows[:args.top if not args.packages else None]:
+        print(f"  {name:<28} {seconds * 1000:10.1f} ms  {seconds / total:6.1%}  {calls:>10} calls")
+
+    if not args.packages:
+        print(f"\nTop {args.top} functions by {args.sort}:")
+        stats.stream = sys.stdout
+        stats.sort_stats(args.sort).print_stats(args.top)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,289 @@
+# session_codec.py
+"""
+Compact, typed session encoding for the wizard steps, compiled once at import
+from the WTForms classes in forms.py. A step is saved and prefilled with one
+call each:
+
+    session_codec.save(session, 'income_before_birth_info', form)
+    session_codec.prefill(form, session, 'income_before_birth_info')
+    session_codec.records(session)      # {section: dict} for field_mapping, elterngeld_calc, ...
+
+A step is stored as a flat list, [schema, flags, value, ...], in form field order:
+
+  - schema: CRC of the step's layout; a payload from another layout reads as missing
+  - flags: all BooleanFields of the step as one int, bit i = i-th checkbox
+  - DecimalField: integer cents; DateField: ISO date; other fields: their string
+  - numbered amount fields (gross_income_month_1 … _12): one list
+  - trailing empty values are dropped
+
+records() turns this back into the dicts the routes used to store (renamed keys
+such as address_street, amounts as '1234.50', checkbox groups as label lists),
+so the PDF mapping and the calculator read the same shape as the batch records.
+Payloads that already are such dicts (older sessions, stress_generate.py) are
+passed through unchanged.
+"""
+
+import re
+import zlib
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Callable, NamedTuple
+
+from wtforms import BooleanField, DateField, DecimalField, RadioField, SelectField, StringField, SubmitField
+from wtforms.fields.core import UnboundField
+
+from field_mapping import SESSION_SECTIONS
+from forms import (
+    ApplicantInfoForm,
+    BankInfoForm,
+    ChildInfoForm,
+    EligibilityForm,
+    IncomeBeforeBirthForm,
+    OtherParentInfoForm,
+    ResidencyAbroadForm,
+)
+
+
+# ─── Value kinds ────────────────────────────────────────────────────────
+
+class Kind(NamedTuple):
+    name: str
+    encode: Callable       # field.data → compact value
+    decode: Callable       # compact value → field.data
+    export: Callable       # compact value → record value (as the routes stored it before)
+    parse: Callable        # record value → compact value
+
+
+def _cents(value):
+    if value is None:
+        return None
+    return int((value * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def _parse_cents(value):
+    if value in (None, ''):
+        return None
+    try:
+        return _cents(Decimal(str(value)))
+    except InvalidOperation:
+        return None
+
+
+def _euros(cents):
+    return None if cents is None else Decimal(cents).scaleb(-2)
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value.isoformat()
+    for fmt in ('%Y-%m-%d', '%d.%m.%Y'):
+        try:
+            return datetime.strptime(str(value), fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def _text(value):
+    return value or None
+
+
+STRING = Kind('str', _text, lambda v: v or '', lambda v: v or '', _text)
+CHOICE = Kind('choice', _text, lambda v: v, lambda v: v, _text)
+CENTS = Kind('cents', _cents, _euros, lambda c: None if c is None else str(_euros(c)), _parse_cents)
+DATE = Kind('date', lambda d: d.isoformat() if d else None,
+            lambda s: date.fromisoformat(s) if s else None,
+            lambda s: s or '',
+            _parse_date)
+
+# Checked in order: subclasses (TextAreaField, EmailField are StringFields) before their bases
+_FIELD_KINDS = (
+    (DecimalField, CENTS),
+    (DateField, DATE),
+    (RadioField, CHOICE),
+    (SelectField, CHOICE),
+    (StringField, STRING),
+)
+
+_NUMBERED = re.compile(r'(.+)_(\d+)$')
+
+
+def _kind(name, field_class):
+    for base, kind in _FIELD_KINDS:
+        if issubclass(field_class, base):
+            return kind
+    raise TypeError(f"session_codec: no encoding for {name} ({field_class.__name__})")
+
+
+# ─── Compilation ────────────────────────────────────────────────────────
+
+def _declared(form_class):
+    """[(attribute, UnboundField)] in declaration order, as WTForms itself orders them."""
+    fields = [(name, value) for name in dir(form_class)
+              if not name.startswith('_') and isinstance(value := getattr(form_class, name), UnboundField)]
+    return sorted(fields, key=lambda item: item[1].creation_counter)
+
+
+def _label(unbound):
+    return unbound.kwargs.get('label') or (unbound.args[0] if unbound.args else '')
+
+
+class StepCodec:
+    """Encoder, decoder and form prefill for one wizard step."""
+
+    def __init__(self, form_class, rename=None, checkbox_groups=None):
+        rename = rename or {}
+        groups = checkbox_groups or {}
+        fields = [(name, unbound) for name, unbound in _declared(form_class)
+                  if not issubclass(unbound.field_class, SubmitField) and name not in groups]
+
+        # (bit, attribute, record key, checkbox group, label) per checkbox; grouped ones have no key of their own
+        flags = []
+        for name, unbound in fields:
+            if issubclass(unbound.field_class, BooleanField):
+                group = next((key for key, prefix in groups.items() if name.startswith(prefix)), None)
+                flags.append((1 << len(flags), name, None if group else rename.get(name, name), group, _label(unbound)))
+
+        # (record key, attributes, kind) per stored value; numbered amounts become one list
+        slots, numbered = [], {}
+        for name, unbound in fields:
+            if issubclass(unbound.field_class, BooleanField):
+                continue
+            kind = _kind(name, unbound.field_class)
+            match = _NUMBERED.match(name)
+            if kind is CENTS and match:
+                base = match.group(1)
+                if base not in numbered:
+                    numbered[base] = []
+                    slots.append((rename.get(base + 's', base + 's'), numbered[base], kind))
+                numbered[base].append(name)
+                continue
+            slots.append((rename.get(name, name), [name], kind))
+
+        self.form_class = form_class
+        self.flags = tuple(flags)
+        self.groups = tuple(groups)
+        self.slots = tuple((key, tuple(attrs), kind, len(attrs) > 1) for key, attrs, kind in slots)
+        layout = repr([(attr, key) for _, attr, key, _, _ in self.flags]
+                      + [(key, attrs, kind.name) for key, attrs, kind, _ in self.slots])
+        self.schema = zlib.crc32(f"{form_class.__name__}:{layout}".encode())
+
+    def dump(self, form) -> list:
+        """The step's compact payload from a validated form."""
+        flags = 0
+        for bit, attr, _, _, _ in self.flags:
+            if getattr(form, attr).data:
+                flags |= bit
+        payload = [self.schema, flags]
+        for _, attrs, kind, is_list in self.slots:
+            if is_list:
+                values = [kind.encode(getattr(form, attr).data) for attr in attrs]
+                payload.append(values if any(v is not None for v in values) else None)
+            else:
+                payload.append(kind.encode(getattr(form, attrs[0]).data))
+        return _trimmed(payload)
+
+    def prefill(self, form, payload) -> None:
+        """Put a stored step (compact or record dict) back into the form's fields."""
+        if isinstance(payload, dict):
+            payload = self.parse(payload)
+        values = self._values(payload)
+        if values is None:
+            return
+        flags, slots = values
+        for bit, attr, _, _, _ in self.flags:
+            getattr(form, attr).data = bool(flags & bit)
+        for (_, attrs, kind, is_list), value in zip(self.slots, slots):
+            items = (value or [None] * len(attrs)) if is_list else [value]
+            for attr, item in zip(attrs, items):
+                getattr(form, attr).data = kind.decode(item)
+
+    def load(self, payload) -> dict:
+        """The step as a record dict; {} if missing or stored under another schema."""
+        if isinstance(payload, dict):
+            return payload
+        values = self._values(payload)
+        if values is None:
+            return {}
+        flags, slots = values
+        record = {group: [] for group in self.groups}
+        for bit, _, key, group, label in self.flags:
+            if group:
+                if flags & bit:
+                    record[group].append(label)
+            else:
+                record[key] = bool(flags & bit)
+        for (key, attrs, kind, is_list), value in zip(self.slots, slots):
+            if is_list:
+                record[key] = [kind.export(item) for item in value or [None] * len(attrs)]
+            else:
+                record[key] = kind.export(value)
+        return record
+
+    def parse(self, record: dict) -> list:
+        """Compact payload from a record dict (sessions stored before this codec)."""
+        flags = 0
+        for bit, _, key, group, label in self.flags:
+            if (label in (record.get(group) or ())) if group else record.get(key):
+                flags |= bit
+        payload = [self.schema, flags]
+        for key, attrs, kind, is_list in self.slots:
+            if is_list:
+                values = [kind.parse(item) for item in (record.get(key) or [])[:len(attrs)]]
+                payload.append(values + [None] * (len(attrs) - len(values)) if any(v is not None for v in values) else None)
+            else:
+                payload.append(kind.parse(record.get(key)))
+        return _trimmed(payload)
+
+    def _values(self, payload):
+        if not isinstance(payload, list) or len(payload) < 2 or payload[0] != self.schema:
+            return None
+        slots = payload[2:]
+        return payload[1], slots + [None] * (len(self.slots) - len(slots))
+
+
+def _trimmed(payload: list) -> list:
+    while len(payload) > 2 and payload[-1] is None:
+        payload.pop()
+    return payload
+
+
+_ADDRESS = {
+    'strasse': 'address_street', 'hausnummer': 'address_housenumber', 'adresszusatz': 'address_addon',
+    'plz': 'address_plz', 'wohnort': 'address_city',
+}
+
+CODECS = {
+    'eligibility': StepCodec(EligibilityForm, rename={'plans_to_work_more_than_32h': 'max_work_hours'}),
+    'child_info': StepCodec(ChildInfoForm),
+    'applicant_info': StepCodec(ApplicantInfoForm, rename=_ADDRESS),
+    'residency_abroad_info': StepCodec(ResidencyAbroadForm,
+                                       checkbox_groups={'german_social_security_types': 'german_ss_'}),
+    'other_parent_info': StepCodec(OtherParentInfoForm),
+    'income_before_birth_info': StepCodec(IncomeBeforeBirthForm),
+    'bank_info': StepCodec(BankInfoForm),
+}
+
+
+# ─── Session helpers ────────────────────────────────────────────────────
+
+def save(session, section: str, form) -> None:
+    session[section] = CODECS[section].dump(form)
+
+
+def prefill(form, session, section: str) -> None:
+    """Fill the form from the stored step, if there is one."""
+    payload = session.get(section)
+    if payload:
+        CODECS[section].prefill(form, payload)
+
+
+def section(session, name: str) -> dict:
+    return CODECS[name].load(session.get(name))
+
+
+def records(session) -> dict:
+    """All wizard sections as record dicts (the shape field_mapping and elterngeld_calc read)."""
+    return {name: section(session, name) for name in SESSION_SECTIONS}
@@ -0,0 +1,257 @@
+# session_store.py
+"""
+Server-side sessions for the wizard.
+
+Flask's default session keeps all wizard sections in a signed cookie, which is
+sent with every request and grows with every form (monthly incomes, free text).
+Here the cookie only carries an opaque, random session id; the data lives in a
+backend:
+
+  memory   in-process LRU with TTL. Fast, but every process has its own store,
+           so only for development and single-process servers.
+  sqlite   a local SQLite file (WAL mode), shared by all worker processes on the host.
+
+    app.session_interface = ServerSideSessionInterface(SqliteBackend("instance/sessions.sqlite3"))
+
+The session is serialized with Flask's tagged JSON (tuples, bytes, dates, Markup
+survive the round trip) and only written back when its content changed, so
+in-place edits of nested dicts are saved too.
+"""
+
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+import metrics
+
+DEFAULT_TTL = 24 * 3600          # Sekunden ohne Zugriff, bis eine Session verfällt
+_SID = re.compile(r"^[A-Za-z0-9_-]{43}$")   # secrets.token_urlsafe(32)
+
+
+# ─── Backends ───────────────────────────────────────────────────────────
+
+class SessionBackend(ABC):
+    """Stores serialized sessions (bytes) by id, each with a time to live."""
+
+    @abstractmethod
+    def load(self, sid: str):
+        """The stored bytes, or None if the id is unknown or expired."""
+
+    @abstractmethod
+    def save(self, sid: str, data: bytes, ttl: int) -> None:
+        ...
+
+    @abstractmethod
+    def touch(self, sid: str, ttl: int) -> None:
+        """Extend the lifetime without rewriting the data."""
+
+    @abstractmethod
+    def delete(self, sid: str) -> None:
+        ...
+
+
+class MemoryBackend(SessionBackend):
+    """LRU of at most max_entries sessions in this process; expired entries are dropped on access."""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # sid → (expires, data)
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[sid]
+                return None
+            self._entries.move_to_end(sid)
+            return entry[1]
+
+    def save(self, sid, data, ttl):
+        with self._lock:
+            self._entries[sid] = (time.time() + ttl, data)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def touch(self, sid, ttl):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is not None:
+                self._entries[sid] = (time.time() + ttl, entry[1])
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SqliteBackend(SessionBackend):
+    """
+    One SQLite file shared by all workers on the host. Each thread of each process
+    opens its own connection; expired rows are purged at most every purge_interval seconds.
+    """
+
+    def __init__(self, path: str, purge_interval: float = 60.0):
+        self.path = path
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._next_purge = 0.0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                       " id TEXT PRIMARY KEY, data BLOB NOT NULL, expires REAL NOT NULL)")
+            db.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections must not cross a fork (gunicorn preload) or a thread
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def load(self, sid):
+        row = self._connect().execute(
+            "SELECT data FROM sessions WHERE id = ? AND expires >= ?", (sid, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def save(self, sid, data, ttl):
+        now = time.time()
+        db = self._connect()
+        db.execute("INSERT OR REPLACE INTO sessions (id, data, expires) VALUES (?, ?, ?)",
+                   (sid, sqlite3.Binary(data), now + ttl))
+        if now >= self._next_purge:
+            self._next_purge = now + self.purge_interval
+            db.execute("DELETE FROM sessions WHERE expires < ?", (now,))
+
+    def touch(self, sid, ttl):
+        self._connect().execute("UPDATE sessions SET expires = ? WHERE id = ?", (time.time() + ttl, sid))
+
+    def delete(self, sid):
+        self._connect().execute("DELETE FROM sessions WHERE id = ?", (sid,))
+
+
+def backend_from_config(config) -> SessionBackend:
+    """SESSION_BACKEND = 'sqlite' (SESSION_SQLITE_PATH) or 'memory' (SESSION_MAX_ENTRIES)."""
+    kind = config.get("SESSION_BACKEND", "sqlite")
+    if kind == "memory":
+        return MemoryBackend(int(config.get("SESSION_MAX_ENTRIES", 10000)))
+    if kind == "sqlite":
+        return SqliteBackend(config["SESSION_SQLITE_PATH"])
+    raise ValueError(f"Unknown SESSION_BACKEND {kind!r} (memory, sqlite)")
+
+
+# ─── Flask integration ──────────────────────────────────────────────────
+
+class ServerSideSession(CallbackDict, SessionMixin):
+
+    def __init__(self, initial=None, sid=None, new=False, stored=None):
+        def on_update(self):
+            self.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.stored = stored        # serialized form as loaded, to detect changes
+        self.modified = False
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keeps the session in a SessionBackend; the cookie holds only the session id."""
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, backend: SessionBackend, ttl: int = DEFAULT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and _SID.match(sid):
+            stored = self.backend.load(sid)
+            if stored is not None:
+                try:
+                    data = self.serializer.loads(stored.decode("utf-8"))
+                except ValueError:
+                    data = None
+                if isinstance(data, dict):
+                    return ServerSideSession(data, sid=sid, stored=stored)
+        # Unknown or expired ids are never reused: a fresh id prevents session fixation
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if not session.new:
+                self.backend.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app))
+            return
+
+        response.vary.add("Cookie")
+        data = self.serializer.dumps(dict(session)).encode("utf-8")
+        if data != session.stored:
+            metrics.observe('session_payload_bytes', len(data))
+            self.backend.save(session.sid, data, self.ttl)
+        elif self.should_set_cookie(app, session):
+            self.backend.touch(session.sid, self.ttl)
+        else:
+            return
+
+        response.set_cookie(
+            name, session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def load_secret_key(path: str) -> bytes:
+    """
+    The app's SECRET_KEY when none is configured: generated once and kept in path,
+    so every worker process (and restart) signs CSRF tokens with the same key.
+    """
+    if not os.path.exists(path):
+        # Written under a temporary name and linked into place: concurrent workers
+        # either win the link or read the winner's complete key
+        tmp = f"{path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp):
+            os.unlink(tmp)      # left by a crashed process with the same pid
+        # Owner only: whoever can read the key can forge sessions and CSRF tokens
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(secrets.token_bytes(32))
+        try:
+            os.link(tmp, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp)
+    elif os.stat(path).st_mode & 0o077:
+        os.chmod(path, 0o600)   # key files written before they were created owner-only
+    with open(path, "rb") as f:
+        return f.read()
@@ -0,0 +1,38 @@
+// static/field_validation.js
+// Prüft ein Feld beim Verlassen gegen POST /validate/<step> (field_validation.py) und zeigt die
+// Meldungen wie die Fehler nach dem Absenden an. Aktiv für <form data-validate="...">.
+(function () {
+  function show(form, name, messages) {
+    const field = form.elements[name];
+    const input = field && (field instanceof RadioNodeList ? field[0] : field);
+    const block = input && input.closest('.mb-3, .mb-4');
+    if (!block) return;
+    block.querySelectorAll('.text-danger.small').forEach(el => el.remove());
+    const anchor = block.querySelector('.form-text');
+    messages.forEach(message => {
+      const div = document.createElement('div');
+      div.className = 'text-danger small mt-1';
+      div.textContent = message;
+      block.insertBefore(div, anchor);
+    });
+  }
+
+  document.querySelectorAll('form[data-validate]').forEach(form => {
+    form.addEventListener('focusout', event => {
+      const name = event.target.name;
+      if (!name || name === 'csrf_token' || event.target.type === 'submit') return;
+      // Das ganze Formular als Kontext für die feldübergreifenden Regeln, geprüft wird nur dieses Feld
+      const fields = {};
+      new FormData(form).forEach((value, key) => { if (key !== 'csrf_token') fields[key] = value; });
+      fetch(form.dataset.validate, {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json', 'Accept': 'application/json'},
+        credentials: 'same-origin',
+        body: JSON.stringify({fields: fields, check: [name]}),
+      })
+        .then(response => response.ok ? response.json() : null)
+        .then(result => { if (result) show(form, name, result.errors[name] || []); })
+        .catch(() => {});   // offline: beim Absenden wird ohnehin geprüft
+    });
+  });
+})();
@@ -0,0 +1,145 @@
+# stress_generate.py
+"""
+Concurrency stress test for /generate-pdf.
+
+Fires many parallel downloads, each with its own session, and checks that every
+returned PDF carries only the values of the session that requested it.
+
+    python stress_generate.py --requests 300 --threads 32
+"""
+
+import argparse
+import io
+import re
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib.metadata import version
+
+# ─── Flask 2.3's test client reads werkzeug.__version__, removed in Werkzeug 3.1 ───
+import werkzeug
+if not hasattr(werkzeug, "__version__"):
+    werkzeug.__version__ = version("werkzeug")
+
+from pypdf import PdfReader
+
+from app import app
+
+
+def make_session(i: int) -> dict:
+    """Session data in which every free-text value carries the marker S<i>."""
+    tag = f"S{i:05d}"
+    return {
+        'child_info': {
+            'is_born': 'yes',
+            'vorname': f"Kind{tag}",
+            'nachname': f"Familie{tag}",
+            'geburtsdatum': '01.02.2025',
+            'fruehgeboren': i % 2 == 0,
+            'due_date': '01.03.2025' if i % 2 == 0 else '',
+            'multiple_births': '1',
+        },
+        'applicant_info': {
+            'vorname': f"Eltern{tag}",
+            'nachname': f"Familie{tag}",
+            'geburtsdatum': '1990-05-17',
+            'geschlecht': 'weiblich',
+            'steuer_id': f"{i:011d}",
+            'address_street': f"Strasse{tag}",
+            'address_housenumber': '1',
+            'address_addon': '',
+            'address_plz': '10115',
+            'address_city': f"Ort{tag}",
+            'other_parent_status': 'both',
+            'lives_in_germany': 'yes',
+            'residency_start_date_type': 'birth',
+            'residency_start_date': '',
+        },
+        'other_parent_info': {
+            'vorname': f"Partner{tag}",
+            'nachname': f"Familie{tag}",
+            'geburtsdatum': '1989-03-02',
+            'geschlecht': 'männlich',
+            'steuer_id': f"{i + 1:011d}",
+            'same_address_as_applicant': True,
+        },
+        'bank_info': {'iban': 'DE12345678901234567890', 'bic': 'DEUTDEFFXXX'},
+    }
+
+
+MARKER = re.compile(r"S-?\d{4,5}")
+
+EXPECTED_FIELDS = {
+    'Vornamen': ('child_info', 'vorname'),
+    'Nachname': ('child_info', 'nachname'),
+    'Vornamen_2': ('applicant_info', 'vorname'),
+    'Straße': ('applicant_info', 'address_street'),
+    'Ort': ('applicant_info', 'address_city'),
+    'Vornamen_3': ('other_parent_info', 'vorname'),
+    'Ort_2': ('applicant_info', 'address_city'),
+}
+
+
+def check_pdf(i: int, session: dict, pdf_bytes: bytes) -> list:
+    """Return a list of problems; empty if the PDF belongs to session i alone."""
+    tag = f"S{i:05d}"
+    problems = []
+    fields = PdfReader(io.BytesIO(pdf_bytes)).get_fields() or {}
+    for name, (section, key) in EXPECTED_FIELDS.items():
+        value = fields.get(name, {}).get('/V')
+        if value != session[section][key]:
+            problems.append(f"{name}: expected {session[section][key]!r}, got {value!r}")
+    for name, field in fields.items():
+        value = field.get('/V')
+        if isinstance(value, str) and any(marker != tag for marker in MARKER.findall(value)):
+            problems.append(f"{name}: foreign value {value!r}")
+    return problems
+
+
+def run_one(i: int):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess.update(make_session(i))
+    started = time.perf_counter()
+    response = client.get('/generate-pdf')
+    elapsed = time.perf_counter() - started
+    return i, elapsed, response
+
+
+def verify(result) -> list:
+    i, _, response = result
+    if response.status_code != 200 or response.mimetype != 'application/pdf':
+        return [f"HTTP {response.status_code} {response.mimetype}"]
+    return check_pdf(i, make_session(i), response.data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help='number of /generate-pdf calls')
+    parser.add_argument('--threads', type=int, default=32, help='concurrent clients')
+    args = parser.parse_args(argv)
+
+    # Warm the template cache so the numbers show steady-state throughput
+    run_one(-1)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(run_one, range(args.requests)))
+    wall = time.perf_counter() - started
+
+    # Checked after the timed phase so parsing the PDFs does not skew throughput
+    failures = [(result[0], problems) for result in results if (problems := verify(result))]
+    latencies = sorted(elapsed for _, elapsed, _ in results)
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{args.requests} requests, {args.threads} threads, {wall:.2f}s wall")
+    print(f"throughput: {args.requests / wall:.1f} PDFs/s")
+    print(f"latency: p50 {statistics.median(latencies) * 1000:.0f} ms, p95 {p95 * 1000:.0f} ms")
+    print(f"isolation failures: {len(failures)}")
+    for i, problems in failures[:20]:
+        print(f"  session {i}: " + "; ".join(problems))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
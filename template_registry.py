@@ -0,0 +1,149 @@
+# template_registry.py
+"""
+Form templates by Bundesland and form revision, each with its own field mapping:
+
+    spec = get_spec('BE')                 # newest Berlin revision
+    spec = get_spec('BE', '2023-04')
+    template = load(spec)                 # PdfTemplate, loaded on first use
+    engine.fill_parts(spec.path, data, spec.plan)
+
+Registering a template costs nothing: the file is only hashed, decrypted and
+parsed when a request first needs it. Loaded templates count against a memory
+budget (set_memory_budget); when a load goes over it, the templates used least
+recently are dropped from the caches (template, appearance fonts, flatten base,
+geometry) and reloaded on their next use.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+from field_mapping import BERLIN_PLAN
+
+TEMPLATE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STATE = 'BE'
+DEFAULT_MEMORY_BUDGET = 256 << 20
+
+# Parsed non-stream objects take about 30× their serialized text, reference index and
+# object streams included (Berlin form: 1.3 MB of object text → ~38 MB; 41.5 MB in all
+# with the 1.1 MB file, its 2 MB of chunks and 0.7 MB of stream data)
+_PARSED_FACTOR = 30
+
+
+class TemplateSpec(NamedTuple):
+    state: str        # Bundesland, e.g. 'BE'
+    version: str      # form revision, sortable ('2023-04')
+    path: str         # absolute path of the PDF
+    plan: object      # field_mapping.FillPlan for this form
+    title: str = ""
+
+    @property
+    def key(self) -> tuple:
+        return self.state, self.version
+
+
+_specs = {}
+
+
+def register_template(state: str, version: str, path: str, plan, title: str = "") -> TemplateSpec:
+    """Add a form; path may be relative to the application directory. Nothing is read yet."""
+    spec = TemplateSpec(state.upper(), version, os.path.join(TEMPLATE_DIR, path), plan, title)
+    _specs[spec.key] = spec
+    return spec
+
+
+def get_spec(state: str = None, version: str = None) -> TemplateSpec:
+    """The registered form for a state; without version, its newest revision."""
+    state = (state or DEFAULT_STATE).upper()
+    if version:
+        spec = _specs.get((state, version))
+    else:
+        versions = sorted(v for s, v in _specs if s == state)
+        spec = _specs[state, versions[-1]] if versions else None
+    if spec is None:
+        wanted = f"{state} {version}" if version else state
+        raise ValueError(f"No form template for {wanted!r} (available: "
+                         f"{', '.join(f'{s} {v}' for s, v in available_templates())})")
+    return spec
+
+
+def available_templates() -> tuple:
+    return tuple(sorted(_specs))
+
+
+# ─── Loading and memory budget ──────────────────────────────────────────
+
+_loaded = OrderedDict()     # path → estimated bytes, least recently used first
+_lock = threading.Lock()
+_budget = DEFAULT_MEMORY_BUDGET
+
+
+def set_memory_budget(budget_bytes: int) -> None:
+    global _budget
+    _budget = budget_bytes
+
+
+def footprint(template) -> int:
+    """
+    Estimated resident size of a loaded template: file bytes, serialized chunks and
+    stream data as they are, parsed objects by _PARSED_FACTOR. Counts pdfrw's
+    expanded copy once it exists (load() re-estimates on every use).
+    """
+    text = template.chunk_size - template.stream_size
+    return (len(template.data) + template.plain_size + template.chunk_size + template.stream_size
+            + _PARSED_FACTOR * text)
+
+
+def load(spec: TemplateSpec):
+    """The spec's PdfTemplate (see pdf_template.get_template); may evict cold templates."""
+    from pdf_template import get_template
+
+    template = get_template(spec.path)
+    with _lock:
+        _loaded[template.path] = footprint(template)
+        _loaded.move_to_end(template.path)
+        # The template just used always stays, even if it alone exceeds the budget
+        while sum(_loaded.values()) > _budget and len(_loaded) > 1:
+            path, _ = _loaded.popitem(last=False)
+            _evict(path)
+    return template
+
+
+def _evict(path: str) -> None:
+    import field_geometry
+    import pdf_appearance
+    import pdf_flatten
+    import pdf_template
+
+    template = pdf_template.evict(path)
+    field_geometry.evict(path)
+    if template is not None:
+        pdf_appearance.evict(template)
+        pdf_flatten.evict(template)
+
+
+_digests = {}
+
+
+def digest(spec: TemplateSpec) -> str:
+    """SHA-256 of the template file, without loading it (cached until mtime/size change)."""
+    from pdf_template import _sha256
+
+    st = os.stat(spec.path)
+    cached = _digests.get(spec.path)
+    if cached is None or cached[0] != (st.st_mtime, st.st_size):
+        cached = _digests[spec.path] = ((st.st_mtime, st.st_size), _sha256(spec.path))
+    return cached[1]
+
+
+def loaded_templates() -> dict:
+    """{path: estimated bytes} of the templates currently in memory."""
+    with _lock:
+        return dict(_loaded)
+
+
+# ─── Registered forms ───────────────────────────────────────────────────
+
+register_template('BE', '2023-04', 'Berlin-antrag-auf-elterngeld.pdf', BERLIN_PLAN,
+                  title="Bundeseinheitlicher Antrag auf Elterngeld (Berlin)")